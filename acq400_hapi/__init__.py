@@ -4,6 +4,21 @@
     * acq400.py : Acq400 class, represents an ACQ400 UUT
     * acq400_ui.py : common user interface elements for apps
     * netclient.py : Netclient class, TCP socket wrapper
+    * knob_cache.py : KnobCache class, persistent knob schema cache
+    * streaming.py : StreamReader, zero-copy ring buffer stream reader, StreamWriter disk writer thread
+    * demux.py : Demux, chunked memory mapped demux engine
+    * shotdata.py : ShotData, lazy memory mapped access to stored shot data
+    * pyramid.py : min/max decimation pyramid for plotting huge channels
+    * es_index.py : vectorized event signature index of raw data
+    * burst_stack.py : restack burst data as data[uut, chan, burst, t]
+    * broker.py : StreamBroker, one uut stream shared with many local readers
+    * continuity.py : ContinuityCheck, sample counter gap check stage for any stream path
+    * calibration.py : Calibration, ESLO/EOFF float arrays cached per uut/shot, block raw to volts
+    * slowmon.py : SlowmonReader, block mode slowmon rows, vectorized hex/dec/egu row text
+    * awg_upload.py : AWG pattern upload, no copies, sendfile/sendmsg repeats, MB/s
+    * awg_stream.py : AwgStreamer, double buffered continuous AWG_STREAM play, live swap, underruns
+    * waveforms.py : vectorized AWG waveforms, interleaved int16/int32 buffers, LRU pattern cache
+    * aio : asyncio transport, AsyncSiteclient, AsyncLogclient, AsyncAcq400
     * shotcontrol.py : Shotcontrol class, handles transient shots
     * acq400_print.py : cmd line interface functions
     * agilent33210.py : SCPI cmd wrapper
@@ -16,9 +31,18 @@ import sys
 from .netclient import Netclient
 from .netclient import Siteclient
 from .netclient import Logclient
+from .knob_cache import KnobCache
+from .streaming import StreamReader, StreamRing, StreamWriter
+from .demux import Demux
+from .shotdata import ShotData
+from .es_index import EsScanner
+from .continuity import ContinuityCheck
+from .calibration import Calibration
+from .slowmon import SlowmonReader
 from .acq400 import Acq400, STATE, AcqPorts, Mgt508Ports, ChannelClient, MgtDramPullClient, sigsel, factory, Mgt508
 from .acq400 import freq, freqpv, intpv, pv, activepv, floatpv
 from .acq400 import Acq2106
+from .acq400 import StatusMonitorStopped
 from .acq400 import Acq2106_Mgtdram8
 from .acq400 import Acq2106_TIGA
 if sys.version_info > (3, 0):
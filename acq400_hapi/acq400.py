@@ -34,13 +34,28 @@ import numpy as np
 import socket
 import timeit
 import time
+import concurrent.futures
 
 from . import utils
+from . import knob_cache
+from . import streaming
+from . import es_index
+from .pyramid import PyramidStage
+from .continuity import ContinuityCheck
+from .calibration import Calibration
+from . import slowmon
+from . import awg_upload
+from . import awg_stream
 
 class DataNotAvailableError(Exception):
     pass
 
 
+class StatusMonitorStopped(Exception):
+    """the status monitor broke or quit before a wait completed"""
+    pass
+
+
 class AcqPorts:
     """uut server port constants"""
     TSTAT = 2235
@@ -125,6 +140,15 @@ class STATE:
         if st==STATE.CLEANUP:
             return "CLEANUP"
         return "UNDEF"
+    @staticmethod
+    def value(name):
+        """inverse of str(), accepts the TRANS_ACT:STATE names"""
+        for st in range(STATE.IDLE, STATE.CLEANUP+1):
+            if STATE.str(st) == name:
+                return st
+        if name == "POSTPROCESS":
+            return STATE.POPROCESS
+        raise ValueError("undefined state {}".format(name))
 
 class Signals:
     EXT_TRG_DX = 'd0'
@@ -147,34 +171,53 @@ class RawClient(netclient.Netclient):
         """
         netclient.Netclient.__init__(self, addr, port)
 
-    def read(self, nelems, data_size=2):
-        """read data from channel data server
+    def read_into(self, out):
+        """read data from channel data server directly into out, no copies
 
         Args:
-            nelems (int): data elements 
-            data_size (int, optional): data size in bytes 2|4 short or int. Defaults to 2.
+            out (ndarray or writable buffer): destination, must be contiguous
+
         Returns:
-            ndarray: channel data
+            int: bytes received, less than out.nbytes at end of file
         """
-        _dtype = np.dtype('i4' if data_size == 4 else 'i2')   # hmm, what if unsigned?
-
-        buf = bytearray(nelems*data_size)
-        try:
-            view = memoryview(buf).cast('B')
-        except:
-            # python 2.7 hack
-            view = memoryview(buf)
+        view = memoryview(out).cast('B')
+        nbytes = len(view)
         pos = 0
-        while len(view):
-            nrx = self.sock.recv_into(view)
+        while pos < nbytes:
+            nrx = self.sock.recv_into(view[pos:])
             if nrx == 0:
                 break               # end of file
-            view = view[nrx:]
             pos += nrx
 
-        if pos > 0 and pos < nelems:
-            print("WARNING: early termination at {}/{}".format(pos, nelems))
-        return np.frombuffer(buf[:pos], _dtype)
+        if pos > 0 and pos < nbytes:
+            print("WARNING: early termination at {}/{}".format(pos, nbytes))
+        return pos
+
+    def read(self, nelems, data_size=2, out=None):
+        """read data from channel data server
+
+        Args:
+            nelems (int): data elements 
+            data_size (int, optional): data size in bytes 1|2|4 uint8, short or int. Defaults to 2.
+            out (ndarray, optional): preallocated C-contiguous destination, at least nelems*data_size bytes. Defaults to new array.
+        Returns:
+            ndarray: channel data, a view of out if supplied
+
+        Raises:
+            ValueError: out is not C-contiguous or too small, data would land in a copy
+        """
+        _dtype = np.dtype({ 1: 'u1', 4: 'i4' }.get(data_size, 'i2'))   # hmm, what if unsigned?
+
+        if out is None:
+            out = np.empty(nelems, _dtype)
+        else:
+            if not out.flags.c_contiguous:
+                raise ValueError("RawClient.read: out is not C-contiguous")
+            if out.nbytes < nelems*data_size:
+                raise ValueError("RawClient.read: out {} bytes, need {}".format(out.nbytes, nelems*data_size))
+            out = out.reshape(-1)[:nelems*data_size//out.itemsize]
+        pos = self.read_into(out)
+        return out[:pos//out.itemsize]
 
     def get_blocks(self, nelems, data_size=2):
         block = np.array([1])
@@ -214,22 +257,161 @@ def signal_handler(signal, frame):
 class Statusmonitor:
     """ monitors the status channel
 
-    Efficient event-driven monitoring in a separate thread
+    Efficient event-driven monitoring in a separate thread.
+
+    Each TSTAT line is parsed once by a single compiled pattern and
+    dispatched to subscribers, see subscribe() and subscribe_queue().
+
+    Events, callback(event, value):
+        - "status" : [state, pre, post, elapsed, demux], every status line
+        - "state"  : (old_state, new_state), on change
+        - "shot"   : (state, pre, post, elapsed) from SHOT= lines
+        - "timer"  : (kind, n, msec) from Timer::report lines
+        - "error"  : message
     """
-    st_re = re.compile(r"([0-9]) ([0-9]+) ([0-9]+) ([0-9]+) ([0-9])+" )
-    st_shot_re = re.compile(r"SHOT=([0-9]),([0-9]+),([0-9]+),([0-9]+)")
-    st_failed_to_find_event_re = re.compile(r"ERROR EVENT NOT FOUND")
-    st_timer_re = re.compile(r"Timer::report\(([0-9]+)\) ([A-Z]{3}) ([0-9]+) msec")
+    EVENTS = ("status", "state", "shot", "timer", "error")
+
+    st_line_re = re.compile(
+        rb"(?P<shot>SHOT=([0-9]),([0-9]+),([0-9]+),([0-9]+))|"
+        rb"(?P<error>ERROR EVENT NOT FOUND)|"
+        rb"(?P<timer>Timer::report\(([0-9]+)\) ([A-Z]{3}) ([0-9]+) msec)|"
+        rb"(?P<status>([0-9]) ([0-9]+) ([0-9]+) ([0-9]+) ([0-9]+))")
+
+    @staticmethod
+    def parse(line):
+        """parse one TSTAT line
+
+        Args:
+            line (bytes or str): status line
+
+        Returns:
+            (str, value): event and value, or (None, None) if not a status line
+        """
+        if isinstance(line, str):
+            line = line.encode("latin-1")
+        match = Statusmonitor.st_line_re.search(line)
+        if not match:
+            return None, None
+        event = match.lastgroup
+        if event == "status":
+            return event, [int(x) for x in match.group(event).split()]
+        elif event == "shot":
+            return event, tuple(int(x) for x in match.group(event)[5:].split(b","))
+        elif event == "timer":
+            n, kind, ms = match.groups()[7:10]
+            return event, (kind.decode(), int(n), int(ms))
+        else:
+            return event, match.group(event).decode()
 
     def __repr__(self):
         return repr(self.logclient)
-    
+
+    def subscribe(self, callback, events=EVENTS):
+        """call callback(event, value) from the monitor thread on each event
+
+        callback must be quick, it delays monitoring.
+
+        Returns:
+            handle for unsubscribe()
+        """
+        handle = (callback, frozenset(events))
+        with self.cv:
+            self.subscribers = self.subscribers + [handle]
+        return handle
+
+    def unsubscribe(self, handle):
+        with self.cv:
+            self.subscribers = [s for s in self.subscribers if s is not handle]
+
+    def subscribe_queue(self, loop, events=EVENTS, maxsize=0):
+        """deliver events to an asyncio.Queue on loop as (event, value)
+
+        Returns:
+            (asyncio.Queue, handle)
+        """
+        import asyncio
+        queue = asyncio.Queue(maxsize)
+        def put(event, value):
+            loop.call_soon_threadsafe(queue.put_nowait, (event, value))
+        return queue, self.subscribe(put, events)
+
+    def publish(self, event, value):
+        for callback, events in self.subscribers:
+            if event in events:
+                try:
+                    callback(event, value)
+                except Exception as e:
+                    print("{} subscriber {} failed {}".format(repr(self), callback, e))
+
+    def on_status(self, status1):
+        if self.trace > 1:
+            print("%s <%s" % (repr(self), status1))
+        with self.cv:
+            if self.status != None:
+                state0 = self.status[SF.STATE]
+                state1 = status1[SF.STATE]
+                if state0 != state1:
+                    self.state_changed.set()
+                    self.state_count += 1
+                if state0 != 0 and state1 == 0:
+                    if self.trace:
+                        print("%s STOPPED!" % (self.uut))
+                    self.stopped.set()
+                    self.armed.clear()
+                if state1 == 1:
+                    if self.trace:
+                        print("%s ARMED!" % (self.uut))
+                    self.armed.set()
+                    self.stopped.clear()
+                if state0 == 0 and state1 > 1:
+                    if self.trace:
+                        print("ERROR: %s skipped ARM %d -> %d" % (self.uut, state0, state1))
+                    self.quit_requested = True
+                    os.kill(self.main_pid, signal.SIGINT)
+                    sys.exit(1)
+            else:
+                state0 = None
+            self.status = status1
+            self.cv.notify_all()
+        self.publish("status", status1)
+        if state0 != status1[SF.STATE]:
+            self.publish("state", (state0, status1[SF.STATE]))
+
+    def on_shot(self, shot):
+        if shot[0] == 1:
+            self.data_valid = "ARM"
+        elif shot[0] == 0:
+            if self.data_valid == "ARM" and shot[1] > 0 and shot[1] == shot[3]:
+                self.data_valid = "DATA_VALID"
+        self.publish("shot", shot)
+
+    def on_timer(self, timer):
+        kind, n, ms = timer
+        print("TIMER: {} {} {} ms".format(kind, n, ms))
+        if kind == "ROI":
+            self.search_roi_count += 1
+        elif kind == "ALL":
+            self.search_all_count += 1
+        else:
+            print("ERROR bad match {}".format(n))
+        self.publish("timer", timer)
+
+    def on_error(self, message):
+        self.data_valid = message
+        self.publish("error", message)
+
     def st_monitor(self):
         self.data_valid = "UNKNOWN"
+        dispatch = {
+            "status": self.on_status,
+            "shot": self.on_shot,
+            "timer": self.on_timer,
+            "error": self.on_error,
+        }
 
         while self.quit_requested == False:
             try:
-                st = self.logclient.poll()
+                st = self.logclient.poll_bytes()
             except OSError as err:
                 if self.quit_requested:
                     return
@@ -239,60 +421,9 @@ class Statusmonitor:
             if self.trace > 1:
                 print("%s <%s>" % (repr(self), st))
 
-
-            match = self.st_failed_to_find_event_re.search(st)
-            if match:
-                self.data_valid = "ERROR EVENT NOT FOUND"
-
-            match = self.st_timer_re.search(st)
-            if match:
-                print("TIMER: {} {} {} ms".format(match.group(2), match.group(1), match.group(3)))
-                if match.group(2) == "ROI":
-                    self.search_roi_count += 1
-                elif match.group(2) == "ALL":
-                    self.search_all_count += 1
-                else:
-                    print("ERROR bad match {}".format(match.group(1)))
-
-            match = self.st_shot_re.search(st)
-            if match:
-                status1 = [int(x) for x in match.groups()]
-                if status1[0] == 1:
-                    self.data_valid = "ARM"
-                elif status1[0] == 0:
-                    if self.data_valid == "ARM" and status1[1] > 0 and status1[1] == status1[3]:
-                        self.data_valid = "DATA_VALID"
-                continue
-
-            match = self.st_re.search(st)
-            # status is a match. need to look at group(0). It's NOT a LIST!
-            if match:
-                statuss = match.groups()
-                status1 = [int(x) for x in statuss]
-                if self.trace > 1:
-                    print("%s <%s" % (repr(self), status1))
-                if self.status != None:
-                    if self.status[SF.STATE] != status1[SF.STATE]:
-                        self.state_changed.set()
-#                    print("Status check %s %s" % (self.status0[0], status[0]))
-                    if self.status[SF.STATE] != 0 and status1[SF.STATE] == 0:
-                        if self.trace:
-                            print("%s STOPPED!" % (self.uut))
-                        self.stopped.set()
-                        self.armed.clear()
-#                print("status[0] is %d" % (status[0]))
-                    if status1[SF.STATE] == 1:
-                        if self.trace:
-                            print("%s ARMED!" % (self.uut))
-                        self.armed.set()
-                        self.stopped.clear()
-                    if self.status[SF.STATE] == 0 and status1[SF.STATE] > 1:
-                        if self.trace:
-                            print("ERROR: %s skipped ARM %d -> %d" % (self.uut, self.status[0], status1[0]))
-                        self.quit_requested = True
-                        os.kill(self.main_pid, signal.SIGINT)
-                        sys.exit(1)
-                self.status = status1
+            event, value = Statusmonitor.parse(st)
+            if event:
+                dispatch[event](value)
 
 
     def get_state(self):
@@ -310,19 +441,50 @@ class Statusmonitor:
     def get_elapsed(self):
         return self.status[SF.ELAPSED]
 
+    @property
+    def break_requested(self):
+        return self._break_requested
 
-    def wait_event(self, ev, descr=""):
-    #       print("wait_%s 02 %d" % (descr, ev.is_set()))
-        while ev.wait(0.1) == False and not self.break_requested:
-            if self.quit_requested:
-                print("QUIT REQUEST call exit %s" % (descr))
-                sys.exit(1)
+    @break_requested.setter
+    def break_requested(self, value):
+        with self.cv:
+            self._break_requested = value
+            self.cv.notify_all()
+
+    @property
+    def quit_requested(self):
+        return self._quit_requested
+
+    @quit_requested.setter
+    def quit_requested(self, value):
+        with self.cv:
+            self._quit_requested = value
+            self.cv.notify_all()
 
-#        print("wait_%s 88 %d" % (descr, ev.is_set()))
+    def wait_event(self, ev, descr=""):
+        """blocks until ev is set, woken by the monitor, no polling"""
+        with self.cv:
+            self.cv.wait_for(lambda: ev.is_set() or self._break_requested or self._quit_requested)
+        if self.quit_requested:
+            print("QUIT REQUEST call exit %s" % (descr))
+            sys.exit(1)
         ev.clear()
-#        print("wait_%s 99 %d" % (descr, ev.is_set()))
         return self.get_state()
 
+    def wait_for(self, predicate, timeout=None):
+        """blocks until predicate(status) is true, re-evaluated on every status update
+
+        Args:
+            predicate (func): called with status [state, pre, post, elapsed, demux]
+            timeout (float, optional): seconds, None waits forever. Defaults to None.
+
+        Returns:
+            bool: False on timeout or break_requested
+        """
+        with self.cv:
+            self.cv.wait_for(lambda: predicate(self.status) or self._break_requested or self._quit_requested, timeout)
+            return bool(predicate(self.status))
+
     def wait_armed(self):
         """blocks until uut is ARMED"""
         self.wait_event(self.armed, "armed")
@@ -339,6 +501,9 @@ class Statusmonitor:
 
 
     def __init__(self, _uut, _status):
+        self.cv = threading.Condition()
+        self.subscribers = []
+        self.state_count = 0
         self.break_requested = False
         self.quit_requested = False
         self.trace = Statusmonitor.trace
@@ -348,13 +513,13 @@ class Statusmonitor:
         self.stopped = threading.Event()
         self.armed = threading.Event()
         self.state_changed = threading.Event()
-        self.logclient = netclient.Logclient(_uut, AcqPorts.TSTAT)
-        self.st_thread = threading.Thread(target=self.st_monitor)
-        self.st_thread.setDaemon(True)
-        self.st_thread.start()
         self.data_valid = "UNKNOWN"
         self.search_roi_count = 0
         self.search_all_count = 0
+        self.logclient = netclient.Logclient(_uut, AcqPorts.TSTAT)
+        self.st_thread = threading.Thread(target=self.st_monitor)
+        self.st_thread.daemon = True
+        self.st_thread.start()
 
 
 class NullFilter:
@@ -386,8 +551,7 @@ class ProcessMonitor:
         """
         self.quit_requested = False
         self.output_filter = _filter
-        self.logclient = netclient.Logclient(_uut.uut, _monport)
-        self.logclient.termex = re.compile("(\n)")
+        self.logclient = netclient.Logclient(_uut.uut, _monport, eol=b"\n")
         self.st_thread = threading.Thread(target=self.st_monitor)
         self.st_thread.setDaemon(True)
         self.st_thread.start()
@@ -401,8 +565,16 @@ class Acq400:
     handles multiple channel post shot upload
     """
 
+    def new_site_client(self, site):
+        """create a Siteclient for site, skipping the help query if the knob cache is valid"""
+        knobstr = self.knob_cache.help(site)
+        svc = netclient.Siteclient(self.uut, AcqPorts.SITE0+site, knobstr=knobstr)
+        if knobstr is None:
+            self.knob_cache.store_help(site, svc)
+        return svc
+
     def init_site_client(self, site):
-        svc = netclient.Siteclient(self.uut, AcqPorts.SITE0+site)
+        svc = self.new_site_client(site)
         self.svc["s%d" % site] = svc
         self.modules[site] = svc
 
@@ -486,8 +658,9 @@ class Acq400:
         self.cal_eoff = [0, ]
         self.mb_clk_min = 4000000
 
-        s0 = self.svc["s0"] = s0_client if s0_client else netclient.Siteclient(self.uut, AcqPorts.SITE0)
-        sl = s0.SITELIST.split(",")
+        self.knob_cache, s0 = connect_site0(self.uut, s0_client)
+        self.svc["s0"] = s0
+        sl = self.knob_cache.ident["SITELIST"].split(",")
         sl.pop(0)
         self.awg_site = 0
         site_enumerators = {}
@@ -514,6 +687,7 @@ class Acq400:
             self.statmon = Statusmonitor(self.uut, _status)
         Acq400.uuts_methods[_uut] = self.__dict__   # store the dict for reuse by __init__
         Acq400.uuts[_uut] = self                    # store the object for reuse by factory()
+        self.knob_cache.save()
 
     def get_sys_info(self):
         """Gets uut system information
@@ -526,19 +700,18 @@ class Acq400:
         info = ""
         info += "="*72 + "\n"
         info += datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n\n"
-        info += "FPGA: {}\n".format(self.s0.fpga_version)
-        info += "FW:   {}\n\n".format(self.s0.software_version)
+        fpga_version, software_version, model, serial = \
+            self.s0.sr_many(("fpga_version", "software_version", "MODEL", "SERIAL"))
+        info += "FPGA: {}\n".format(fpga_version)
+        info += "FW:   {}\n\n".format(software_version)
         info += "MB Info:\n"
         info += "{: <57}{: <16}\n".format("MODEL", "SERIAL")
-        info += "{: <57}{: <16}\n\n".format(self.s0.MODEL, self.s0.SERIAL)
+        info += "{: <57}{: <16}\n\n".format(model, serial)
         info += "-" * 72 + "\n\n"
         info += "Site Info:\n"
         info += line.format("SITE", "MODEL", "PART_NUM", "SERIAL")
         for site in self.sites:
-            info += line.format(site,
-                                self.svc["s{}".format(site)].MODEL,
-                                self.svc["s{}".format(site)].PART_NUM,
-                                self.svc["s{}".format(site)].SERIAL)
+            info += line.format(site, *self.svc["s{}".format(site)].sr_many(("MODEL", "PART_NUM", "SERIAL")))
         info += "="*72
         return info
 
@@ -603,12 +776,25 @@ class Acq400:
     def fetch_all_calibration(self):
         """Gets uut calibration and stores in instance"""
         try:
-            for m in self.get_aggregator_svc_list():
-                self.cal_eslo.extend(m.AI_CAL_ESLO.split(' ')[3:])
-                self.cal_eoff.extend(m.AI_CAL_EOFF.split(' ')[3:])
+            self.calibration(refresh=True)
         except:
             pass
 
+    def calibration(self, shot=None, refresh=False):
+        """Calibration for all channels as float arrays, cached per uut and shot
+
+        Args:
+            shot (int, optional): shot the data came from, new shot reads again. Defaults to None.
+            refresh (bool, optional): read from the uut regardless. Defaults to False.
+
+        Returns:
+            Calibration: cal.volts(raw) converts a whole [nchan, nsam] block
+        """
+        cal = Calibration.get(self, shot, refresh)
+        self.cal_eslo = cal.eslo
+        self.cal_eoff = cal.eoff
+        return cal
+
     def scale_raw(self, raw, volts=False):
         for (sx, m) in list(self.modules.items()):
             if m.MODEL.startswith("ACQ43"):
@@ -637,8 +823,8 @@ class Acq400:
         if len(self.cal_eslo) == 1:
             self.fetch_all_calibration()
 
-        eslo = float(self.cal_eslo[chan])
-        eoff = float(self.cal_eoff[chan])
+        eslo = self.cal_eslo[chan]
+        eoff = self.cal_eoff[chan]
 
         if self.verbose > 1 or (self.verbose and chan < 4):
             print("chan {} v = {}*{} + {}".format(chan, raw[0], eslo, eoff))
@@ -646,13 +832,14 @@ class Acq400:
         return np.add(np.multiply(raw, eslo), eoff)
 
 
-    def read_chan(self, chan, nsam = 0, data_size = None):
+    def read_chan(self, chan, nsam = 0, data_size = None, out = None):
         """Reads a channels data
 
         Args:
             chan (int): channel number
             nsam (int, optional): Number of samples. Defaults to 0.
             data_size (int, optional): data size in bytes. Defaults to None.
+            out (ndarray, optional): preallocated destination, received with no copies. Defaults to None.
 
         Returns:
             ndarray
@@ -666,7 +853,7 @@ class Acq400:
             nsam = self.pre_samples()+self.post_samples()
 
         cc = ChannelClient(self.uut, chan)
-        ccraw = cc.read(nsam, data_size=data_size)
+        ccraw = cc.read(nsam, data_size=data_size, out=out)
         cc.close()
         if self.save_data:
             try:
@@ -816,18 +1003,76 @@ class Acq400:
 
         return chx
     
-    def _read_channels_2(self, channels=(), nsam=None, localdemux=None):
+    upload_connections = int(os.getenv("ACQ400_UPLOAD_CONNECTIONS", "4"))
+
+    def upload_channels(self, channels, nsam, data_size, data, max_connections=None, muxed=False):
+        """upload demuxed channels on up to max_connections simultaneous sockets
+
+        Each channel lands in its own row of data, with no copies.
+        Muxed, each channel lands in a one channel buffer per connection, then its column of data.
+        Per channel throughput is left in self.upload_stats.
+
+        Args:
+            channels (list): channel numbers 1..N
+            nsam (int): samples per channel
+            data_size (int): data size in bytes 2|4
+            data (ndarray): preallocated [len(channels), nsam] destination, [nsam, len(channels)] if muxed
+            max_connections (int, optional): pool size. Defaults to ACQ400_UPLOAD_CONNECTIONS or 4.
+            muxed (bool, optional): data is muxed. Defaults to False.
+
+        Returns:
+            list: upload_stats, (ch, nbytes, seconds) per channel
+        """
+        scratch = threading.local()
+
+        def read_column(ix, ch):
+            if not hasattr(scratch, "buf"):
+                scratch.buf = np.zeros(nsam, data.dtype)
+            chx = self.read_chan(ch, nsam, data_size, out=scratch.buf)
+            data[:len(chx), ix] = chx
+            return chx
+
+        def upload(ix, ch):
+            if self.trace:
+                print("%s CH%02d start.." % (self.uut, ch))
+            t0 = timeit.default_timer()
+            if muxed:
+                nbytes = read_column(ix, ch).nbytes
+            else:
+                nbytes = self.read_chan(ch, nsam, data_size, out=data[ix]).nbytes
+            tt = timeit.default_timer() - t0
+            if self.trace:
+                print("%s CH%02d complete.. %.3f s %.2f MB/s" % (self.uut, ch, tt, nbytes/1000000/tt))
+            return (ch, nbytes, tt)
+
+        max_connections = max_connections if max_connections else self.upload_connections
+        t0 = timeit.default_timer()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_connections)) as executor:
+            futures = [executor.submit(upload, ix, ch) for ix, ch in enumerate(channels)]
+            self.upload_stats = [f.result() for f in futures]
+        if self.trace:
+            tt = timeit.default_timer() - t0
+            total = sum(st[1] for st in self.upload_stats)
+            print("%s %d channels complete.. %.3f s %.2f MB/s x%d" %
+                (self.uut, len(channels), tt, total/1000000/tt, max_connections))
+        return self.upload_stats
+
+    def _read_channels_2(self, channels=(), nsam=None, localdemux=None, out=None):
         """read selected channels return post shot data.
         
             channels: ()        = return all channels demuxed
             channels: 0         = return all channels muxed
             channels: 1         = return specific channel
             channels: (1,2,3)   = return specific channels
+
+            Data demuxed on the uut is uploaded in parallel, see upload_channels()
             
             Args:
                 channels (tuple/int, optional): Channels to read. Default all.
                 nsam (int, optional): Number of samples. Defaults to None.
                 localdemux (bool, optional): depreciated. Defaults to None.
+                out (ndarray, optional): preallocated [nchan, nsam] destination, or [1, nsam*nchan] \
+                    for muxed data. Channel uploads land in it with no copies. Defaults to None.
 
             Returns:
                 ndarray:  channel data
@@ -847,7 +1092,6 @@ class Acq400:
             if is_cooked and want_raw:
                 print('data is_cooked but we want_raw : consider running shots with DEMUX=0 to save effort')
 
-            data = []
             nsam = nsam if nsam else ch_data_size // data_size
             nspad = int(self.s0.spad.split(',')[1])
             nspad_chan = nspad if data_size==4 else nspad*2
@@ -855,25 +1099,33 @@ class Acq400:
             if want_all_cooked or want_raw:
                 channels = [ch for ch in range(1, ndata_chan+1)]
 
-            for chan in channels:
-                data.append(self.read_chan(chan, nsam, data_size))
-                
+            dtype = np.dtype('i4' if data_size == 4 else 'i2')
             if want_raw:
-                return np.array(data, order='F').T.reshape(1, -1) #return muxed data
-            else:
-                return np.array(data, order='F') #return specified channels
+                if out is None:
+                    out = np.zeros((1, nsam*len(channels)), dtype)
+                elif not out.flags.c_contiguous:
+                    raise ValueError("read_channels: out is not C-contiguous")
+                self.upload_channels(channels, nsam, data_size, out.reshape(-1, len(channels)), muxed=True)
+                return out #return muxed data
+
+            data = np.zeros((len(channels), nsam), dtype) if out is None else out
+            self.upload_channels(channels, nsam, data_size, data)
+            return data #return specified channels
         
         else: #if data has NOT been demuxed on uut           
             nsam = nsam if nsam else raw_data_size // data_size
-            data = self.read_chan(0, nsam, data_size)
             if want_raw:
-                return np.array([data]) #return all channels no demux
+                data = self.read_chan(0, nsam, data_size, out=out)
+                return data.reshape(1, -1) #return all channels no demux
             else:
+                data = self.read_chan(0, nsam, data_size)
                 data = data.reshape(-1, nchan).transpose() #demux channels
                 if len(channels) > 0:
-                    return data[np.array(channels) - 1] #return specified channels
-                else:
-                    return data #return all channels
+                    data = data[np.array(channels) - 1] #return specified channels
+                if out is not None:
+                    out[...] = data
+                    return out
+                return data #return all channels
         
     read_channels = _read_channels_2
 
@@ -1037,11 +1289,14 @@ class Acq400:
         """Load and config a AWG pattern
 
         Args:
-            data (str): AWG pattern
+            data (bytes|ndarray|mmap|file): AWG pattern, sent with no copy, an open file with sendfile
             autorearm (bool, optional): Rearm and wait after run. Defaults to False.
             continuous (bool, optional): Run pattern continuously. Defaults to False.
             repeats (int, optional): Number of pattern repetitions. Defaults to 1.
             segment (char, optional): Which segment to upload data to
+
+        Returns:
+            dict: upload bytes, seconds, rate (MB/s)
         """
         
         if self.awg_site > 0 and segment == None:
@@ -1057,9 +1312,9 @@ class Acq400:
                 AcqPorts.AWG_AUTOREARM if autorearm else AcqPorts.AWG_ONCE
 
         with netclient.Netclient(self.uut, port) as nc:
-            while repeats:
-                nc.sock.send(data)
-                repeats -= 1
+            stats = awg_upload.send(nc.sock, data, repeats)
+            if self.trace:
+                print("load_awg: {}".format(awg_upload.rate_str(stats)))
             nc.sock.shutdown(socket.SHUT_WR)
             while True:
                 rx = nc.sock.recv(128)
@@ -1068,6 +1323,20 @@ class Acq400:
                 if not rx or rx.startswith(b"DONE"):
                     break
             nc.sock.close()
+        return stats
+
+    def stream_awg(self, source, nbufs=2, rate=None):
+        """Continuous AWG play on the AWG_STREAM port
+
+        Args:
+            source: generator of blocks, list of blocks played as a ring, or one block
+            nbufs (int, optional): blocks queued ahead of the sender. Defaults to 2.
+            rate (float, optional): pace the host to rate bytes/s. Defaults to None.
+
+        Returns:
+            AwgStreamer: running, swap() changes content, stats(), stop()
+        """
+        return awg_stream.AwgStreamer(self.uut, source, AcqPorts.AWG_STREAM, nbufs, rate).start()
 
     def set_segment(self, segment):
         """Set next awg segment(s)"""
@@ -1448,125 +1717,96 @@ class Acq400:
         Returns:
             list: [ [Event sample indices], [Event sample data] ]
         """
-        indices = []
-        event_samples = []
         nchan = self.nchan() if nchan == "default" else nchan
 
-        if file_path == "default":
-            data = self.read_muxed_data()
-            data = np.array(data)
-            if data.dtype == np.int16:
-                # convert shorts back to raw bytes and then to longs.
-                data = np.frombuffer(data.tobytes(), dtype=np.uint32)
-        else:
-            data = np.fromfile(file_path, dtype=np.uint32)
-
         if int(self.s0.data32) == 0:
             nchan = nchan / 2 # "effective" nchan has halved if data is shorts.
         nchan = int(nchan)
-        for index, sample in enumerate(data[0::nchan]):
-            # if sample == np.int32(0xaa55f154): # aa55
-            if sample == np.uint32(0xaa55f154): # aa55
-                indices.append(index)
-                event_samples.append(data[index*nchan:index*nchan + nchan])
+        ssb = nchan * 4
+
+        if file_path == "default":
+            # scan the raw data as it arrives, no full download
+            blocklen = streaming.aligned_blocklen(0x400000, ssb)
+            with streaming.StreamReader(self.uut, port=AcqPorts.DATA0, blocklen=blocklen, data_size=4) as rdr:
+                esi = es_index.scan_stream(rdr, ssb)
+        else:
+            esi = es_index.scan_files(file_path, ssb)
+
+        indices = esi['index'].tolist()
+        event_samples = list(esi['es'])
 
         if human_readable == 1:
-            # Change decimal to hex.
-            ii = 0
-            while ii < len(event_samples):
-                if type(event_samples[ii]) == np.ndarray:
-                    event_samples[ii] = event_samples[ii].tolist()
-                for indice, channel in enumerate(event_samples[ii]):
-                    event_samples[ii][indice] = '0x{0:08X}'.format(channel)
-                ll = int(len(event_samples[ii])/int(len(self.get_aggregator_sites())))
-                # print(event_samples[ii])
-                event_samples[ii] = [event_samples[ii][i:i + ll] for i in range(0, len(event_samples[ii]), ll)]
-                ii += 1
+            # Change decimal to hex, split per aggregator site.
+            nsites = len(self.get_aggregator_sites())
+            hexes = np.char.mod('0x%08X', esi['es']).reshape(len(esi), nsites, -1)
+            event_samples = hexes.tolist()
 
             if return_hex_string == 1:
-                # Make a single string containing the hex values.
-                es_string = ""
-                for num, sample in enumerate(event_samples):
-                    for i in range(len(sample[0])):
-                        for x in event_samples[num]:
-                            es_string = es_string + str(x[i]) + " "
-                        es_string = es_string + "\n"
-                    es_string = es_string + "\n"
-                event_samples = es_string
+                # Make a single string containing the hex values, one row per word, one column per site.
+                event_samples = "".join(
+                    "".join(" ".join(row) + " \n" for row in sample) + "\n"
+                    for sample in hexes.transpose(0, 2, 1).tolist())
 
         return [indices, event_samples]
 
-    def stream(self, recvlen=4096*32, port=AcqPorts.STREAM, data_size=2):
+    def stream(self, recvlen=4096*32, port=AcqPorts.STREAM, data_size=2, nslots=4):
         """Runs stream and yields data buffers
 
+        Buffers are views of a streaming.StreamReader ring, no copy, each is
+        valid until the next iteration. Use StreamReader direct to hold blocks longer.
+
         Args:
             recvlen (_type_, optional): buffer size. Defaults to 4096*32.
             port (_type_, optional): uut port. Defaults to AcqPorts.STREAM value.
             data_size (int, optional): data size in bytes. Defaults to 2.
+            nslots (int, optional): ring slots, receive runs ahead by nslots-1 buffers. Defaults to 4.
 
         Yields:
-            ndarray: data buffer
+            ndarray: data buffer, zero length at end of stream
         """
-        dtype = np.dtype('i4' if data_size == 4 else 'i2')   # hmm, what if unsigned?
-        self.stream_nc = netclient.Netclient(self.uut, port)
-
-        buf = bytearray(recvlen*data_size)
-        while self.stream_nc:
-            view = memoryview(buf).cast('B')
-            pos = 0
-
-            while len(view) and self.stream_nc:
-                nrx = self.stream_nc.sock.recv_into(view)
-                if nrx == 0:
-                    yield np.frombuffer(buf[:pos], dtype)
-                    pos = 0
-                else:
-                    view = view[nrx:]
-                    pos += nrx
-            yield np.frombuffer(buf[:pos], dtype)
+        self.stream_nc = streaming.StreamReader(self.uut, port, nslots, recvlen*data_size, data_size)
+        reader = self.stream_nc.start()
+        try:
+            for block in reader:
+                yield block.data
+            yield np.zeros(0, reader.ring.dtype)
+        finally:
+            reader.stop()
+
     def stream_close(self):
             if self.stream_nc:
-                self.stream_nc.close()
+                self.stream_nc.stop()
                 self.stream_nc = None
             else:
                 print("stream_close(), sorry not possible to close it down ..")
 
     # if spad is set, it's a synthetic spad, not part of ssb
-    def stream_slowmon(self, nspad=None):
+    def slowmon_reader(self, nspad=None, maxrows=1024):
+        """block mode slowmon reader, many rows per recv
+
+        Args:
+            nspad (int, optional): synthetic spad words, eg 4 with slowmon_hw. Defaults to the uut spad.
+            maxrows (int, optional): largest block. Defaults to 1024.
+
+        Returns:
+            SlowmonReader: iterate for (chx[nrows, nchan], spx[nrows, nspad]) blocks
+        """
         ssb = int(self.s0.ssb)
         data_sz = 4 if int(self.s0.data32) else 2
-        if not nspad:
-            nspad = int(self.s0.spad.split(',')[1])
-            spad_sz = nspad*4
-            nchan = (ssb - spad_sz)//data_sz
-        else:
-            main_nspad = int(self.s0.spad.split(',')[1])
-            nchan = (ssb - main_nspad*4)//data_sz
-            ssb = nchan*data_sz + nspad*4
-        ch_dtype = np.dtype('i4' if data_sz == 4 else 'i2')
-        sp_dtype = np.dtype('u4')
-        spad_off = nchan*data_sz//4
-
-        self.slowmon_nc = netclient.Netclient(self.uut, AcqPorts.SLOWMON)
-        buf = bytearray(ssb)
-        view = memoryview(buf).cast('B')
-
-        while self.slowmon_nc:
-            view = memoryview(buf).cast('B')
-            ib = 0
-
-            while ib < ssb and self.slowmon_nc:
-                nrx = self.slowmon_nc.sock.recv_into(view)
-                #print("stream_slowmon: nrx:{} ib:{} len(view) {}".format(nrx, ib, len(view)))
-                if nrx == 0:
-                    print("stream_slowmon: nrx:{} ib:{} len(view) {}".format(nrx, ib, len(view)))
-                    #sys.exit(-1)
-                else:
-                    view = view[nrx:]
-                    ib += nrx
-            chx = np.frombuffer(buf, ch_dtype)[:nchan]
-            spx = np.frombuffer(buf, sp_dtype)[spad_off:]
-            yield(chx, spx)
+        main_nspad = int(self.s0.spad.split(',')[1])
+        nchan = (ssb - main_nspad*4)//data_sz
+        self.slowmon_nc = slowmon.SlowmonReader(self.uut, nchan, data_sz, nspad or main_nspad,
+                                                port=AcqPorts.SLOWMON, maxrows=maxrows)
+        return self.slowmon_nc.start()
+
+    def stream_slowmon(self, nspad=None):
+        """one slowmon row per yield, (chx, spx), see slowmon_reader() for blocks"""
+        reader = self.slowmon_reader(nspad)
+        for chx, spx in reader:
+            for row in range(len(chx)):
+                yield(chx[row], spx[row])
+                if self.slowmon_nc is not reader:
+                    return
 
     def slowmon_close(self):
             if self.slowmon_nc:
@@ -1583,9 +1823,13 @@ class Acq400:
     def __getitem__(self, site):
         return self.SVC(site)
 
-    def stream_to_host(self, seconds=10, megabytes=None, save=None, check=-1, update=1, port=4210, blen=1024):
+    def stream_to_host(self, seconds=10, megabytes=None, save=None, check=-1, update=1, port=4210, blen=1024,
+                       nslots=8, rotate=None, direct=False, preallocate=False, pyramid=False, check_log=None):
         """Run stream to host
 
+        A receiver thread fills a ring of nslots buffers, a writer thread drains it
+        to disk, so a disk stall uses up ring slots rather than stopping the socket.
+
         Usage:
             uut.stream_to_host(seconds=10, save="stream_data")
 
@@ -1596,7 +1840,13 @@ class Acq400:
             check (int, optional): spad0 int32 column to check spad is contiguous.
             update (int, optional): how often to print status.
             port (int, optional): target port.
-            blen (int, optional): buffer base length.
+            blen (int, optional): buffer base length, samples per write.
+            nslots (int, optional): ring buffers between receiver and writer.
+            rotate (int, optional): start a new file every n megabytes, save.0000, save.0001 ..
+            direct (bool, optional): O_DIRECT writes, buffer rounded up to a multiple of 4096.
+            preallocate (bool, optional): fallocate files to rotate or megabytes size.
+            pyramid (bool, optional): build min/max plot pyramids per channel, save_CHnn.mmNNN.
+            check_log (str, optional): with check, log each gap as a JSON line, see continuity.py.
         """
         LINE_UP = '\033[1A'
         ERASE_LINE = '\033[2K'
@@ -1604,63 +1854,54 @@ class Acq400:
         if megabytes: seconds = 999999999
 
         ssb = int(self.s0.ssb)
-        bufferlen = (ssb * blen) + ssb
-        buffer = bytearray(bufferlen)
-        view = memoryview(buffer).cast('B')
-        view32 = np.ndarray((bufferlen // 4,), dtype=np.int32, buffer=view)
-
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.connect((self.uut, port))
-            if save: fp = open(save, 'wb')
-            
-            start = 0
-            cursor = 0
-            total_bytes = 0
-            timestart = 0
-            printlast = 0
-            missed_samples = 0
-
-            print(f"Stream start {f'{megabytes}MB' if megabytes else f'{seconds}s'} from {self.uut}:{port} to {save if save else 'null'}")
-            try:
-                while True:
-                    nbytes = sock.recv_into(view[cursor:])
-                    if nbytes == 0: break # UUT has stopped
-                    
-                    cursor += nbytes
-                    total_bytes += nbytes
-                    if timestart == 0: timestart = time.time()
-
-                    if cursor >= bufferlen:
-
-                        if save: fp.write(buffer[ start : cursor ])
-
-                        if check >= 0:
-                            spad0 = view32[check::ssb // 4]
-                            missed = np.sum(np.abs(np.diff(spad0) - 1))
-                            if missed: print(f'Warning: {missed} samples missed')
-                            missed_samples += missed
-                            buffer[ 0 : ssb ] = buffer[ cursor - ssb : ]
-                            start = ssb
-
-                        cursor = ssb
-                        runtime = time.time() - timestart
-
-                        if update > 0 and runtime - printlast > update:
-                            print(f"Streaming {runtime:.2f}s {(total_bytes >> 20) / runtime:.2f} MB/s {total_bytes >> 20} MB {f'{missed_samples} missing' if check >= 0 else ''}")
-                            print(LINE_UP + ERASE_LINE , end="")
-                            printlast = runtime
-
-                        if seconds and runtime > seconds:
-                            print('Stream stop reached target runtime')
-                            break
-
-                        if megabytes and total_bytes + bufferlen >= megabytes << 20:
-                            print('Stream stop reached target max bytes')
-                            break
-
-            except KeyboardInterrupt: pass
-            if save: fp.close()
-        print(f"Stream complete {runtime:.2f}s {total_bytes} bytes {total_bytes // ssb} samples {f'{missed_samples} missing' if check >= 0 else ''}")
+        blocklen = ssb * blen
+        if direct:
+            blocklen = streaming.aligned_blocklen(blocklen, ssb)
+
+        stages = []
+        checker = None
+        if check >= 0:
+            checker = ContinuityCheck(ssb, check, log=check_log)
+            stages.append(checker)
+        if pyramid and save:
+            wsize = 4 if int(self.s0.data32) else 2
+            stages.append(PyramidStage(save, ssb // wsize, np.int32 if wsize == 4 else np.int16))
+
+        reader = streaming.StreamReader(self.uut, port, nslots, blocklen, data_size=4)
+        writer = streaming.StreamWriter(reader, save, maxbytes=megabytes << 20 if megabytes else 0,
+                                        rotate=rotate << 20 if rotate else 0, direct=direct,
+                                        preallocate=preallocate, stages=stages)
+
+        print(f"Stream start {f'{megabytes}MB' if megabytes else f'{seconds}s'} from {self.uut}:{port} to {save if save else 'null'}")
+        reader.start()
+        writer.start()
+        runtime = 0
+        try:
+            while writer.is_alive():
+                writer.join(update if update > 0 else 0.5)
+                if writer.timestart == 0:
+                    continue
+                runtime = time.time() - writer.timestart
+                total_bytes = writer.bytes
+
+                if update > 0 and runtime > 0:
+                    print(f"Streaming {runtime:.2f}s {(total_bytes >> 20) / runtime:.2f} MB/s {total_bytes >> 20} MB {f'{checker.missed} missing' if checker else ''}")
+                    print(LINE_UP + ERASE_LINE , end="")
+
+                if seconds and runtime > seconds:
+                    print('Stream stop reached target runtime')
+                    break
+
+        except KeyboardInterrupt: pass
+        reader.stop()
+        writer.join()
+        if writer.maxbytes_reached:
+            print('Stream stop reached target max bytes')
+        total_bytes = writer.bytes
+        st = writer.stats()
+        print(f"Stream complete {runtime:.2f}s {total_bytes} bytes {total_bytes // ssb} samples {f'{checker.missed} missing' if checker else ''}")
+        print(f"Stall receive {st['rx_stall']:.3f}s write {st['write_time']:.3f}s max write {st['max_write_time']:.3f}s "
+              f"{f'files {len(writer.files)}' if rotate else ''}")
 
     def get_stream_mask(self):
         """Get stream subset mask channels as list"""
@@ -1713,29 +1954,111 @@ class Acq400:
         if self.statmon.get_state() != state: return True
         return False
     
+    def wait_for_state(self, state, timeout=60):
+        """Wait for transient state == arg or timeout, driven by the status monitor
+
+        Args:
+            state (int or str): STATE value or name eg "ARM"
+            timeout (float, optional): seconds, 0 waits forever. Defaults to 60.
+
+        Raises:
+            TimeoutError: state not reached in timeout
+            StatusMonitorStopped: the status monitor broke or quit first
+        """
+        state = STATE.value(state) if isinstance(state, str) else state
+        if not self.statmon.wait_for(lambda st: st[SF.STATE] == state, timeout if timeout else None):
+            self.check_statmon(f'waiting for {STATE.str(state)}')
+            raise TimeoutError(f'{self.uut} failed to reach {STATE.str(state)}')
+
+    def check_statmon(self, descr):
+        """raise StatusMonitorStopped if the status monitor can no longer wake a wait"""
+        if self.statmon.break_requested or self.statmon.quit_requested:
+            raise StatusMonitorStopped(f'{self.uut} status monitor stopped {descr}')
+
     def wait_for_arm(self, timeout=60):
         """Wait for state == ARM or timeout"""
         #Warning may break with AUTO_SOFT_TRIGGER=1
-        t0 = time.time()
-        while self.state_not(STATE.ARM):
-            if timeout and time.time() - t0 > timeout: raise TimeoutError(f'{self.uut} failed to reach ARM')
-            time.sleep(1)
+        self.wait_for_state(STATE.ARM, timeout)
 
     def wait_for_idle(self, timeout=60):
         """Wait for state == IDLE or timeout"""
+        self.wait_for_state(STATE.IDLE, timeout)
+
+    def wait_for_knob(self, test, timeout=60, recheck=0.05, recheck_max=None):
+        """Wait for test() to be true, re-tested on every state change
+
+        test() usually reads a knob. The status monitor wakes the wait
+        on each transition, but it does not report knobs such as
+        CONTINUOUS_STATE, so those are only seen on the recheck poll:
+        recheck is the latency of the wait, one knob read per recheck.
+        With recheck_max, the poll interval doubles up to recheck_max,
+        so a long wait costs few knob reads.
+
+        Args:
+            test (func): returns True when done
+            timeout (float, optional): seconds, 0 waits forever. Defaults to 60.
+            recheck (float, optional): max seconds between tests. Defaults to 0.05.
+            recheck_max (float, optional): back off to this interval. Defaults to recheck.
+
+        Raises:
+            TimeoutError: test() not true in timeout
+            StatusMonitorStopped: the status monitor broke or quit first
+        """
         t0 = time.time()
-        while self.state_not(STATE.IDLE):
-            if timeout and time.time() - t0 > timeout: raise TimeoutError(f'{self.uut} failed to reach IDLE')
-            time.sleep(1)
+        while True:
+            count = self.statmon.state_count
+            if test():
+                return
+            self.check_statmon('in wait_for_knob')
+            remaining = timeout - (time.time() - t0) if timeout else recheck
+            if remaining <= 0:
+                raise TimeoutError(f'{self.uut} wait_for_knob timeout')
+            self.statmon.wait_for(lambda st: self.statmon.state_count != count, min(recheck, remaining))
+            if recheck_max:
+                recheck = min(recheck * 2, recheck_max)
+
+    def wait_for_continuous_state(self, state, timeout=60, recheck=0.05, recheck_max=1.0):
+        """Wait for CONTINUOUS:STATE == arg or timeout, eg "ARM", "RUN", "IDLE"
+
+        This wait is not event driven: the TSTAT stream carries the
+        transient state only, CONTINUOUS:STATE is not in it, so the knob
+        is polled. The poll starts at recheck and backs off to recheck_max,
+        a transient state change wakes it early.
+
+        Args:
+            state (str): "ARM", "RUN", "IDLE" ..
+            timeout (float, optional): seconds, 0 waits forever. Defaults to 60.
+            recheck (float, optional): first poll interval. Defaults to 0.05.
+            recheck_max (float, optional): longest poll interval. Defaults to 1.0.
+
+        Raises:
+            TimeoutError: state not reached in timeout
+            StatusMonitorStopped: the status monitor broke or quit first
+        """
+        try:
+            self.wait_for_knob(lambda: pv(self.s0.CONTINUOUS_STATE) == state, timeout, recheck, recheck_max)
+        except TimeoutError:
+            raise TimeoutError(f'{self.uut} failed to reach CONTINUOUS:STATE {state}')
 
     def wait_for_samples(self, samples, timeout=60):
-        """Wait for samples >= arg or timeout"""
+        """Wait for samples >= arg or timeout
+
+        Sleeps until the sample count is predicted to arrive, from the rate
+        seen so far, rather than a fixed 1s.
+        """
         t0 = time.time()
+        t1, s1 = t0, None
         while True:
             current_samples = int(pv(self.s0.CONTINUOUS_SC))
+            tn = time.time()
             if current_samples >= samples: break
-            if timeout and time.time() - t0 > timeout: return TimeoutError(f'{self.uut} failed to reach sample target')
-            time.sleep(1)
+            if timeout and tn - t0 > timeout: raise TimeoutError(f'{self.uut} failed to reach sample target')
+            delay = 1.0
+            if s1 is not None and current_samples > s1:
+                rate = (current_samples - s1) / (tn - t1)
+                delay = min(delay, max(0.01, (samples - current_samples) / rate))
+            t1, s1 = tn, current_samples
+            time.sleep(delay)
 
     def ident_spad(self):
         """Add identity values into each spad e.g. SPAD[7]=0x7777777"""
@@ -1764,22 +2087,23 @@ class Acq400:
             demux=0,
         ):
         """Configures UUT for capture"""
-        self.s0.transient = f"PRE={pre} POST={post} SOFT_TRIGGER={soft} DEMUX={demux}"
-        self.sA.trg = trigger
-        self.sA.event0 = event0
-        self.sA.event1 = event1
-        self.sA.rgm = rgm
-        self.sA.RTM_TRANSLEN = translen
-
-        if spad: self.s0.spad = spad
-
         if not self.is_master() and trigger != '0,0,0':
             #Only master can soft trigger
             trigger = trigger.split(',')
             trigger[1] = '0'
-            self.sA.trg = ','.join(trigger)
+            trigger = ','.join(trigger)
+
+        with self.s0.batch(), self.sA.batch():
+            self.s0.transient = f"PRE={pre} POST={post} SOFT_TRIGGER={soft} DEMUX={demux}"
+            self.sA.trg = trigger
+            self.sA.event0 = event0
+            self.sA.event1 = event1
+            self.sA.rgm = rgm
+            self.sA.RTM_TRANSLEN = translen
+
+            if spad: self.s0.spad = spad
 
-        self.s0.run0 = f"{self.s0.sites} {self.s0.spad}"
+        self.s0.run0 = "{} {}".format(*self.s0.sr_many(("sites", "spad")))
 
 def pv(_pv):
     return _pv.split(" ")[1]
@@ -1849,10 +2173,11 @@ class Acq2106(Acq400):
                 sn_map.append((f's{site}', int(site)))
         for ( service_name, site ) in sn_map:
             try:
-                self.svc[service_name] = netclient.Siteclient(self.uut, AcqPorts.SITE0 + site)
+                self.svc[service_name] = self.new_site_client(site)
             except socket.error:
                 print("uut {} site {} not populated".format(_uut, site))
             self.mod_count += 1
+        self.knob_cache.save()
 
     def set_mb_clk(self, hz=4000000, src="zclk", fin=1000000):
         print("set_mb_clk {} {} {}".format(hz, src, fin))
@@ -2048,36 +2373,51 @@ def sigsel(enable=1, dx=1, site=None, edge=1):
         return "{},{},{}".format(enable, dx, edge)
 
 
-def factory(_uut):
-    """deduce what sort of uut this is and invoke the appropriate class
+def connect_site0(_uut, s0_client=None):
+    """open (or adopt) the site 0 client and validate the knob cache against it
 
-    Preferred to init hapi instance
+    costs one pipelined round trip when the cache is valid, the help
+    query is only sent when the cache is missing or stale.
 
     Args:
         _uut (str): uut hostname or ip-address
+        s0_client (netclient.Siteclient, optional): existing siteclient. Defaults to None.
 
     Returns:
-        acq400: uut hapi instance
+        (knob_cache.KnobCache, netclient.Siteclient)
     """
-    try:
-        cached = Acq400.uuts[_uut]
-        return cached
-    except KeyError:
-        pass
+    cache = knob_cache.KnobCache.instances.get(_uut)
+    if s0_client and cache and cache.s0 is s0_client:
+        return cache, s0_client         # validated by factory()
+
+    cache = knob_cache.KnobCache(_uut)
+    knobstr = None if s0_client else cache.help(0, validated=False)
+    s0 = s0_client if s0_client else netclient.Siteclient(_uut, AcqPorts.SITE0, knobstr=knobstr)
+    if not cache.validate(s0):
+        if knobstr is not None:
+            s0.build_knobs(s0.sr("help"))       # knobs came from a stale cache
+        cache.store_help(0, s0)
+    return cache, s0
+
+def factory_probe(s0):
+    """probe s0 for the hapi class to use
 
-    s0 = netclient.Siteclient(_uut, AcqPorts.SITE0)
+    Args:
+        s0 (netclient.Siteclient): site 0 client
 
+    Returns:
+        (class, dict): hapi class and its constructor kwargs
+    """
     acq2106_models = ('acq2106', 'acq2206', 'z7io', 'acq1102')
     model = s0.MODEL
 
-
     if not model.startswith(acq2106_models):
-        return Acq400(_uut, s0_client=s0)
+        return Acq400, {}
 
     # here with acq2106
     try:
         if  s0.is_tiga != "none":
-            return Acq2106_TIGA(_uut, s0_client=s0)
+            return Acq2106_TIGA, {}
     except:
         pass
 
@@ -2088,7 +2428,7 @@ def factory(_uut):
 
     try:
         if has_sfp and s0.has_mgtdram != "none":
-            return Acq2106_Mgtdram8(_uut, s0_client=s0)
+            return Acq2106_Mgtdram8, {}
     except:
         pass
 
@@ -2107,10 +2447,42 @@ def factory(_uut):
     except:
         has_hudp = False
 
+    kwargs = dict(has_dsp=has_dsp, has_comms=has_sfp, has_wr=has_wr, has_hudp=has_hudp)
     if (model.startswith('acq1102')):
-        return Acq1102(_uut, s0_client=s0, has_dsp=has_dsp, has_comms=has_sfp, has_wr=has_wr, has_hudp=has_hudp)
+        return Acq1102, kwargs
     else:
-        return Acq2106(_uut, s0_client=s0,  has_dsp=has_dsp, has_comms=has_sfp, has_wr=has_wr, has_hudp=has_hudp)
+        return Acq2106, kwargs
+
+def factory(_uut):
+    """deduce what sort of uut this is and invoke the appropriate class
+
+    Preferred to init hapi instance. The decision is held in the knob cache,
+    so a known uut is not probed again.
+
+    Args:
+        _uut (str): uut hostname or ip-address
+
+    Returns:
+        acq400: uut hapi instance
+    """
+    try:
+        cached = Acq400.uuts[_uut]
+        return cached
+    except KeyError:
+        pass
+
+    cache, s0 = connect_site0(_uut)
+
+    factory_classes = dict((cls.__name__, cls) for cls in \
+                    (Acq400, Acq2106, Acq2106_TIGA, Acq2106_Mgtdram8, Acq1102))
+    decision = cache.get_factory()
+    if decision and decision[0] in factory_classes:
+        cls, kwargs = factory_classes[decision[0]], decision[1]
+    else:
+        cls, kwargs = factory_probe(s0)
+        cache.set_factory(cls.__name__, kwargs)
+
+    return cls(_uut, s0_client=s0, **kwargs)
 
 def get_hapi():
     ''' find instance of hapi '''
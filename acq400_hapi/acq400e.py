@@ -17,6 +17,8 @@ import time
 import socket
 from enum import Enum
 
+from .continuity import ContinuityCheck
+
 LINE_UP = '\033[1A'
 ERASE_LINE = '\033[2K'
 
@@ -121,10 +123,12 @@ class acq400e:
         pvname = pv.format(uut=self.uut)
         return self.pvs[pvname].value
     
-    def stream_to_disk(self, ssb=None, maxbytes=None, maxtime=None, update=True):
+    def stream_to_disk(self, ssb=None, maxbytes=None, maxtime=None, update=True, check=-1, check_log=None):
+        """stream to self.datafile, check >= 0 checks the sample counter at that 32 bit column"""
 
         ssb = ssb if ssb else int(self.s0.SSB)
         bufferlen = ssb * 1024
+        checker = ContinuityCheck(ssb, check, log=check_log) if check >= 0 else None
 
         buffer = bytearray(bufferlen)
         byteview = memoryview(buffer).cast('B')
@@ -153,6 +157,8 @@ class acq400e:
                             tt = time.time() - t0
                             print(f"Streaming {int(tt)}s {(tbytes >> 20) / tt:.5f} MB/s > {self.datafile}")
 
+                        if checker:
+                            checker(byteview[:index])
                         fp.write(buffer[:index])
                         index = 0
 
@@ -173,6 +179,9 @@ class acq400e:
                 fp.flush()
             sock.shutdown(socket.SHUT_RDWR)
         print(f"{tbytes:,} bytes {tbytes // ssb:,} samples total")
+        if checker:
+            checker.close()
+            print(f"check {checker.stats()}")
 
     def stop_stream(self):
         self.stop_flag = True
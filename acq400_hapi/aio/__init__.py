@@ -0,0 +1,12 @@
+"""asyncio transport for D-Tacq uuts
+
+**comprised of** :
+    * netclient.py : AsyncNetclient, AsyncSiteclient, AsyncLogclient
+    * acq400.py : AsyncAcq400, awaitable proxy for an ACQ400 UUT
+
+One event loop can drive many uuts without a thread per site or monitor.
+Not imported by acq400_hapi itself, use ``from acq400_hapi.aio import AsyncAcq400``
+"""
+
+from .netclient import AsyncNetclient, AsyncSiteclient, AsyncLogclient
+from .acq400 import AsyncAcq400
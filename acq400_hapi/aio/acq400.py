@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+"""
+aio/acq400.py asyncio host-side proxy for one acq400 appliance
+
+- enumerates all site services concurrently, available as uut.sX
+- monitors TSTAT in a task, provides awaitable state events
+- read_chan() / read_channels() pull post shot data with no copies
+
+ - eg::
+
+       async def shot(name):
+           uut = await AsyncAcq400.create(name)
+           await uut.s0.set_knob("set_arm", 1)
+           await uut.wait_armed(timeout=10)
+           await uut.wait_stopped()
+           return await uut.read_channels((1, 2))
+
+       asyncio.run(asyncio.gather(*(shot(u) for u in uuts)))
+"""
+
+import asyncio
+import socket
+
+import numpy as np
+
+from .netclient import AsyncSiteclient, AsyncLogclient
+from ..acq400 import AcqPorts, SF, STATE, Statusmonitor
+from ..knob_cache import KnobCache
+from .. import utils
+
+
+class AsyncAcq400:
+    """asyncio proxy for Acq400 uut. Create with ``await AsyncAcq400.create(uut)``
+
+    Args:
+        uut (str): uut hostname or ip-address
+    """
+
+    def __init__(self, uut):
+        self.uut = uut
+        self.svc = {}
+        self.sites = []
+        self.status = [0, 0, 0, 0, 0]
+        self.statmon = None
+        self.logclient = None
+        self.armed = asyncio.Event()
+        self.stopped = asyncio.Event()
+        self.state_changed = asyncio.Condition()
+
+    def __repr__(self):
+        return "AsyncAcq400({})".format(self.uut)
+
+    @classmethod
+    async def create(cls, uut, monitor=True):
+        """connect to all site services and optionally start the status monitor
+
+        Args:
+            uut (str): uut hostname or ip-address
+            monitor (bool, optional): start status monitor task. Defaults to True.
+        """
+        self = cls(uut)
+        cache = KnobCache(uut)
+        knobstr = cache.help(0, validated=False)
+        s0 = await AsyncSiteclient.create(uut, AcqPorts.SITE0, knobstr=knobstr)
+        ident = dict(zip(cache.IDENT, await s0.sr_many(cache.IDENT)))
+        if not cache.check(ident):
+            if knobstr is not None:
+                s0.build_knobs(await s0.sr("help"))     # knobs came from a stale cache
+            cache.store_help(0, s0)
+        self.svc["s0"] = s0
+
+        self.sites = [int(sm.split("=")[0]) for sm in ident["SITELIST"].split(",")[1:]]
+
+        async def site_client(site):
+            knobstr = cache.help(site)
+            svc = await AsyncSiteclient.create(uut, AcqPorts.SITE0+site, knobstr=knobstr)
+            if knobstr is None:
+                cache.store_help(site, svc)
+            return svc
+
+        for site, svc in zip(self.sites, await asyncio.gather(*(site_client(s) for s in self.sites))):
+            self.svc["s%d" % site] = svc
+        cache.save()
+        await self.make_sa_sd_aliases()
+
+        if monitor:
+            await self.start_monitor()
+        return self
+
+    async def make_sa_sd_aliases(self):
+        """ as Acq400.make_sa_sd_aliases(): sD distributor master, sA aggregator master """
+        distributor, aggregator = await self.s0.sr_many(("distributor", "aggregator"))
+
+        async def master(kv):
+            sites = utils.extract_key_values(kv).get('sites', 'none')
+            if sites.lower() == 'none':
+                return None
+            for site in sites.split(','):
+                if await self[site].module_role == 'MASTER':
+                    return self[site]
+            return None
+
+        self.svc["sD"] = await master(distributor)
+        self.svc["sA"] = await master(aggregator) or self.svc["sD"] or self.svc.get("s1")
+
+    def __getattr__(self, name):
+        svc = self.__dict__.get("svc")
+        if svc and svc.get(name) is not None:
+            return svc.get(name)
+        msg = "'{0}' object has no attribute '{1}'"
+        raise AttributeError(msg.format(type(self).__name__, name))
+
+    def __getitem__(self, site):
+        if type(site) == str and not site.isnumeric():
+            return self.svc[f"c{site}"]
+        return self.svc[f"s{site}"]
+
+    async def start_monitor(self):
+        try:
+            self.status = [int(x) for x in (await self.s0.state).replace('STX ', '').split(" ")]
+        except Exception:
+            self.status = [0, 0, 0, 0, 0]
+        self.logclient = await AsyncLogclient.create(self.uut, AcqPorts.TSTAT)
+        self.statmon = asyncio.ensure_future(self.st_monitor())
+
+    async def st_monitor(self):
+        """status monitor task, same state rules as Statusmonitor.st_monitor"""
+        async for st in self.logclient:
+            event, status1 = Statusmonitor.parse(st)
+            if event != "status":
+                continue
+            state0 = self.status[SF.STATE]
+            state1 = status1[SF.STATE]
+            self.status = status1
+            if state0 != 0 and state1 == 0:
+                self.stopped.set()
+                self.armed.clear()
+            if state1 == STATE.ARM:
+                self.armed.set()
+                self.stopped.clear()
+            async with self.state_changed:
+                self.state_changed.notify_all()
+
+    def state(self):
+        return self.status[SF.STATE]
+    def pre_samples(self):
+        return self.status[SF.PRE]
+    def post_samples(self):
+        return self.status[SF.POST]
+    def elapsed_samples(self):
+        return self.status[SF.ELAPSED]
+    def samples(self):
+        return self.pre_samples() + self.post_samples()
+
+    async def wait_for(self, predicate, timeout=None):
+        """wait until predicate(status) is true, on every TSTAT update
+
+        Raises:
+            asyncio.TimeoutError
+        """
+        async def _wait():
+            async with self.state_changed:
+                await self.state_changed.wait_for(lambda: predicate(self.status))
+        await asyncio.wait_for(_wait(), timeout)
+        return self.status
+
+    async def wait_for_state(self, state, timeout=None):
+        return await self.wait_for(lambda st: st[SF.STATE] == state, timeout)
+
+    async def wait_armed(self, timeout=None):
+        """wait for ARM"""
+        await asyncio.wait_for(self.armed.wait(), timeout)
+        self.armed.clear()
+
+    async def wait_stopped(self, timeout=None):
+        """wait for the transition back to IDLE"""
+        await asyncio.wait_for(self.stopped.wait(), timeout)
+        self.stopped.clear()
+
+    async def read(self, port, nbytes, out=None):
+        """read up to nbytes from a data port straight into out
+
+        Args:
+            port (int): service port see AcqPorts
+            nbytes (int): bytes to read
+            out (writable buffer, optional): destination. Defaults to new bytearray.
+
+        Returns:
+            memoryview: the bytes received
+        """
+        loop = asyncio.get_running_loop()
+        buf = out if out is not None else bytearray(nbytes)
+        view = memoryview(buf).cast('B')[:nbytes]
+        pos = 0
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setblocking(False)
+            await loop.sock_connect(sock, (self.uut, port))
+            while pos < nbytes:
+                nrx = await loop.sock_recv_into(sock, view[pos:])
+                if nrx == 0:
+                    break
+                pos += nrx
+        return view[:pos]
+
+    async def read_chan(self, chan, nsam=0, data_size=2, out=None):
+        """read one channel post shot data
+
+        Args:
+            chan (int): channel number, 0 for raw data
+            nsam (int, optional): samples. Defaults to pre+post.
+            data_size (int, optional): 2|4. Defaults to 2.
+            out (ndarray, optional): destination array. Defaults to new array.
+
+        Returns:
+            ndarray: channel data, a view of out if supplied
+        """
+        dtype = np.dtype('i4' if data_size == 4 else 'i2')
+        if nsam == 0:
+            nsam = self.samples() if out is None else out.size
+        if out is None:
+            out = np.empty(nsam, dtype)
+        view = await self.read(AcqPorts.DATA0+chan, nsam*data_size, out)
+        return out[:len(view)//data_size]
+
+    async def read_channels(self, channels, nsam=0, data_size=2, max_connections=8):
+        """read several channels concurrently into one [nchan, nsam] array"""
+        if nsam == 0:
+            nsam = self.samples()
+        dtype = np.dtype('i4' if data_size == 4 else 'i2')
+        data = np.zeros((len(channels), nsam), dtype)
+        sem = asyncio.Semaphore(max_connections)
+
+        async def one(ix, ch):
+            async with sem:
+                await self.read_chan(ch, nsam, data_size, out=data[ix])
+
+        await asyncio.gather(*(one(ix, ch) for ix, ch in enumerate(channels)))
+        return data
+
+    async def close(self):
+        if self.statmon:
+            self.statmon.cancel()
+        if self.logclient:
+            await self.logclient.close()
+        for svc in set(s for s in self.svc.values() if s is not None):
+            await svc.close()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+aio/netclient.py asyncio equivalents of Netclient, Siteclient and Logclient
+
+- one event loop holds the connections to any number of uuts, no threads
+- AsyncSiteclient.sr_many() pipelines commands like Siteclient.sr_many()
+
+ - eg::
+
+       s0 = await AsyncSiteclient.create("acq2106_123", 4220)
+       print(await s0.MODEL)
+       await s0.set_knob("spad1", "0x1234")
+"""
+
+import asyncio
+import os
+import re
+
+
+class AsyncNetclient:
+    """connects and holds open a stream to defined port.
+
+    Args:
+        addr (str) : ip-address or dns name on network
+        port (int) : server port number.
+    """
+
+    trace = int(os.getenv("NETCLIENT_TRACE", "0"))
+
+    def __init__(self, addr, port):
+        self.__dict__.update(_addr=addr, _port=int(port), reader=None, writer=None, buffer=bytearray())
+
+    async def connect(self):
+        if AsyncNetclient.trace > 1:
+            print("AsyncNetclient(%s, %d) connect" % (self._addr, self._port))
+        self.reader, self.writer = await asyncio.open_connection(self._addr, self._port)
+        return self
+
+    async def receive_message(self, termex, maxlen=4096):
+        """Read from the stream until termex matches.
+
+        Args:
+            termex (bytes regex): group(1) defines the terminator
+            maxlen (int): max read size
+
+        Returns:
+            str: message before the terminator
+        """
+        match = termex.search(self.buffer)
+        while match is None:
+            rx = await self.reader.read(maxlen)
+            if not rx:
+                raise ConnectionResetError("{} closed by peer".format(repr(self)))
+            self.buffer += rx
+            if AsyncNetclient.trace > 1:
+                print("self.buffer {}".format(self.buffer))
+            match = termex.search(self.buffer)
+
+        rc = self.buffer[:match.start(1)].decode("latin-1")
+        del self.buffer[:match.end(1)]
+        return rc
+
+    async def send(self, message):
+        if AsyncNetclient.trace > 1:
+            print("send({})".format(message))
+        self.writer.write(message.encode())
+        await self.writer.drain()
+
+    async def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        self.writer = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def addr(self):
+        return self._addr
+
+    def port(self):
+        return self._port
+
+    def __repr__(self):
+        return '%s(%s, %d)' % (type(self).__name__, self._addr, self._port)
+
+
+class AsyncLogclient(AsyncNetclient):
+    """AsyncNetclient optimised for logging, line by line
+
+    supports ``async for line in logclient``
+    """
+    def __init__(self, addr, port):
+        AsyncNetclient.__init__(self, addr, port)
+        self.termex = re.compile(b"(\r\n)")
+
+    @classmethod
+    async def create(cls, addr, port):
+        return await cls(addr, port).connect()
+
+    async def poll(self):
+        return await self.receive_message(self.termex)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.poll()
+        except (ConnectionError, AttributeError):
+            raise StopAsyncIteration
+
+
+class AsyncSiteclient(AsyncNetclient):
+    """AsyncNetclient for site service, may be multi-line response.
+
+    Knob queries are awaitable properties, ``await s0.NCHAN``.
+    Knob sets must be awaited too, so use ``await s0.set_knob(name, value)``.
+    """
+    pat = re.compile(r"[:.]")
+    termex = re.compile(rb"\n(acq400.[0-9]+ ([0-9]+) >)")
+
+    trace = int(os.getenv("SITECLIENT_TRACE", "0"))
+
+    def __init__(self, addr, port):
+        AsyncNetclient.__init__(self, addr, port)
+        self.__dict__.update(knobs={}, lock=asyncio.Lock(), show_responses=False)
+
+    @classmethod
+    async def create(cls, addr, port, knobstr=None):
+        """connect and enumerate knobs
+
+        Args:
+            addr (str) : ip-address or dns name on network
+            port (int) : server port number
+            knobstr (str, optional) : known knob list, skips the help query. Defaults to None.
+        """
+        self = await cls(addr, port).connect()
+        await self.sr("prompt on")
+        self.build_knobs(knobstr if knobstr is not None else await self.sr("help"))
+        return self
+
+    async def sr_many(self, messages):
+        """send several commands back-to-back, then receive all the replies
+
+        Args:
+            messages (list) : commands (queries) to send
+
+        Returns:
+            rxs (list): response strings, one per message
+        """
+        messages = list(messages)
+        async with self.lock:
+            if self.trace:
+                for message in messages:
+                    print("%s >%s" % (repr(self), message))
+            self.writer.write("".join(message+"\n" for message in messages).encode())
+            await self.writer.drain()
+            rxs = []
+            for message in messages:
+                rx = (await self.receive_message(self.termex)).rstrip()
+                if self.show_responses and len(rx) > 1:
+                    print(rx)
+                if self.trace:
+                    print("%s <%s" % (repr(self), rx))
+                rxs.append(rx)
+        return rxs
+
+    async def sr(self, message):
+        """send a command and receive a reply
+
+        Args:
+            message (str) : command (query) to send
+
+        Returns:
+            rx (str): response string
+        """
+        return (await self.sr_many([message]))[0]
+
+    def build_knobs(self, knobstr):
+        self.knobs = dict((AsyncSiteclient.pat.sub(r"_", key), key) for key in knobstr.split())
+
+    def help(self, regex = ".*"):
+        """list available knobs, optionally filtered by regex."""
+        regex = re.compile(regex)
+        return [key for key in sorted(self.knobs) if regex.match(key)]
+
+    def _knob(self, name):
+        knob = self.knobs.get(name)
+        if knob is None:
+            msg = "'{0}' object has no attribute '{1}'"
+            raise AttributeError(msg.format(type(self).__name__, name))
+        return knob
+
+    async def get_knob(self, name):
+        return await self.sr(self._knob(name))
+
+    async def set_knob(self, name, value):
+        return await self.sr("%s=%s" % (self._knob(name), value))
+
+    async def set_knobs(self, **kwargs):
+        """set several knobs in one round trip"""
+        return await self.sr_many(["%s=%s" % (self._knob(k), v) for k, v in kwargs.items()])
+
+    def __getattr__(self, name):
+        knobs = self.__dict__.get("knobs")
+        if knobs and knobs.get(name) is not None:
+            return self.sr(knobs.get(name))
+        msg = "'{0}' object has no attribute '{1}'"
+        raise AttributeError(msg.format(type(self).__name__, name))
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get("knobs") and name in self.knobs:
+            raise AttributeError("{} knob {} set needs await set_knob()".format(repr(self), name))
+        object.__setattr__(self, name, value)
@@ -2,6 +2,8 @@
 import numpy as np
 import os
 
+from . import waveforms
+
 
 class AwgDefaults:
     def __init__(self, uut_name):
@@ -38,9 +40,7 @@ class RunsFiles:
 class SinGen:
     NCYCLES = 5
     def sin(self):
-        nsam = self.nsam
-        NCYCLES = self.NCYCLES
-        return np.sin(np.array(list(range(nsam)))*NCYCLES*2*np.pi/nsam)   # sin, amplitude of 1 (volt)
+        return waveforms.sin(self.nsam, self.NCYCLES)   # sin, amplitude of 1 (volt)
 
 class AllFullScale(SinGen):
     def __init__(self, uut, nchan, nsam, run_forever=False):
@@ -49,14 +49,12 @@ class AllFullScale(SinGen):
         self.nsam = nsam
         self.run_forever = run_forever
         self.sw = self.sin()
-        self.aw = np.zeros((nsam,nchan))
-        for ch in range(nchan):
-            self.aw[:,ch] = self.sw
+        self.aw = np.broadcast_to(self.sw[:,None], (nsam,nchan))
 
     def load(self, autorearm = False):
         for ii in range(99999 if self.run_forever else 1):
             for ch in range(self.nchan):
-                self.uut.load_awg((self.aw*(2**15-1)).astype(np.int16), autorearm = autorearm)
+                self.uut.load_awg(waveforms.full_scale(self.nchan, self.nsam, self.NCYCLES), autorearm = autorearm)
                 print("loaded array ", self.aw.shape)
                 yield ch
 
@@ -71,17 +69,10 @@ class RainbowGen:
         return np.add(self.sw, self.offset(ch))
 
     def sin(self):
-        nsam = self.nsam
-        NCYCLES = self.NCYCLES    
-        return np.sin(np.array(list(range(nsam)))*NCYCLES*2*np.pi/nsam)   # sin, amplitude of 1 (volt)
+        return waveforms.sin(self.nsam, self.NCYCLES)   # sin, amplitude of 1 (volt)
 
     def sinc(self, ch):
-        nsam = self.nsam
-        nchan = self.nchan
-        NCYCLES = self.NCYCLES
-        xoff = ch*100
-        xx = np.array(list(range(-nsam//2-xoff, nsam//2-xoff)))*NCYCLES*2*np.pi/nsam
-        return [ np.sin(x)/x if x != 0 else 1 for x in xx ]
+        return waveforms.sinc(self.nsam, self.NCYCLES, ch*100)
 
     def __init__(self, uut, nchan, nsam, run_forever=False, ao0 = 0):
         self.uut = uut
@@ -90,20 +81,16 @@ class RainbowGen:
         self.ao0 = ao0
         self.run_forever = run_forever
         self.sw = self.sin()        
-        self.aw = np.zeros((nsam,nchan))
         self.defs = AwgDefaults(uut.uut)
         self.gain = 1.0
         try:   
             self.current = self.defs.read_defaults()
             print("self.current len {} self.nchan {}".format(len(self.current), self.nchan))
-            for ch in range(0, len(self.current)):            
-                self.aw[:,self.ao0+ch] = self.current[ch]    
         except IOError:
             self.current = np.zeros(self.nchan)
             print("no defaults")
 
-        for ch in range(nchan):
-            self.aw[:,ch] = self.rainbow(ch)            
+        self.aw = np.add.outer(self.sw, self.offset(np.arange(nchan)))
 
     def build(self, ch, sinc_off_ch=-1):
         if sinc_off_ch == -1:
@@ -111,15 +98,29 @@ class RainbowGen:
         aw1 = np.copy(self.aw)
         aw1[:,ch] = np.add(np.multiply(self.sinc(sinc_off_ch),5),2)
         awr = (aw1*(2**15-1)/10)/self.gain
-        for chx in range(len(self.current)):
-            awr[:,self.ao0+chx] += self.current[chx]
+        awr[:,self.ao0:self.ao0+len(self.current)] += self.current
         return awr
+
+    def pattern(self, ch, sinc_off_ch=-1):
+        """build(ch) as int16, cached: a repeat play of the same pattern is free
+
+        Samples beyond the int16 range, eg sinc plus large AwgDefaults currents,
+        are clipped to full scale, where build(ch).astype(np.int16) wrapped.
+        """
+        return waveforms.rainbow(self.nchan, self.nsam, ch, None if sinc_off_ch == -1 else sinc_off_ch,
+                                 self.NCYCLES, self.gain, tuple(np.asarray(self.current).tolist()), self.ao0)
     
     def load(self, autorearm = False, continuous=False):
+        """play pattern(ch) for each channel in turn
+
+        Patterns come from the waveforms cache. Out of range samples are
+        clipped to full scale, they used to wrap around, otherwise the
+        loaded data is unchanged.
+        """
         for ii in range(99999 if self.run_forever else 1):
             for ch in range(self.nchan):        
                 print("loading array ", self.aw.shape)        
-                self.uut.load_awg(self.build(ch).astype(np.int16), autorearm=autorearm, continuous=continuous)
+                self.uut.load_awg(self.pattern(ch), autorearm=autorearm, continuous=continuous)
                 print("loaded array ", self.aw.shape)
                 yield ch
 
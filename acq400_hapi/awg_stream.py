@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+"""
+awg_stream.py continuous AWG streaming to the uut AWG_STREAM port
+
+- AwgStreamer takes a generator of blocks, a list of blocks played as a ring,
+  or one block repeated. Blocks are NumPy arrays or any bytes-like, sent as is
+- a producer thread pulls blocks nbufs ahead of the sender thread (double
+  buffering), so a slow generator shows as underruns, not a gap mid block
+- swap() changes content at the next block boundary, flush=True drops blocks
+  already queued from the old source
+- TCP flow control paces the sender to the uut FIFO, rate= also paces the host
+  to rate bytes/s when the far end would accept data faster
+- stats() counts blocks, bytes, underruns, stall time and the achieved rate
+- when the sender ends, eg the uut drops the connection, the producer ends
+  too, is_alive() goes False and error holds the cause
+
+A generator may reuse a block buffer once it has yielded nbufs+1 further
+blocks, eg a ring of nbufs+2 preallocated arrays filled in turn.
+
+ - eg::
+
+       def waves():
+           ring = [ np.zeros(nsam*nchan, np.int16) for _ in range(4) ]
+           for ii in itertools.count():
+               yield fill(ring[ii % 4])
+
+       with AwgStreamer(uut.uut, waves()) as awg:
+           awg.started.wait()
+           uut.s0.soft_trigger = 1
+           awg.swap(other_pattern)
+           print(awg.stats())
+"""
+
+import queue
+import socket
+import threading
+import time
+
+import numpy as np
+
+from .awg_upload import as_bytes
+
+AWG_STREAM_PORT = 54207     # AcqPorts.AWG_STREAM, acq400.py imports this module
+POLL = 0.1                  # seconds between quit checks while waiting
+
+
+def ring(blocks):
+    """play a list of blocks forever"""
+    while True:
+        yield from blocks
+
+
+def blocks_of(source):
+    """block iterator from a generator, a list (ring) or one block (repeated)"""
+    if isinstance(source, (np.ndarray, bytes, bytearray, memoryview)):
+        return ring([ source ])
+    if isinstance(source, (list, tuple)):
+        return ring(source)
+    return iter(source)
+
+
+class AwgStreamer:
+    """feeds the uut AWG_STREAM port from a source of blocks
+
+    Args:
+        uut (str): uut hostname or ip-address
+        source: generator of blocks, list of blocks played as a ring, or one block
+        port (int, optional): uut port. Defaults to AWG_STREAM_PORT.
+        nbufs (int, optional): blocks queued ahead of the sender. Defaults to 2.
+        rate (float, optional): pace the host to rate bytes/s. Defaults to None, uut flow control only.
+        lead (int, optional): bytes the host may run ahead of rate. Defaults to 4MB.
+    """
+    def __init__(self, uut, source, port=AWG_STREAM_PORT, nbufs=2, rate=None, lead=0x400000):
+        self.uut = uut
+        self.port = port
+        self.source = blocks_of(source)
+        self.nbufs = nbufs
+        self.rate = rate
+        self.lead = lead
+        self.q = queue.Queue(nbufs)
+        self.lock = threading.Lock()
+        self.pending = None
+        self.gen = 0                # content generation, bumped by swap()
+        self.min_gen = 0            # queued blocks older than this are dropped
+        self.sock = None
+        self.threads = []
+        self.started = threading.Event()
+        self.quit_requested = False
+        self.sender_done = False    # sender has gone, eg the uut dropped the connection
+        self.error = None
+        self.t0 = None
+        self.t1 = None
+        self.blocks = 0
+        self.bytes = 0
+        self.underruns = 0
+        self.stall = 0.0
+        self.swaps = 0
+        self.dropped = 0
+
+    def __repr__(self):
+        return "AwgStreamer({}:{}) {}".format(self.uut, self.port, self.stats())
+
+    def stats(self):
+        dt = (self.t1 or time.time()) - self.t0 if self.t0 else 0
+        return { "blocks": self.blocks, "bytes": self.bytes, "seconds": round(dt, 3),
+                 "rate": self.bytes / dt / 0x100000 if dt > 0 else 0.0,
+                 "underruns": self.underruns, "stall": round(self.stall, 3),
+                 "swaps": self.swaps, "dropped": self.dropped, "queued": self.q.qsize() }
+
+    def start(self):
+        self.sock = socket.create_connection((self.uut, self.port))
+        self.threads = [ threading.Thread(target=self.producer, daemon=True),
+                         threading.Thread(target=self.sender, daemon=True) ]
+        for th in self.threads:
+            th.start()
+        return self
+
+    def swap(self, source, flush=False):
+        """play source from the next block boundary
+
+        Args:
+            source: as the constructor source
+            flush (bool, optional): drop blocks already queued from the old source. Defaults to False.
+        """
+        with self.lock:
+            self.gen += 1
+            self.pending = (self.gen, blocks_of(source))
+            if flush:
+                self.min_gen = self.gen
+
+    def put(self, item):
+        while not (self.quit_requested or self.sender_done):
+            try:
+                self.q.put(item, timeout=POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer(self):
+        source, gen = self.source, 0
+        try:
+            while not self.quit_requested:
+                with self.lock:
+                    if self.pending:
+                        (gen, source), self.pending = self.pending, None
+                        self.swaps += 1
+                try:
+                    block = next(source)
+                except StopIteration:
+                    with self.lock:
+                        if self.pending:
+                            continue
+                    break
+                if not self.put((gen, as_bytes(block))):
+                    return
+        except Exception as e:
+            self.error = e
+        self.put(None)
+
+    def get(self):
+        try:
+            return self.q.get_nowait()
+        except queue.Empty:
+            pass
+        if self.blocks:
+            self.underruns += 1
+        t1 = time.time()
+        while not (self.quit_requested or self.sender_done):
+            try:
+                item = self.q.get(timeout=POLL)
+                break
+            except queue.Empty:
+                pass
+        else:
+            item = None
+        if self.blocks:
+            self.stall += time.time() - t1
+        return item
+
+    def pace(self, nbytes):
+        ahead = self.bytes + nbytes - self.lead - self.rate * (time.time() - self.t0)
+        if ahead > 0:
+            time.sleep(ahead / self.rate)
+
+    def sender(self):
+        sock = self.sock
+        try:
+            while not self.quit_requested:
+                item = self.get()
+                if item is None:
+                    break
+                gen, view = item
+                if gen < self.min_gen:
+                    self.dropped += 1
+                    continue
+                if self.t0 is None:
+                    self.t0 = time.time()
+                elif self.rate:
+                    self.pace(len(view))
+                sock.sendall(view)
+                self.blocks += 1
+                self.bytes += len(view)
+                self.started.set()
+            if not self.quit_requested:
+                sock.shutdown(socket.SHUT_WR)
+        except OSError as e:
+            if not self.quit_requested:
+                self.error = e
+        finally:
+            self.t1 = time.time()
+            self.sender_done = True
+            self.started.set()
+
+    def is_alive(self):
+        return any(th.is_alive() for th in self.threads)
+
+    def join(self, timeout=None):
+        for th in self.threads:
+            th.join(timeout)
+
+    def stop(self):
+        self.quit_requested = True
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
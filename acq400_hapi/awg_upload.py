@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""
+awg_upload.py AWG pattern upload with no host side copies
+
+- as_bytes() gives a flat byte memoryview of bytes, bytearray, memoryview,
+  mmap or a NumPy array, only a non contiguous array is copied
+- an open file is sent with socket.sendfile(), the kernel reads the page cache,
+  each repeat sends the same file range again
+- repeats of a buffer go as one sendmsg() scatter list of views of the same
+  buffer, a pattern repeated N times is never concatenated
+- every byte is accounted for, a short send continues where it stopped
+- send() returns the bytes sent and the rate, to report upload MB/s
+
+ - eg::
+
+       with open("W32M", "rb") as fp:
+           stats = send(sock, fp, repeats=8)
+       print(rate_str(stats))
+"""
+
+import os
+import time
+
+import numpy as np
+
+IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") and "SC_IOV_MAX" in os.sysconf_names else 1024
+SCATTER_BYTES = 0x1000000       # largest sendmsg() scatter list, bytes
+
+
+def as_bytes(data):
+    """flat byte memoryview of data, no copy unless data is a non contiguous array"""
+    if isinstance(data, np.ndarray):
+        return memoryview(np.ascontiguousarray(data).reshape(-1).view(np.uint8))
+    view = memoryview(data)
+    return view if view.format == 'B' and view.ndim == 1 else view.cast('B')
+
+
+def is_file(data):
+    return hasattr(data, "fileno") and hasattr(data, "read")
+
+
+def sendmsg_all(sock, views):
+    """send a scatter list completely, continuing after a short send"""
+    views = list(views)
+    while views:
+        nsent = sock.sendmsg(views)
+        while views and nsent >= len(views[0]):
+            nsent -= len(views[0])
+            views.pop(0)
+        if nsent:
+            views[0] = views[0][nsent:]
+
+
+def send_repeats(sock, view, repeats):
+    """send view repeats times, grouped into scatter lists"""
+    nbytes = len(view)
+    if nbytes == 0 or repeats <= 0:
+        return
+    if repeats == 1 or not hasattr(sock, "sendmsg"):
+        for _ in range(repeats):
+            sock.sendall(view)
+        return
+    group = max(1, min(IOV_MAX, SCATTER_BYTES // nbytes, repeats))
+    while repeats:
+        n = min(group, repeats)
+        if n == 1:
+            sock.sendall(view)
+        else:
+            sendmsg_all(sock, [ view ] * n)
+        repeats -= n
+
+
+def send(sock, data, repeats=1):
+    """send an AWG pattern, repeats times
+
+    Args:
+        sock (socket): connected AWG port
+        data: bytes-like, mmap, ndarray or an open binary file
+        repeats (int, optional): pattern repetitions. Defaults to 1.
+
+    Returns:
+        dict: bytes, seconds, rate (MB/s)
+    """
+    t0 = time.time()
+    if is_file(data):
+        offset = data.tell()
+        nbytes = os.fstat(data.fileno()).st_size - offset
+        for _ in range(repeats):
+            sock.sendfile(data, offset, nbytes)
+        data.seek(offset)
+    else:
+        view = as_bytes(data)
+        nbytes = len(view)
+        send_repeats(sock, view, repeats)
+    dt = time.time() - t0
+    total = nbytes * max(repeats, 0)
+    return { "bytes": total, "seconds": dt, "rate": total / dt / 0x100000 if dt > 0 else 0.0 }
+
+
+def rate_str(stats):
+    return "{:.1f} MB in {:.2f}s {:.1f} MB/s".format(stats["bytes"] / 0x100000, stats["seconds"], stats["rate"])
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+"""
+broker.py local stream broker, one uut stream shared by many local readers
+
+- StreamBroker owns the uut STREAM socket and receives straight into a POSIX
+  shared memory ring, so the stream crosses the network once
+- BrokerReader attaches by name from any local process, eg disk writer,
+  live plotter, checker. Each has its own cursor and never slows the broker
+- a reader that falls more than the ring size behind skips forward to the
+  oldest whole sample still held and counts the overrun, a block that is
+  overwritten while held is counted on release()
+- a BrokerReader works as the reader of a streaming.StreamWriter
+
+Shared memory layout: one page of uint64 header, then the ring.
+
+ - eg::
+
+       # owner, one process
+       with StreamBroker("acq2106_123", ssb=int(uut.s0.ssb)) as broker:
+           broker.join()
+
+       # readers, any number of processes
+       with BrokerReader("acq2106_123", data_size=2) as rdr:
+           for block in rdr:
+               plot(block.data[::nchan])
+           print(rdr.stats())
+"""
+
+import os
+import socket
+import threading
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from .streaming import STREAM_PORT, Block, aligned_blocklen
+
+MAGIC = 0x5242303034514341          # "ACQ400BR"
+HDR_BYTES = 4096
+H_MAGIC, H_SIZE, H_BLOCKLEN, H_SSB, H_WPOS, H_EOF, H_PID, H_T0 = range(8)
+OWNED = set()                       # names a StreamBroker in this process created, tracked for unlink
+
+
+def shm_name(uut, port=STREAM_PORT):
+    """shared memory name for a uut stream"""
+    return "acq400_{}_{}".format(uut, port).replace("/", "_")
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def attach(name):
+    """attach existing shared memory, without the resource tracker unlinking it at exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in OWNED:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class StreamBroker:
+    """owns the uut stream, fills the shared memory ring
+
+    Args:
+        uut (str): uut hostname or ip-address
+        port (int, optional): uut port. Defaults to STREAM_PORT.
+        size (int, optional): ring bytes, rounded up to whole blocks. Defaults to 256MB.
+        blocklen (int, optional): largest single receive, rounded to ssb. Defaults to 1MB.
+        ssb (int, optional): sample size bytes, readers get whole samples. Defaults to 4.
+        name (str, optional): shared memory name. Defaults to shm_name(uut, port).
+    """
+    def __init__(self, uut, port=STREAM_PORT, size=0x10000000, blocklen=0x100000, ssb=4, name=None):
+        self.uut = uut
+        self.port = port
+        self.ssb = ssb
+        self.blocklen = aligned_blocklen(blocklen, ssb)
+        self.size = -(-size // self.blocklen) * self.blocklen
+        self.name = name or shm_name(uut, port)
+        self.shm = None
+        self.hdr = None
+        self.ring = None
+        self.sock = None
+        self.thread = None
+        self.quit_requested = False
+        self.error = None
+
+    def __repr__(self):
+        return "StreamBroker({}:{} {}) {}".format(self.uut, self.port, self.name, self.stats())
+
+    def stats(self):
+        nbytes = int(self.hdr[H_WPOS]) if self.hdr is not None else 0
+        dt = time.time() - int(self.hdr[H_T0]) / 1e9 if self.hdr is not None and self.hdr[H_T0] else 0
+        return { "bytes": nbytes, "rate": nbytes / dt if dt > 0 else 0.0 }
+
+    def create(self):
+        nbytes = HDR_BYTES + self.size
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=nbytes)
+        except FileExistsError:
+            old = attach(self.name)
+            hdr = np.ndarray(8, np.uint64, buffer=old.buf)
+            owner = int(hdr[H_PID]) if hdr[H_MAGIC] == MAGIC else 0
+            del hdr
+            if owner and owner != os.getpid() and pid_alive(owner):
+                old.close()
+                raise FileExistsError("StreamBroker: {} owned by pid {}".format(self.name, owner))
+            print("StreamBroker: removing stale {}".format(self.name))
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=nbytes)
+        OWNED.add(self.name)
+        self.hdr = np.ndarray(8, np.uint64, buffer=self.shm.buf)
+        self.ring = self.shm.buf[HDR_BYTES:HDR_BYTES + self.size]
+        self.hdr[:] = 0
+        self.hdr[H_SIZE] = self.size
+        self.hdr[H_BLOCKLEN] = self.blocklen
+        self.hdr[H_SSB] = self.ssb
+        self.hdr[H_PID] = os.getpid()
+        self.hdr[H_MAGIC] = MAGIC
+
+    def start(self):
+        self.create()
+        self.sock = socket.create_connection((self.uut, self.port))
+        self.thread = threading.Thread(target=self.receiver, daemon=True)
+        self.thread.start()
+        return self
+
+    def receiver(self):
+        hdr = self.hdr
+        wpos = 0
+        hdr[H_T0] = time.time_ns()
+        try:
+            while not self.quit_requested:
+                off = wpos % self.size
+                nrx = self.sock.recv_into(self.ring[off:off + self.blocklen - off % self.blocklen])
+                if nrx == 0:
+                    break
+                wpos += nrx
+                hdr[H_WPOS] = wpos          # publish
+        except OSError as e:
+            if not self.quit_requested:
+                self.error = e
+        finally:
+            hdr[H_EOF] = 1
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self):
+        self.quit_requested = True
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        if self.thread:
+            self.thread.join()
+        if self.shm:
+            self.hdr[H_EOF] = 1
+            self.hdr[H_PID] = 0
+            self.hdr = None
+            self.ring.release()
+            self.ring = None
+            self.shm.close()
+            self.shm.unlink()
+            OWNED.discard(self.name)
+            self.shm = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class BrokerReader:
+    """one local reader of a StreamBroker ring
+
+    Blocks are views of the shared ring, Block.seq is the stream byte offset.
+    Release a block before acquiring the next one.
+
+    Args:
+        uut (str): uut hostname or ip-address, as StreamBroker(uut)
+        port (int, optional): uut port. Defaults to STREAM_PORT.
+        data_size (int, optional): 2|4 element size of Block.data. Defaults to 2.
+        maxlen (int, optional): largest block bytes. Defaults to the broker blocklen.
+        latest (bool, optional): start at the live edge, else the oldest data held. Defaults to True.
+        poll (float, optional): seconds between checks when there is no data. Defaults to 1ms.
+        name (str, optional): shared memory name. Defaults to shm_name(uut, port).
+    """
+    def __init__(self, uut, port=STREAM_PORT, data_size=2, maxlen=None, latest=True, poll=0.001, name=None):
+        self.name = name or shm_name(uut, port)
+        self.dtype = np.dtype('i4' if data_size == 4 else 'i2')
+        self.maxlen = maxlen
+        self.latest = latest
+        self.poll = poll
+        self.shm = None
+        self.hdr = None
+        self.cursor = 0
+        self.current = None
+        self.blocks = 0
+        self.bytes = 0
+        self.overruns = 0
+        self.overrun_bytes = 0
+        self.torn = 0
+
+    def __repr__(self):
+        return "BrokerReader({}) {}".format(self.name, self.stats())
+
+    def stats(self):
+        return { "blocks": self.blocks, "bytes": self.bytes, "overruns": self.overruns,
+                 "overrun_bytes": self.overrun_bytes, "torn": self.torn,
+                 "behind": int(self.hdr[H_WPOS]) - self.cursor if self.hdr is not None else 0 }
+
+    def start(self):
+        self.shm = attach(self.name)
+        self.hdr = np.ndarray(8, np.uint64, buffer=self.shm.buf)
+        if self.hdr[H_MAGIC] != MAGIC:
+            self.stop()
+            raise ValueError("BrokerReader: {} is not a stream broker".format(self.name))
+        self.size = int(self.hdr[H_SIZE])
+        self.blocklen = int(self.hdr[H_BLOCKLEN])
+        self.ssb = int(self.hdr[H_SSB])
+        self.maxlen = self.maxlen or self.blocklen
+        self.ring = np.ndarray(self.size, np.uint8, buffer=self.shm.buf, offset=HDR_BYTES)
+        wpos = int(self.hdr[H_WPOS])
+        self.cursor = wpos // self.ssb * self.ssb if self.latest else self.oldest(wpos)
+        return self
+
+    def oldest(self, wpos):
+        """first whole sample that the broker is not about to overwrite"""
+        lo = max(0, wpos + self.blocklen - self.size)
+        return -(-lo // self.ssb) * self.ssb
+
+    def acquire(self, timeout=None):
+        """next block of whole samples
+
+        Returns:
+            Block, or None at end of stream or timeout
+        """
+        t1 = None if timeout is None else time.time() + timeout
+        checked = time.time()
+        while True:
+            wpos = int(self.hdr[H_WPOS])
+            eof = self.hdr[H_EOF] != 0
+            lo = self.oldest(wpos)
+            if self.cursor < lo:
+                self.overruns += 1
+                self.overrun_bytes += lo - self.cursor
+                self.cursor = lo
+            avail = wpos - self.cursor
+            if avail >= self.ssb or (eof and avail > 0):
+                off = self.cursor % self.size
+                nbytes = min(avail, self.size - off, self.maxlen)
+                nbytes = nbytes // self.ssb * self.ssb or nbytes
+                nbytes = nbytes // self.dtype.itemsize * self.dtype.itemsize
+                if nbytes == 0:
+                    self.cursor = wpos
+                    continue
+                data = self.ring[off:off + nbytes].view(self.dtype)
+                block = Block(self.cursor, -1, nbytes, data)
+                self.cursor += nbytes
+                return block
+            if eof:
+                return None
+            now = time.time()
+            if t1 is not None and now >= t1:
+                return None
+            if now - checked > 1:
+                checked = now
+                if not pid_alive(int(self.hdr[H_PID])):
+                    print("BrokerReader: {} broker has gone".format(self.name))
+                    return None
+            time.sleep(self.poll)
+
+    def valid(self, block):
+        """True if block has not been overwritten since it was acquired"""
+        return block.seq >= self.oldest(int(self.hdr[H_WPOS]))
+
+    def release(self, block):
+        """done with block, counts it torn if the broker overwrote it while held"""
+        if not self.valid(block):
+            self.torn += 1
+        self.blocks += 1
+        self.bytes += block.nbytes
+        block.data = None
+
+    def __iter__(self):
+        while True:
+            if self.current is not None:
+                self.release(self.current)
+                self.current = None
+            block = self.acquire()
+            if block is None:
+                break
+            self.current = block
+            yield block
+
+    def stop(self):
+        self.current = None
+        self.hdr = None
+        self.ring = None
+        if self.shm:
+            try:
+                self.shm.close()
+            except BufferError:
+                pass                        # caller still holds a block, unmapped when it goes
+            self.shm = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
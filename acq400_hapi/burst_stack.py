@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+burst_stack.py restack RTM/RGM burst data as data[uut, chan, burst, t]
+
+- find_es() locates the ES in one channel with one vectorized compare per chunk,
+  int16 channels are taken as ACQ480 double tap: the 32 bit ES spans two samples
+- stack() gathers every burst of every channel with fancy indexing, no per
+  sample loop, into an array or a memory mapped .npy file
+- sources are channel arrays or memmaps per uut, use muxed_channels() for
+  raw muxed data, with an index from es_index.scan_files()
+
+ - eg::
+
+       chans = [ [ np.memmap(f, np.int16, 'r') for f in uut_files ] for uut_files in files ]
+       esi = [ find_es(chans[u][1]) for u in range(len(chans)) ]
+       nburst, blen = burst_shape(esi)
+       data = stack(chans, esi, blen, offset=2, path="stack.npy")    # data[uut, chan, burst, t]
+"""
+
+import numpy as np
+
+from .es_index import ES_MAGIC, ES_MASK
+
+CHUNK = 0x1000000               # elements per pass
+
+
+def find_es(ch, magic=ES_MAGIC, mask=ES_MASK, chunk=CHUNK):
+    """sample indices of the ES in one channel
+
+    Args:
+        ch (ndarray): channel data, int16 (ACQ480 double tap) or 32 bit
+        magic (int, optional): ES magic. Defaults to es_index.ES_MAGIC.
+        mask (int, optional): bits compared. Defaults to exact match.
+
+    Returns:
+        ndarray: indices in channel samples
+    """
+    scale = 4 // ch.dtype.itemsize
+    nw = len(ch) // scale
+    found = []
+    for i0 in range(0, nw, chunk):
+        w = np.ascontiguousarray(ch[i0*scale:min(nw, i0+chunk)*scale]).view(np.uint32)
+        if mask != ES_MASK:
+            w = w & np.uint32(mask)
+        found.append(np.flatnonzero(w == np.uint32(magic)) + i0)
+    return np.concatenate(found) * scale if found else np.zeros(0, np.int64)
+
+
+def muxed_channels(path, nchan, dtype=np.int16):
+    """raw muxed file as a [nchan, nsam] memory mapped view, no copy"""
+    mm = np.memmap(path, dtype, 'r')
+    return mm[:len(mm) // nchan * nchan].reshape(-1, nchan).T
+
+
+def burst_shape(esi):
+    """common burst count and shortest burst over all uuts
+
+    Args:
+        esi (list): ES sample indices per uut
+
+    Returns:
+        (nburst, blen)
+    """
+    lens = [ len(e) for e in esi ]
+    nburst = min(lens)
+    if max(lens) != nburst:
+        print("WARNING: burst count mismatch {}, min is {}".format(lens, nburst))
+    deltas = [ np.diff(np.asarray(e[:nburst])) for e in esi ]
+    blen = int(min(d.min() for d in deltas)) if nburst > 1 else 0
+    if nburst > 1 and any(d.max() != blen for d in deltas):
+        print("WARNING: burst length varies, blen set {}".format(blen))
+    return nburst, blen
+
+
+def stack(data, esi, blen, offset=0, nburst=None, path=None, dtype=None, chunk=CHUNK):
+    """gather bursts to [uut, chan, burst, t]
+
+    Burst b of uut u is data[u][c][esi[u][b]+offset : +blen]. Bursts that run
+    past the end of the data, or past the end of esi[u], are left zero.
+
+    Args:
+        data (list): per uut, [nchan, nsam] array or list of channel arrays
+        esi (list): ES sample indices per uut, or es_index records
+        blen (int): samples per burst
+        offset (int, optional): first sample after the ES, eg 2 double tap, 1 muxed. Defaults to 0.
+        nburst (int, optional): bursts per uut. Defaults to the fewest found.
+        path (str, optional): store as a memory mapped .npy file. Defaults to in memory.
+        dtype (np.dtype, optional): output type. Defaults to the data type.
+
+    Returns:
+        ndarray: data[uut, chan, burst, t]
+    """
+    esi = [ e['index'] if e.dtype.names else e for e in (np.asarray(e) for e in esi) ]
+    nburst = min(len(e) for e in esi) if nburst is None else nburst
+    nchan = max(len(d) for d in data)
+    dtype = np.dtype(data[0][0].dtype if dtype is None else dtype)
+    shape = (len(data), nchan, nburst, blen)
+    if path:
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    else:
+        out = np.zeros(shape, dtype)
+
+    t = np.arange(blen)
+    group = max(1, chunk // max(1, blen))
+    for u, chans in enumerate(data):
+        starts = np.asarray(esi[u][:nburst], np.int64) + offset
+        for b0 in range(0, nburst, group):
+            s = starts[b0:b0+group]
+            for c, ch in enumerate(chans):
+                ok = np.flatnonzero((s >= 0) & (s + blen <= len(ch)))
+                if len(ok):
+                    out[u, c, b0 + ok] = ch[s[ok, None] + t]
+    if path:
+        out.flush()
+    return out
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""
+calibration.py per channel ESLO/EOFF as float arrays, whole block raw to volts
+
+- parsed once from the aggregator sites' AI_CAL_ESLO / AI_CAL_EOFF, cached
+  per uut and shot, so repeat calls cost a dict lookup
+- volts() converts a whole [nchan, nsam] (or [nsam, nchan]) block in one
+  broadcast multiply-add, float32 and out= to avoid temporaries
+- arrays index channels from 1, entry 0 is a dummy, as Acq400.cal_eslo
+
+ - eg::
+
+       cal = uut.calibration()
+       volts = cal.volts(raw)                      # raw [nchan, nsam]
+       cal.volts(raw, out=buf, dtype=np.float32)   # no allocation
+       v3 = cal.volts(raw[2], chans=3)
+"""
+
+import numpy as np
+
+_cache = {}                         # (uut, shot): Calibration
+
+
+def parse(knob):
+    """values of an AI_CAL_ESLO/EOFF knob, first 3 tokens are a header"""
+    return np.array(knob.split(' ')[3:], np.float64)
+
+
+class Calibration:
+    """ESLO/EOFF for all channels
+
+    Args:
+        eslo (array): gain per channel, index 0 dummy
+        eoff (array): offset per channel, index 0 dummy
+    """
+    def __init__(self, eslo, eoff):
+        self.eslo = np.asarray(eslo, np.float64)
+        self.eoff = np.asarray(eoff, np.float64)
+        self.eslo32 = self.eslo.astype(np.float32)
+        self.eoff32 = self.eoff.astype(np.float32)
+
+    def __repr__(self):
+        return "Calibration(nchan={})".format(self.nchan)
+
+    @property
+    def nchan(self):
+        return len(self.eslo) - 1
+
+    @classmethod
+    def from_uut(cls, uut):
+        """read calibration from each aggregator site of an Acq400"""
+        eslo = [ np.zeros(1) ]
+        eoff = [ np.zeros(1) ]
+        for m in uut.get_aggregator_svc_list():
+            eslo.append(parse(m.AI_CAL_ESLO))
+            eoff.append(parse(m.AI_CAL_EOFF))
+        return cls(np.concatenate(eslo), np.concatenate(eoff))
+
+    @classmethod
+    def get(cls, uut, shot=None, refresh=False):
+        """cached calibration for uut, read again when shot changes or refresh
+
+        Args:
+            uut (Acq400): uut
+            shot (int, optional): shot the data came from. Defaults to None, any shot.
+            refresh (bool, optional): read from the uut regardless. Defaults to False.
+        """
+        key = (uut.uut, shot)
+        cal = None if refresh else _cache.get(key)
+        if cal is None:
+            cal = _cache[key] = cls.from_uut(uut)
+        return cal
+
+    def coefficients(self, chans=None, dtype=np.float64):
+        """(eslo, eoff) for chans, from 1, default all"""
+        eslo, eoff = (self.eslo32, self.eoff32) if np.dtype(dtype) == np.float32 else (self.eslo, self.eoff)
+        if chans is None:
+            return eslo[1:], eoff[1:]
+        return eslo[chans], eoff[chans]
+
+    def volts(self, raw, chans=None, out=None, dtype=np.float64, axis=0):
+        """raw to volts, volts = raw * eslo + eoff
+
+        Args:
+            raw (ndarray): [nchan, nsam] block, or one channel with a scalar chans
+            chans (int|list, optional): channels in raw, from 1. Defaults to all.
+            out (ndarray, optional): destination, may be raw if raw is float. Defaults to new array.
+            dtype (np.dtype, optional): np.float32 or np.float64. Defaults to np.float64.
+            axis (int, optional): channel axis of raw, -1 for [nsam, nchan]. Defaults to 0.
+
+        Returns:
+            ndarray: out
+        """
+        dtype = np.dtype(dtype) if out is None else out.dtype
+        eslo, eoff = self.coefficients(chans, dtype)
+        if np.ndim(eslo) and axis == 0 and np.ndim(raw) > 1:
+            eslo = eslo[:, None]
+            eoff = eoff[:, None]
+        if out is None:
+            out = np.empty(np.shape(raw), dtype)
+        np.multiply(raw, eslo, out=out)
+        np.add(out, eoff, out=out)
+        return out
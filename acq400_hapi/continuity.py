@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+"""
+continuity.py sample counter continuity check for any stream path
+
+- ContinuityCheck is a plain callable: a streaming.StreamWriter stage, or call
+  it on each buffer from uut.stream(), a socket recv or a BrokerReader block
+- one np.diff over the strided counter column per buffer, samples split
+  across buffers are carried over, so buffers need not be sample aligned
+- each gap is recorded with its position, size and time, in memory and as
+  one JSON line per gap in the log file
+- delta_histogram() / tlatch_histogram() count every counter delta of a
+  stored log, eg AFHBA T_LATCH, in one np.diff/np.unique pass per chunk
+
+Log line fields:
+    time : host time.time() of the buffer holding the gap
+    sample : stream index of the first sample after the gap
+    byte : stream byte offset of that sample
+    expected, got : counter values
+    missed : got - expected as a signed count, negative for a repeat or step back
+
+ - eg::
+
+       chk = ContinuityCheck(ssb, col=spad0_col, log="acq2106_123_gaps.jsonl")
+       for buf in uut.stream(data_size=4):
+           chk(buf)
+       print(chk.stats())
+"""
+
+import json
+import time
+
+import numpy as np
+
+ES_MATCH = 0xaa55f150
+ES_MASK = 0xfffffff0
+CHUNK = 0x1000000               # counter values per pass
+
+
+class ContinuityCheck:
+    """checks a per-sample counter, eg spad0 or a SAMPLE_COUNT column, increments by step
+
+    Args:
+        ssb (int): sample size bytes, a multiple of 4
+        col (int): uint32 word index of the counter in the sample
+        step (int, optional): expected increment. Defaults to 1.
+        log (str, optional): JSON lines gap log. Defaults to None.
+        skip_es (bool, optional): ignore event signature samples in the stream. Defaults to False.
+        verbose (int, optional): print each gap. Defaults to 1.
+        maxgaps (int, optional): gaps kept in memory, all are logged. Defaults to 10000.
+    """
+    def __init__(self, ssb, col, step=1, log=None, skip_es=False, verbose=1, maxgaps=10000):
+        if ssb % 4:
+            raise ValueError("ContinuityCheck: ssb {} is not a multiple of 4".format(ssb))
+        self.ssb = ssb
+        self.nwords = ssb // 4
+        self.col = col
+        self.step = step
+        self.log = log
+        self.skip_es = skip_es
+        self.verbose = verbose
+        self.maxgaps = maxgaps
+        self.fp = None
+        self.carry = bytearray()
+        self.last = None                # last counter value
+        self.nsam = 0                   # samples checked
+        self.ngaps = 0
+        self.missed = 0                 # sum of |missed|, as stream_to_host counted
+        self.gaps = []
+
+    def __repr__(self):
+        return "ContinuityCheck(ssb={}, col={}) {}".format(self.ssb, self.col, self.stats())
+
+    def stats(self):
+        return { "samples": self.nsam, "gaps": self.ngaps, "missed": self.missed }
+
+    def __call__(self, buf):
+        """check the next bytes of the stream, StreamReader Block, ndarray or bytes-like"""
+        if hasattr(buf, 'seq'):
+            view = memoryview(buf.data).cast('B')[:buf.nbytes]
+        else:
+            view = memoryview(buf).cast('B')
+        if self.carry:
+            need = min(self.ssb - len(self.carry), len(view))
+            self.carry += view[:need]
+            view = view[need:]
+            if len(self.carry) == self.ssb:
+                self.check(np.frombuffer(self.carry, np.uint32))
+                self.carry = bytearray()
+        full = len(view) // self.ssb * self.ssb
+        if full:
+            self.check(np.frombuffer(view[:full], np.uint32))
+        if full < len(view):
+            self.carry += view[full:]
+
+    def check(self, words):
+        """check whole samples, words is a uint32 view"""
+        rows = words.reshape(-1, self.nwords)
+        i0 = self.nsam
+        self.nsam += len(rows)
+        index = None
+        counter = rows[:, self.col]
+        if self.skip_es:
+            keep = (rows[:, 0] & np.uint32(ES_MASK)) != np.uint32(ES_MATCH)
+            if not keep.all():
+                index = np.flatnonzero(keep)
+                counter = counter[index]
+        if len(counter) == 0:
+            return
+        if self.last is not None and (int(counter[0]) - self.last - self.step) & 0xffffffff:
+            self.gap(i0 + (index[0] if index is not None else 0), self.last + self.step, counter[0])
+        bad = np.flatnonzero(np.diff(counter) != np.uint32(self.step))
+        for ii in bad:
+            sample = index[ii+1] if index is not None else ii+1
+            self.gap(i0 + sample, int(counter[ii]) + self.step, counter[ii+1])
+        self.last = int(counter[-1])
+
+    def gap(self, sample, expected, got):
+        expected = int(expected) & 0xffffffff
+        got = int(got)
+        missed = (got - expected + 0x80000000) % 0x100000000 - 0x80000000
+        rec = { "time": round(time.time(), 6), "sample": int(sample), "byte": int(sample) * self.ssb,
+                "expected": expected, "got": got, "missed": missed }
+        self.ngaps += 1
+        self.missed += abs(missed)
+        if len(self.gaps) < self.maxgaps:
+            self.gaps.append(rec)
+        if self.verbose:
+            print("Warning: {} samples missed at sample {}".format(missed, sample))
+        if self.log:
+            if self.fp is None:
+                self.fp = open(self.log, "a")
+            self.fp.write(json.dumps(rec) + "\n")
+            self.fp.flush()
+
+    def close(self):
+        if self.fp:
+            self.fp.close()
+            self.fp = None
+
+
+def delta_histogram(counter, chunk=CHUNK):
+    """histogram of deltas between successive counter values
+
+    Chunks overlap by one value, so no delta is lost or counted twice at a
+    chunk boundary. Counters are uint32, a wrap counts as +1.
+
+    Args:
+        counter (ndarray): counter values, eg a strided memmap column
+        chunk (int, optional): values per pass. Defaults to CHUNK.
+
+    Returns:
+        dict: {delta: count}, sorted by delta
+    """
+    histo = {}
+    for i0 in range(0, max(0, len(counter) - 1), chunk):
+        cc = np.asarray(counter[i0:i0+chunk+1]).astype(np.uint32, copy=False)
+        deltas, counts = np.unique(np.diff(cc).view(np.int32), return_counts=True)
+        for delta, count in zip(deltas.tolist(), counts.tolist()):
+            histo[delta] = histo.get(delta, 0) + count
+    return dict(sorted(histo.items()))
+
+
+def tlatch_histogram(path, ssb_words, col, chunk=CHUNK):
+    """T_LATCH delta histogram of a raw log, memory mapped, no copy of the file
+
+    Args:
+        path (str): raw log file, eg afhba.0.log
+        ssb_words (int): 32 bit words per sample
+        col (int): word index of T_LATCH in the sample
+
+    Returns:
+        dict: {delta: count}, delta N > 1 means N-1 samples were missed
+    """
+    mm = np.memmap(path, np.uint32, 'r')
+    nsam = len(mm) // ssb_words
+    return delta_histogram(mm[col:nsam*ssb_words:ssb_words], chunk)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+"""
+demux.py chunked demux of raw muxed data files
+
+- source files are memory mapped and treated as one continuous sample stream,
+  so samples split across file boundaries (eg NCHAN%3 == 0) stay aligned
+- each chunk is one [nsam, nchan] reshape and one transpose, never a per-channel loop
+- output to a preallocated [nchan, nsam] array or straight to per-channel files,
+  memory use is bounded by the chunk size, not the data size
+- jobs=N splits the sample range over N worker processes, each writes its own
+  range of the outputs in place: preallocated file offsets, or a file backed
+  np.memmap array. An in-memory out is filled by N threads instead
+- to_files(pyramid=True) builds min/max plot pyramids next to the channel files
+
+ - eg::
+
+       dmx = Demux(sorted(glob.glob("/data/acq2106_123/000001/*")), 96, np.int16)
+       dmx.to_files("DATA/acq2106_123_{:02d}.dat")     # ch from 1
+       ch1_8 = dmx.to_array(range(8))
+       dmx.to_files("DATA/acq2106_123_{:02d}.dat", jobs=8)
+       chx = dmx.to_array(jobs=8)                       # memmap of an unlinked temp file
+
+Environment:
+    DEMUX_CHUNK : chunk size bytes. Defaults to 64MB
+"""
+
+import os
+import mmap
+import tempfile
+import concurrent.futures
+
+import numpy as np
+
+from . import pyramid as PYR
+
+CHUNK_BYTES = int(os.getenv("DEMUX_CHUNK", "0x4000000"), 0)
+
+
+class Demux:
+    """demux engine over a list of raw files
+
+    Args:
+        files (list): raw data files, in order
+        nchan (int): channels per sample, including spad
+        dtype (np.dtype, optional): word type. Defaults to np.int16.
+        chunk_bytes (int, optional): bytes per chunk. Defaults to CHUNK_BYTES.
+    """
+    def __init__(self, files, nchan, dtype=np.int16, chunk_bytes=CHUNK_BYTES):
+        self.files = [ f for f in files if os.path.getsize(f) > 0 ]
+        self.nchan = nchan
+        self.dtype = np.dtype(dtype)
+        self.chunk_samples = max(1, chunk_bytes // (nchan * self.dtype.itemsize))
+        self.sizes = [ os.path.getsize(f) // self.dtype.itemsize for f in self.files ]
+        self.nsam = sum(self.sizes) // nchan
+
+    def __repr__(self):
+        return "Demux({} files, nchan={}, nsam={})".format(len(self.files), self.nchan, self.nsam)
+
+    def chunks(self, start=0, stop=None):
+        """yield (i0, block), block is a [n, nchan] view of sample i0 onwards
+
+        Args:
+            start (int, optional): first sample. Defaults to 0.
+            stop (int, optional): end sample. Defaults to nsam.
+        """
+        stop = self.nsam if stop is None else min(stop, self.nsam)
+        nchan = self.nchan
+        e0 = start * nchan                  # element offset of the next sample
+        e1 = stop * nchan
+        base = 0                            # element offset of the current file
+        tail = None
+        for fn, size in zip(self.files, self.sizes):
+            if base + size <= e0:
+                base += size
+                continue
+            if e0 >= e1:
+                break
+            mm = np.memmap(fn, self.dtype, 'r', shape=(size,))
+            lo = e0 - base
+            hi = min(size, e1 - base)
+            if tail is not None:
+                # sample split across files
+                need = min(nchan - len(tail), hi - lo)
+                tail = np.concatenate((tail, mm[lo:lo+need]))
+                e0 += need
+                lo += need
+                if len(tail) == nchan:
+                    yield e0 // nchan - 1, tail.reshape(1, nchan)
+                    tail = None
+            full = lo + (hi - lo) // nchan * nchan
+            step = self.chunk_samples * nchan
+            for ii in range(lo, full, step):
+                jj = min(ii + step, full)
+                yield e0 // nchan, mm[ii:jj].reshape(-1, nchan)
+                e0 += jj - ii
+            if full < hi and tail is None:
+                tail = np.array(mm[full:hi])
+                e0 += hi - full
+            base += size
+            del mm
+
+    def split(self, jobs, start=0, stop=None):
+        """divide [start, stop) into jobs contiguous sample ranges
+
+        Ranges are in samples not files, so a job may start part way through a file
+        or a sample split across files, and the ranges still join exactly.
+        """
+        stop = self.nsam if stop is None else min(stop, self.nsam)
+        edges = [ start + (stop - start) * ii // jobs for ii in range(jobs + 1) ]
+        return [ (i0, i1) for i0, i1 in zip(edges[:-1], edges[1:]) if i1 > i0 ]
+
+    def to_array(self, channels=None, out=None, start=0, stop=None, jobs=1):
+        """demux channels to a [len(channels), nsam] array
+
+        With jobs > 1, worker processes write a file backed np.memmap out in
+        place, the default out is then a memmap of an unlinked temporary file
+        (TMPDIR), so memory use stays bounded. Any other out is filled by
+        jobs threads.
+
+        Args:
+            channels (list, optional): channel indices from 0. Defaults to all.
+            out (ndarray, optional): preallocated destination. Defaults to new array.
+            start (int, optional): first sample. Defaults to 0.
+            stop (int, optional): end sample. Defaults to nsam.
+            jobs (int, optional): worker processes. Defaults to 1.
+
+        Returns:
+            ndarray: out
+        """
+        stop = self.nsam if stop is None else min(stop, self.nsam)
+        sel = self._select(channels)
+        shape = (self._count(sel), stop - start)
+        if out is None and jobs > 1 and shape[0] * shape[1]:
+            fd, fn = tempfile.mkstemp(prefix="demux")
+            os.close(fd)
+            try:
+                return self._to_array_jobs(channels, np.memmap(fn, self.dtype, 'w+', shape=shape), start, stop, jobs)
+            finally:
+                try:
+                    os.unlink(fn)           # the map stays valid
+                except OSError:
+                    pass                    # Windows: still open, left in TMPDIR
+        if out is None:
+            out = np.empty(shape, self.dtype)
+        if jobs > 1:
+            return self._to_array_jobs(channels, out, start, stop, jobs)
+        for i0, block in self.chunks(start, stop):
+            out[:, i0-start:i0-start+len(block)] = block[:, sel].T
+        return out
+
+    def _to_array_jobs(self, channels, out, start, stop, jobs):
+        ranges = self.split(jobs, start, stop)
+        if is_file_map(out):
+            with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+                futures = [ executor.submit(_array_worker, self, channels, out.filename, out.offset, out.shape,
+                                            start, i0, i1) for i0, i1 in ranges ]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+                futures = [ executor.submit(self.to_array, channels, out[:, i0-start:i1-start], i0, i1)
+                            for i0, i1 in ranges ]
+        for future in futures:
+            future.result()
+        return out
+
+    def to_files(self, paths, channels=None, start=0, stop=None, jobs=1, pyramid=False):
+        """demux channels to one raw file per channel
+
+        Args:
+            paths (str|list): format string taking channel from 1, or one path per channel
+            channels (list, optional): channel indices from 0. Defaults to all.
+            start (int, optional): first sample. Defaults to 0.
+            stop (int, optional): end sample. Defaults to nsam.
+            jobs (int, optional): worker processes, each writes its range at preallocated offsets. Defaults to 1.
+            pyramid (bool, optional): build pyramid.py min/max levels for each file. Defaults to False.
+
+        Returns:
+            list: paths written
+        """
+        channels = list(range(self.nchan)) if channels is None else list(channels)
+        if isinstance(paths, str):
+            paths = [ paths.format(ch+1) for ch in channels ]
+        if jobs > 1:
+            stop = self.nsam if stop is None else min(stop, self.nsam)
+            for fn in paths:
+                with open(fn, "wb") as fp:
+                    fp.truncate((stop - start) * self.dtype.itemsize)
+            with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+                futures = [ executor.submit(_files_worker, self, channels, paths, start, i0, i1)
+                            for i0, i1 in self.split(jobs, start, stop) ]
+                for future in futures:
+                    future.result()
+                if pyramid:
+                    list(executor.map(PYR.build, paths, [self.dtype] * len(paths)))
+            return paths
+        fps = [ open(fn, "wb") for fn in paths ]
+        pws = [ PYR.PyramidWriter(fn, self.dtype) for fn in paths ] if pyramid else []
+        try:
+            for i0, block in self.chunks(start, stop):
+                rows = np.ascontiguousarray(block[:, self._select(channels)].T)
+                for fp, row in zip(fps, rows):
+                    fp.write(row)
+                for pw, row in zip(pws, rows):
+                    pw.append(row)
+        finally:
+            for fp in fps:
+                fp.close()
+            for pw in pws:
+                pw.close()
+        return paths
+
+    def _select(self, channels):
+        if channels is None or list(channels) == list(range(self.nchan)):
+            return slice(None)
+        return list(channels)
+
+    def _count(self, sel):
+        return self.nchan if isinstance(sel, slice) else len(sel)
+
+
+def is_file_map(out):
+    """out is a whole writable np.memmap of a file, that a worker process can map again"""
+    return isinstance(out, np.memmap) and isinstance(out.base, mmap.mmap) and \
+        out.filename is not None and out.mode in ('r+', 'w+')
+
+
+def _array_worker(dmx, channels, filename, offset, shape, start, i0, i1):
+    out = np.memmap(filename, dmx.dtype, 'r+', offset=offset, shape=shape)
+    dmx.to_array(channels, out[:, i0-start:i1-start], i0, i1)
+    out.flush()
+    del out
+
+
+def _files_worker(dmx, channels, paths, start, i0, i1):
+    offset = (i0 - start) * dmx.dtype.itemsize
+    outs = [ np.memmap(fn, dmx.dtype, 'r+', offset=offset, shape=(i1 - i0,)) for fn in paths ]
+    sel = dmx._select(channels)
+    for c0, block in dmx.chunks(i0, i1):
+        rows = block[:, sel].T
+        for out, row in zip(outs, rows):
+            out[c0-i0:c0-i0+len(block)] = row
+    for out in outs:
+        out.flush()
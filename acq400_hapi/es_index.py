@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+"""
+es_index.py vectorized event signature (ES) index of raw muxed data
+
+- an ES is a whole sample in the data, words 0..3 are magic, word 0 is
+  0xaa55f154, then [SAMPLE_COUNT, CLOCK_COUNT, SAMPLE_COUNT, CLOCK_COUNT ..],
+  as analyse_burst.py ES_SAMPLE, ES_CLK
+- one mask+compare over the word 0 column of each chunk, no per sample loop
+- files are memory mapped chunk by chunk, lists of files are one stream so
+  samples split across files (eg cycle files) stay aligned
+- EsScanner.feed() takes buffers of any size, from a socket or StreamReader
+- the index is a numpy structured array, ES_DTYPE fields index, sample_count,
+  clock_count and es, all ES words, and can be cached next to the data
+
+ - eg::
+
+       esi = scan_files("/data/acq2106_123/000001/0000", ssb=128, cache=True)
+       print(esi['index'], esi['sample_count'])
+
+       with StreamReader(uut, port=AcqPorts.DATA0, data_size=4) as rdr:
+           esi = scan_stream(rdr, ssb)
+"""
+
+import os
+
+import numpy as np
+
+from .demux import Demux, CHUNK_BYTES
+
+ES_MAGIC = 0xaa55f154
+ES_MASK = 0xffffffff            # exact match. ES_ANY_MASK with 0xaa55f150 matches any aa55f15x
+ES_ANY_MASK = 0xfffffff0
+ES_SAMPLE_COUNT = 4             # word offsets in the ES, after 4 magic words
+ES_CLOCK_COUNT = 5
+CACHE_SUFFIX = ".esi.npz"
+
+
+def es_dtype(nwords):
+    """index record for a sample of nwords uint32"""
+    return np.dtype([('index', np.int64), ('sample_count', np.uint32), ('clock_count', np.uint32),
+                     ('es', np.uint32, (nwords,))])
+
+
+def match(block, magic=ES_MAGIC, mask=ES_MASK, col=0):
+    """rows of [n, nwords] uint32 block that are ES"""
+    key = block[:, col]
+    if mask != ES_MASK:
+        key = key & np.uint32(mask)
+    return np.flatnonzero(key == np.uint32(magic))
+
+
+def records(block, rows, i0):
+    """ES records for rows of block, block[0] is sample i0"""
+    nwords = block.shape[1]
+    rec = np.zeros(len(rows), es_dtype(nwords))
+    rec['index'] = rows + i0
+    rec['es'] = block[rows]
+    if nwords > ES_CLOCK_COUNT:
+        rec['sample_count'] = rec['es'][:, ES_SAMPLE_COUNT]
+        rec['clock_count'] = rec['es'][:, ES_CLOCK_COUNT]
+    return rec
+
+
+class EsScanner:
+    """incremental ES scanner over a byte stream
+
+    Args:
+        ssb (int): sample size bytes, a multiple of 4
+        magic (int, optional): ES magic. Defaults to ES_MAGIC.
+        mask (int, optional): bits of word col to compare. Defaults to ES_MASK.
+        col (int, optional): word holding the magic. Defaults to 0.
+    """
+    def __init__(self, ssb, magic=ES_MAGIC, mask=ES_MASK, col=0):
+        if ssb % 4:
+            raise ValueError("EsScanner: ssb {} is not a multiple of 4".format(ssb))
+        self.ssb = ssb
+        self.nwords = ssb // 4
+        self.magic = magic
+        self.mask = mask
+        self.col = col
+        self.nsam = 0                   # samples scanned
+        self.carry = bytearray()
+        self.found = []
+
+    def __repr__(self):
+        return "EsScanner(ssb={}) nsam {} es {}".format(self.ssb, self.nsam, sum(len(f) for f in self.found))
+
+    def scan(self, block):
+        """scan a [n, nwords] uint32 block of whole samples, returns new records"""
+        rec = records(block, match(block, self.magic, self.mask, self.col), self.nsam)
+        self.nsam += len(block)
+        if len(rec):
+            self.found.append(rec)
+        return rec
+
+    def feed(self, buf):
+        """scan the next bytes of the stream, any length, returns new records"""
+        view = memoryview(buf).cast('B')
+        new = []
+        if self.carry:
+            need = min(self.ssb - len(self.carry), len(view))
+            self.carry += view[:need]
+            view = view[need:]
+            if len(self.carry) == self.ssb:
+                new.append(self.scan(np.frombuffer(self.carry, np.uint32).reshape(1, -1)))
+                self.carry = bytearray()
+        full = len(view) // self.ssb * self.ssb
+        if full:
+            new.append(self.scan(np.frombuffer(view[:full], np.uint32).reshape(-1, self.nwords)))
+        if full < len(view):
+            self.carry += view[full:]
+        return np.concatenate(new) if new else np.zeros(0, es_dtype(self.nwords))
+
+    def result(self):
+        """all records found so far"""
+        return np.concatenate(self.found) if self.found else np.zeros(0, es_dtype(self.nwords))
+
+
+def scan_stream(buffers, ssb, magic=ES_MAGIC, mask=ES_MASK, col=0):
+    """index a stream of buffers, eg a StreamReader or socket reads
+
+    Args:
+        buffers (iterable): bytes-like, ndarray or StreamReader Block
+        ssb (int): sample size bytes
+
+    Returns:
+        ndarray: ES_DTYPE records
+    """
+    scanner = EsScanner(ssb, magic, mask, col)
+    for buf in buffers:
+        scanner.feed(buf.data if hasattr(buf, 'seq') else buf)
+    return scanner.result()
+
+
+def scan_socket(sock, ssb, blocklen=0x400000, **kwargs):
+    """index everything received on sock until the peer closes"""
+    buf = bytearray(blocklen)
+
+    def reads():
+        while True:
+            nrx = sock.recv_into(buf)
+            if nrx == 0:
+                return
+            yield memoryview(buf)[:nrx]
+    return scan_stream(reads(), ssb, **kwargs)
+
+
+def cache_path(files):
+    return files[0] + CACHE_SUFFIX
+
+
+def _cache_key(files, ssb, magic, mask, col):
+    return np.array([sum(os.path.getsize(f) for f in files), len(files), ssb, magic, mask, col], np.int64)
+
+
+def load_cache(files, ssb, magic=ES_MAGIC, mask=ES_MASK, col=0):
+    """cached index if it is newer than the data and made with the same settings, else None"""
+    fn = cache_path(files)
+    try:
+        if os.path.getmtime(fn) < max(os.path.getmtime(f) for f in files):
+            return None
+        with np.load(fn) as npz:
+            if np.array_equal(npz['key'], _cache_key(files, ssb, magic, mask, col)):
+                return npz['esi']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def scan_files(files, ssb, magic=ES_MAGIC, mask=ES_MASK, col=0, cache=False, chunk_bytes=CHUNK_BYTES):
+    """index raw muxed files, memory mapped chunk by chunk
+
+    Args:
+        files (str|list): file or files in order, treated as one stream
+        ssb (int): sample size bytes
+        cache (bool, optional): use and store FILE.esi.npz next to the first file. Defaults to False.
+        chunk_bytes (int, optional): bytes per chunk. Defaults to demux.CHUNK_BYTES.
+
+    Returns:
+        ndarray: ES_DTYPE records
+    """
+    files = [ files ] if isinstance(files, str) else list(files)
+    if cache:
+        esi = load_cache(files, ssb, magic, mask, col)
+        if esi is not None:
+            return esi
+    scanner = EsScanner(ssb, magic, mask, col)
+    for i0, block in Demux(files, scanner.nwords, np.uint32, chunk_bytes).chunks():
+        scanner.nsam = i0
+        scanner.scan(block)
+    esi = scanner.result()
+    if cache:
+        try:
+            with open(cache_path(files), "wb") as fp:
+                np.savez(fp, esi=esi, key=_cache_key(files, ssb, magic, mask, col))
+        except OSError as e:
+            print("WARNING: es_index cache {} not saved {}".format(cache_path(files), e))
+    return esi
+
+
+def burst_lengths(esi, nsam=None):
+    """samples from each ES to the next, the last runs to nsam when given"""
+    edges = esi['index'] if nsam is None else np.append(esi['index'], nsam)
+    return np.diff(edges)
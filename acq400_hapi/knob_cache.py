@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+knob_cache.py persistent cache of the knob schema of a uut
+
+- SITELIST, per-site help (knob tables) and the factory() class decision
+- keyed by uut, MODEL, fpga_version and software_version
+- validated with one pipelined query per connect, rewritten on mismatch
+
+Environment:
+    ACQ400_KNOB_CACHE : cache directory, "0" disables.
+                        Defaults to ~/.cache/acq400_hapi
+"""
+
+import json
+import os
+
+CACHE_DIR = os.getenv("ACQ400_KNOB_CACHE",
+                      os.path.join(os.path.expanduser("~"), ".cache", "acq400_hapi"))
+
+class KnobCache:
+    """knob schema cache for one uut
+
+    Args:
+        uut (str) : uut hostname or ip-address
+    """
+    IDENT = ("MODEL", "fpga_version", "software_version", "SITELIST")
+    VERSION = 1
+
+    enabled = CACHE_DIR != "0"
+    trace = int(os.getenv("KNOB_CACHE_TRACE", "0"))
+    instances = {}
+
+    def __init__(self, uut):
+        self.uut = uut
+        self.path = os.path.join(CACHE_DIR, "{}.json".format(uut))
+        self.entry = self._load()
+        self.ident = {}
+        self.valid = False
+        self.dirty = False
+        self.s0 = None
+
+    def __repr__(self):
+        return "KnobCache({}) {}".format(self.uut, "valid" if self.valid else "invalid")
+
+    def _load(self):
+        if not self.enabled:
+            return {}
+        try:
+            with open(self.path) as fp:
+                entry = json.load(fp)
+            if entry.get("version") == self.VERSION:
+                return entry
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def validate(self, s0):
+        """compare uut identity with the cache, reset the cache on mismatch
+
+        Args:
+            s0 (netclient.Siteclient) : site 0 client
+
+        Returns:
+            bool: True if the cached schema may be used
+        """
+        self.s0 = s0
+        return self.check(dict(zip(self.IDENT, s0.sr_many(self.IDENT))))
+
+    def check(self, ident):
+        """compare ident, the IDENT knob values read from the uut, with the cache
+
+        Returns:
+            bool: True if the cached schema may be used
+        """
+        self.ident = ident
+        self.valid = self.entry.get("ident") == self.ident
+        if not self.valid:
+            if self.trace and self.entry:
+                print("{} stale, rebuild".format(repr(self)))
+            self.entry = {"version": self.VERSION, "ident": self.ident, "help": {}, "factory": None}
+            self.dirty = True
+        KnobCache.instances[self.uut] = self
+        return self.valid
+
+    def help(self, site, validated=True):
+        """cached knob list for site, None if not known
+
+        Args:
+            site (int) : site number
+            validated (bool, optional): only if validate() passed. Defaults to True.
+        """
+        if validated and not self.valid:
+            return None
+        return self.entry.get("help", {}).get(str(site))
+
+    def store_help(self, site, svc):
+        self.entry["help"][str(site)] = " ".join(svc.knobs.values())
+        self.dirty = True
+
+    def get_factory(self):
+        """cached factory() decision (classname, kwargs) or None"""
+        if not self.valid or not self.entry.get("factory"):
+            return None
+        return self.entry["factory"]["class"], self.entry["factory"]["kwargs"]
+
+    def set_factory(self, classname, kwargs):
+        decision = {"class": classname, "kwargs": kwargs}
+        if self.entry.get("factory") != decision:
+            self.entry["factory"] = decision
+            self.dirty = True
+
+    def save(self):
+        """write back if changed, atomic replace. Failure is not fatal."""
+        if not self.enabled or not self.dirty:
+            return
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = "{}.{}".format(self.path, os.getpid())
+            with open(tmp, "w") as fp:
+                json.dump(self.entry, fp, indent=1)
+            os.replace(tmp, self.path)
+            self.dirty = False
+            self.valid = True
+        except OSError as e:
+            if self.trace:
+                print("{} save failed {}".format(repr(self), e))
+
+    def invalidate(self):
+        """forget everything about this uut, in memory and on disk"""
+        self.entry = {}
+        self.valid = False
+        KnobCache.instances.pop(self.uut, None)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -3,6 +3,7 @@
 """
 netclient.py interface to client tcp socket with
 - sr() send/receive a command
+- sr_many(), batch() pipeline several commands in one round trip
 
 Created on Sun Jan  8 12:36:38 2017
 
@@ -14,8 +15,9 @@ import socket
 import re
 import sys
 import os
-from threading import Lock
+from threading import Lock, local
 import select
+from contextlib import contextmanager
 
 
 if sys.version_info < (3, 0):
@@ -130,29 +132,78 @@ class Netclient:
             nc.close()
 
 class Logclient(Netclient):
-    """Netclient optimised for logging, line by line"""
-    def __init__(self, addr, port):
+    """Netclient optimised for logging, line by line
+
+    Lines are cut from one bytes buffer, a burst of status lines costs
+    one recv. poll_bytes(), poll() and receive_message() share the buffer,
+    so they can be mixed.
+    """
+    EOL = b"\r\n"
+
+    def __init__(self, addr, port, eol=EOL):
        Netclient.__init__(self,addr, port)
        self.termex = re.compile("(\r\n)")
+       self.eol = eol
+       self.rxbuf = bytearray()
+
+    def fill(self, maxlen):
+        rx = self.sock.recv(maxlen)
+        if not rx:
+            raise ConnectionResetError("{} closed by peer".format(repr(self)))
+        if Netclient.trace > 1:
+            print("rx {}".format(rx))
+        self.rxbuf += rx
+
+    def poll_bytes(self, maxlen=65536):
+        """Read the next line from the socket
+
+        Returns:
+            bytearray: line without terminator
+        """
+        ix = self.rxbuf.find(self.eol)
+        while ix < 0:
+            start = max(0, len(self.rxbuf) - len(self.eol) + 1)
+            self.fill(maxlen)
+            ix = self.rxbuf.find(self.eol, start)
+        line = self.rxbuf[:ix]
+        del self.rxbuf[:ix + len(self.eol)]
+        return line
+
+    def receive_message(self, termex, maxlen=4096):
+        """as Netclient.receive_message(), from the poll_bytes() buffer"""
+        match = termex.search(self.rxbuf.decode("latin-1"))
+        while match == None:
+            self.fill(maxlen)
+            match = termex.search(self.rxbuf.decode("latin-1"))
+        rc = self.rxbuf[:match.start(1)].decode("latin-1")
+        del self.rxbuf[:match.end(1)]
+        return rc
 
     def poll(self):
-        return self.receive_message(self.termex)
+        if self.termex.pattern != "(\r\n)":
+            return self.receive_message(self.termex)    # custom terminator, regex split
+        return self.poll_bytes().decode("latin-1")
 
 
 
 
-class Siteclient(Netclient):
-    def synchronized(f):
-        def _synchronized(self, *args, **kwargs):
-            self.lock.acquire()
-            try:
-                rc = f(self, *args, **kwargs)
-            finally:
-                self.lock.release()
-            return rc
+_batch = local()
+
+
+def batch_state():
+    """this thread's Siteclient.batch() state
+
+    replies: open batch() replies per Siteclient, client: the Siteclient
+    with queued sets, queue: the queued sets
+    """
+    if not hasattr(_batch, "replies"):
+        _batch.replies = {}
+        _batch.client = None
+        _batch.queue = []
+    return _batch
 
-        return _synchronized
 
+class Siteclient(Netclient):
     """Netclient optimised for site service, may be multi-line response.
 
     Autodetects all knobs and holds them as properties for simple script-like
@@ -162,25 +213,147 @@ class Siteclient(Netclient):
     prevent_autocreate = False
     pat = re.compile(r"[:.]")
 
-    @synchronized
+    def _sr_many(self, messages):
+        if (self.trace):
+            for message in messages:
+                print("%s >%s" % (repr(self), message.rstrip()))
+        self.sock.sendall("".join(message+"\n" for message in messages).encode())
+        rxs = []
+        for message in messages:
+            rx = self.receive_message(self.termex).rstrip()
+            if self.show_responses and len(rx) > 1:
+                print(rx)
+            if (self.trace):
+                print("%s <%s" % (repr(self), rx))
+            rxs.append(rx)
+        return rxs
+
+    def _flush_batch(self, messages=()):
+        """send this thread's queued sets, then messages
+
+        Sets queued on this client go in the same burst as messages, sets
+        queued on another client are sent first, so commands stay in program order.
+        """
+        bs = batch_state()
+        queued, owner = bs.queue, bs.client
+        bs.queue, bs.client = [], None
+        if owner is not None and owner is not self:
+            with owner.lock:
+                bs.replies[owner].extend(owner._sr_many(queued))
+            queued = []
+        if not queued and not messages:
+            return []
+        with self.lock:
+            rxs = self._sr_many(queued + list(messages))
+        if queued:
+            bs.replies[self].extend(rxs[:len(queued)])
+        return rxs[len(queued):]
+
     def sr(self, message):
         """send a command and receive a reply
 
+        Inside a batch() in this thread, set commands (containing '=') are
+        queued and return "", any other command flushes the queue in the
+        same burst. Other threads are not batched.
+
         Args:
             message (str) : command (query) to send
 
         Returns:
             rx (str): response string
         """
-        if (self.trace):
-            print("%s >%s" % (repr(self), message.rstrip()))
-        self.sock.send((message+"\n").encode())
-        rx = self.receive_message(self.termex).rstrip()
-        if self.show_responses and len(rx) > 1:
-            print(rx)
-        if (self.trace):
-            print("%s <%s" % (repr(self), rx))
-        return rx
+        bs = batch_state()
+        if self in bs.replies and "=" in message:
+            if bs.client is not self:
+                self._flush_batch()
+                bs.client = self
+            bs.queue.append(message)
+            return ""
+        return self._flush_batch([message])[0]
+
+    def sr_many(self, messages):
+        """send several commands back-to-back, then receive all the replies
+
+        The replies are demultiplexed on the prompt, so N commands cost
+        one round trip rather than N.
+
+        Args:
+            messages (list) : commands (queries) to send
+
+        Returns:
+            rxs (list): response strings, one per message
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        return self._flush_batch(messages)
+
+    def sr_split(self, message):
+        """send a command now, receive the reply later
+
+        Lets one thread issue the same command to many uuts with minimal
+        skew, then collect the replies. The client is locked until the
+        returned receive() is called.
+
+        Args:
+            message (str) : command to send
+
+        Returns:
+            receive (func): call to get the response string
+        """
+        self.lock.acquire()
+        try:
+            if (self.trace):
+                print("%s >%s" % (repr(self), message.rstrip()))
+            self.sock.sendall((message+"\n").encode())
+        except:
+            self.lock.release()
+            raise
+
+        def receive():
+            try:
+                rx = self.receive_message(self.termex).rstrip()
+                if (self.trace):
+                    print("%s <%s" % (repr(self), rx))
+                return rx
+            finally:
+                self.lock.release()
+        return receive
+
+    @contextmanager
+    def batch(self):
+        """pipeline knob sets until the end of the block
+
+        eg::
+
+            with uut.s0.batch() as replies:
+                uut.s0.SIG_SRC_CLK_0 = 'HDMI'
+                uut.s0.SYS_CLK_FPMUX = 'ZCLK'
+            # replies holds the responses to the queued sets
+
+        Queries made inside the block are still answered immediately,
+        they take any queued sets along in the same burst.
+
+        The batch belongs to the calling thread, commands from other
+        threads are sent as usual. Commands to several clients, eg nested
+        s0.batch(), sA.batch(), reach the uut in program order.
+
+        Yields:
+            list: responses to the queued set commands, complete on exit
+        """
+        bs = batch_state()
+        if self in bs.replies:
+            yield bs.replies[self]          # nested: outer block flushes
+            return
+        replies = bs.replies[self] = []
+        try:
+            yield replies
+        finally:
+            try:
+                if bs.client is self:
+                    self._flush_batch()
+            finally:
+                del bs.replies[self]
 
 
     def build_knobs(self, knobstr):
@@ -234,7 +407,14 @@ class Siteclient(Netclient):
 
     trace = int(os.getenv("SITECLIENT_TRACE", "0"))
 
-    def __init__(self, addr, port):
+    def __init__(self, addr, port, knobstr=None):
+        """init Siteclient
+
+        Args:
+            addr (str) : ip-address or dns name on network
+            port (int) : server port number
+            knobstr (str, optional) : known knob list, skips the help query. Defaults to None.
+        """
 #        print("Siteclient.init")
         self.knobs = {}
         self.lock = Lock()
@@ -246,7 +426,7 @@ class Siteclient(Netclient):
         self.termex = re.compile(r"\n(acq400.[0-9]+ ([0-9]+) >)")
         self.trace = 1 if Siteclient.trace > 1 else 0
         self.sr("prompt on")
-        self.build_knobs(self.sr("help"))
+        self.build_knobs(knobstr if knobstr is not None else self.sr("help"))
         self.trace = Siteclient.trace
         self.prevent_autocreate = True
         #self.show_responses = True
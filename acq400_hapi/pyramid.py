@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+"""
+pyramid.py multi-resolution min/max/mean decimation for fast plots of huge channels
+
+- levels sit next to the channel file, CHFILE.mm256, CHFILE.mm4096 .. one
+  record (min, max, mean) per bin of 256, 4096 .. samples
+- PyramidWriter builds all levels incrementally as data is appended,
+  from demux or a stream writer stage, or build() does it for an existing file
+- PyramidStage is a streaming.StreamWriter stage, pyramids per channel of a
+  muxed stream as STREAMFILE_CHnn.mmNNN
+- Pyramid.minmax() picks the level for the plot pixel width, so a 1e9 sample
+  channel opens in ms and a one sample glitch still shows in the min/max envelope
+
+ - eg::
+
+       x, mn, mx, nbin = Pyramid("DATA/acq2106_123_01.dat", np.int16).minmax(0, None, 2000)
+       plot_minmax(ax, x, mn, mx, nbin)
+"""
+
+import glob
+import math
+import os
+
+import numpy as np
+
+BIN0 = 256
+FACTOR = 16
+LEVELS = 6
+SUFFIX = ".mm{}"
+
+
+def rec_dtype(dtype):
+    """pyramid record type for channel dtype"""
+    return np.dtype([('min', dtype), ('max', dtype), ('mean', np.float32)])
+
+
+def reduce_raw(y, nbin):
+    """records for full bins of nbin samples, the tail is ignored"""
+    n = len(y) // nbin
+    yy = np.asarray(y[:n*nbin]).reshape(n, nbin)
+    rec = np.empty(n, rec_dtype(yy.dtype))
+    rec['min'] = yy.min(axis=1)
+    rec['max'] = yy.max(axis=1)
+    rec['mean'] = yy.mean(axis=1, dtype=np.float64)
+    return rec
+
+
+def reduce_rec(rec, factor):
+    """combine groups of factor records, the tail is ignored"""
+    n = len(rec) // factor
+    rr = rec[:n*factor].reshape(n, factor)
+    out = np.empty(n, rec.dtype)
+    out['min'] = rr['min'].min(axis=1)
+    out['max'] = rr['max'].max(axis=1)
+    out['mean'] = rr['mean'].mean(axis=1, dtype=np.float64)
+    return out
+
+
+def minmax(y, width, x0=0):
+    """reduce an array to about width min/max bins, every sample counted
+
+    Args:
+        y (ndarray): data
+        width (int): target number of bins, eg plot width in pixels
+        x0 (int, optional): index of y[0]. Defaults to 0.
+
+    Returns:
+        (x, min, max, nbin): bin start index, min, max, samples per bin
+    """
+    nbin = max(1, math.ceil(len(y) / max(1, width)))
+    if nbin == 1:
+        return np.arange(x0, x0 + len(y)), y, y, 1
+    rec = reduce_raw(y, nbin)
+    tail = len(y) - len(rec) * nbin
+    if tail:
+        rec = np.append(rec, np.array([(y[-tail:].min(), y[-tail:].max(), y[-tail:].mean())], rec.dtype))
+    return x0 + np.arange(len(rec)) * nbin, rec['min'], rec['max'], nbin
+
+
+def ax_width(ax, default=2000):
+    """matplotlib axes width in pixels, the natural minmax() width"""
+    try:
+        return max(1, int(ax.get_window_extent().width))
+    except Exception:
+        return default
+
+
+def plot_minmax(ax, x, mn, mx, nbin, **kwargs):
+    """plot a minmax() result, a filled envelope, or a plain line at full resolution"""
+    if nbin == 1:
+        return ax.plot(x, mn, **kwargs)
+    return ax.fill_between(x, mn, mx, step='post', **kwargs)
+
+
+class PyramidWriter:
+    """builds the pyramid for one channel as data arrives
+
+    Args:
+        path (str): channel file path, level files are path.mmNNN
+        dtype (np.dtype): channel data type
+        bin0 (int, optional): samples per bin at level 0. Defaults to BIN0.
+        factor (int, optional): bin ratio between levels. Defaults to FACTOR.
+        levels (int, optional): number of levels. Defaults to LEVELS.
+    """
+    def __init__(self, path, dtype, bin0=BIN0, factor=FACTOR, levels=LEVELS):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rdtype = rec_dtype(self.dtype)
+        self.bins = [ bin0 * factor**k for k in range(levels) ]
+        self.factor = factor
+        self.carry_raw = np.zeros(0, self.dtype)
+        self.carry = [ np.zeros(0, self.rdtype) for _ in self.bins ]
+        self.fps = [ None for _ in self.bins ]
+        for fn in glob.glob(path + SUFFIX.format("*")):
+            os.remove(fn)
+
+    def append(self, y):
+        """add the next samples of the channel"""
+        if len(self.carry_raw):
+            y = np.concatenate((self.carry_raw, y))
+        n = len(y) // self.bins[0] * self.bins[0]
+        self.carry_raw = np.array(y[n:])
+        self._push(0, reduce_raw(y[:n], self.bins[0]))
+
+    def _write(self, k, rec):
+        if self.fps[k] is None:
+            self.fps[k] = open(self.path + SUFFIX.format(self.bins[k]), "wb")
+        self.fps[k].write(rec.tobytes())
+
+    def _push(self, k, rec):
+        if len(rec) == 0:
+            return
+        self._write(k, rec)
+        if k + 1 < len(self.bins):
+            r = np.concatenate((self.carry[k], rec))
+            n = len(r) // self.factor * self.factor
+            self.carry[k] = r[n:]
+            self._push(k + 1, reduce_rec(r[:n], self.factor))
+
+    def close(self):
+        """flush partial bins at the end of the channel"""
+        tail, count = None, 0
+        if len(self.carry_raw):
+            y = self.carry_raw
+            tail, count = np.array([(y.min(), y.max(), y.mean())], self.rdtype), len(y)
+        for k, nbin in enumerate(self.bins):
+            if tail is not None and (k == 0 or self.fps[k] is not None):
+                self._write(k, tail)
+            parts = self.carry[k] if tail is None else np.concatenate((self.carry[k], tail))
+            if len(parts) == 0:
+                tail = None
+                continue
+            weights = np.full(len(parts), nbin, np.float64)
+            if tail is not None:
+                weights[-1] = count
+            count = int(weights.sum())
+            tail = np.array([(parts['min'].min(), parts['max'].max(),
+                              np.average(parts['mean'], weights=weights))], self.rdtype)
+        for fp in self.fps:
+            if fp:
+                fp.close()
+        self.fps = [ None for _ in self.bins ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Pyramid:
+    """reads the pyramid levels next to a channel file
+
+    Args:
+        path (str): channel file path
+        dtype (np.dtype): channel data type
+    """
+    def __init__(self, path, dtype):
+        self.path = path
+        self.rdtype = rec_dtype(dtype)
+        self.levels = []                        # (bin, memmap), finest first
+        for fn in glob.glob(path + SUFFIX.format("*")):
+            try:
+                nbin = int(fn[len(path)+3:])
+            except ValueError:
+                continue
+            if os.path.getsize(fn) >= self.rdtype.itemsize:
+                self.levels.append((nbin, np.memmap(fn, self.rdtype, 'r')))
+        self.levels.sort(key=lambda lv: lv[0])
+
+    def __repr__(self):
+        return "Pyramid({}) bins {}".format(self.path, [ nbin for nbin, _ in self.levels ])
+
+    def __bool__(self):
+        return len(self.levels) > 0
+
+    @staticmethod
+    def exists(path):
+        return len(glob.glob(path + SUFFIX.format("*"))) > 0
+
+    def minmax(self, start, stop, width, raw=None):
+        """about width min/max bins over [start, stop)
+
+        Args:
+            start (int): first sample
+            stop (int): end sample, None for end of channel
+            width (int): target number of bins, eg plot width in pixels
+            raw (ndarray, optional): channel data, used when the range is finer than the first level
+
+        Returns:
+            (x, min, max, nbin): as minmax()
+        """
+        if stop is None:
+            stop = len(raw) if raw is not None else self.levels[0][0] * len(self.levels[0][1])
+        span = max(1, stop - start) / max(1, width)
+        usable = [ lv for lv in self.levels if lv[0] <= span ]
+        if not usable:
+            if raw is None:
+                raise ValueError("Pyramid: range finer than {} needs raw".format(self.levels[0][0]))
+            return minmax(raw[start:stop], width, start)
+        nbin, level = usable[-1]
+        lo = start // nbin
+        rec = level[lo:math.ceil(stop / nbin)]
+        group = max(1, len(rec) // max(1, width))
+        out = reduce_rec(rec, group)
+        if len(rec) % group:
+            rest = rec[len(out)*group:]
+            out = np.append(out, np.array([(rest['min'].min(), rest['max'].max(), rest['mean'].mean())], rec.dtype))
+        return (lo + np.arange(len(out)) * group) * nbin, out['min'], out['max'], nbin * group
+
+
+class PyramidStage:
+    """StreamWriter stage, builds per channel pyramids of a muxed stream
+
+    Args:
+        path (str): stream file, channel pyramids are path_CHnn.mmNNN, ch from 1
+        nchan (int): channels per sample, ssb / word size
+        dtype (np.dtype): word type
+        channels (list, optional): channel indices from 0. Defaults to all.
+    """
+    def __init__(self, path, nchan, dtype, channels=None):
+        self.nchan = nchan
+        self.dtype = np.dtype(dtype)
+        self.channels = list(range(nchan)) if channels is None else list(channels)
+        self.carry = np.zeros(0, self.dtype)
+        self.pws = [ PyramidWriter("{}_CH{:02d}".format(path, ic+1), self.dtype) for ic in self.channels ]
+
+    def __call__(self, block):
+        y = np.frombuffer(block.data, self.dtype)
+        if len(self.carry):
+            y = np.concatenate((self.carry, y))
+        n = len(y) // self.nchan * self.nchan
+        self.carry = np.array(y[n:])
+        yy = y[:n].reshape(-1, self.nchan)
+        for ic, pw in zip(self.channels, self.pws):
+            pw.append(yy[:, ic])
+
+    def close(self):
+        for pw in self.pws:
+            pw.close()
+
+
+def build(path, dtype, chunk=0x1000000):
+    """build the pyramid for an existing channel file
+
+    Args:
+        path (str): channel file path
+        dtype (np.dtype): channel data type
+        chunk (int, optional): samples per read. Defaults to 16M.
+    """
+    dtype = np.dtype(dtype)
+    with PyramidWriter(path, dtype) as pw:
+        if os.path.getsize(path) >= dtype.itemsize:
+            mm = np.memmap(path, dtype, 'r')
+            for ii in range(0, len(mm), chunk):
+                pw.append(mm[ii:ii+chunk])
+    return path
@@ -5,35 +5,24 @@ import os
 import errno
 
 def wait_for_state(uut, state, timeout=0):
-    UUTS = [uut]
-    time0 = 0
-    if time0 == 0:
-        time0 = time.time()
-    for uut in UUTS:
-        olds = ""
-        finished = False
-        dots = 0
-        pollcat = 0
-
-        while not finished:
-            st = uut.s0.TRANS_ACT_STATE.split(' ')[1] #Real name TRANS_ACT:STATE
-            finished = st == state
-            news = "polling {}:{} {} waiting for {}".format(uut.uut, st, 'DONE' if finished else '', state)
-            if news != olds:
-                sys.stdout.write("\n{:06.2f}: {}".format(time.time() - time0, news))
-                olds = news
-            else:
-                sys.stdout.write('.')
-                dots += 1
-                if dots >= 20:
-                    dots = 0
-                    olds = ""
-            if not finished:
-                if timeout and (time.time() - time0) > timeout:
-                    sys.exit("\ntimeout waiting for {}".format(news))
-                time.sleep(1)
-            pollcat += 1
-    print("")
+    """wait for TRANS_ACT:STATE == state, woken by the uut status monitor
+
+    Args:
+        uut (acq400): uut instance, with statmon
+        state (str): state name eg "ARM", "IDLE"
+        timeout (int, optional): seconds, 0 waits forever. Defaults to 0.
+    """
+    time0 = time.time()
+    sys.stdout.write("\n{:06.2f}: {} waiting for {}".format(0, uut.uut, state))
+    try:
+        try:
+            uut.wait_for_state(state, timeout)
+        except ValueError:
+            # not a TSTAT state name, test the knob on each transition
+            uut.wait_for_knob(lambda: uut.s0.TRANS_ACT_STATE.split(' ')[1] == state, timeout)
+    except TimeoutError:
+        sys.exit("\ntimeout waiting for {}:{}".format(uut.uut, state))
+    print("\n{:06.2f}: {}:{} DONE".format(time.time() - time0, uut.uut, state))
 
 
 class ActionScript:
@@ -46,82 +35,138 @@ class ActionScript:
 
 
 
+ZOMBIE_TIMEOUT=float(os.getenv("ZOMBIE_TIMEOUT", "30"))
+STATMON_CHECK = 1.0     # seconds between status monitor checks while waiting
+
 class ShotController:
     """ShotController handles shot synchronization for a set of uuts
+
+    One watcher for all uuts: state events from each uut status monitor
+    are collected under a single condition, so arm and completion waits
+    cost no threads and no CPU while nothing happens.
+
+    prep_shot() subscribes to the status monitors, wait_complete() or
+    release() unsubscribes. Use as a context manager to release on error.
+
+    Args:
+        _uuts (list): acq400 instances, master first
+        shot (int, optional): set shot number. Defaults to None.
+        zombie_timeout (float, optional): seconds to wait for the rest once \
+            one uut has finished, 0 waits forever. Defaults to 30.
     """
     def prep_shot(self):
         for u in self.uuts:
             u.statmon.stopped.clear()
             u.statmon.armed.clear()
-
-        self.tp = [ threading.Thread(target=u.statmon.wait_stopped) for u in self.uuts]
-
-        for t in self.tp:
-            t.setDaemon(True)
-            t.start()
-
-        self.ta = [threading.Thread(target=u.statmon.wait_armed) for u in self.uuts]
-
-        for t in self.ta:
-            t.setDaemon(True)
-            t.start()
+        with self.cv:
+            self.armed = set()
+            self.stopped = set()
+            self.zombies = []
+        if not self.subscriptions:
+            self.subscriptions = [(u, u.statmon.subscribe(self.on_state(u), ("state",))) for u in self.uuts]
+
+    def on_state(self, u):
+        def _on_state(event, value):
+            state0, state1 = value
+            with self.cv:
+                if state1 == 1:
+                    self.armed.add(u.uut)
+                if state0 and state1 == 0:
+                    self.stopped.add(u.uut)
+                self.cv.notify_all()
+        return _on_state
+
+    def release(self):
+        """stop watching the uuts"""
+        for u, handle in self.subscriptions:
+            u.statmon.unsubscribe(handle)
+        self.subscriptions = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def wait_until(self, test, descr, timeout=None):
+        """wait for test(), checking every STATMON_CHECK that the status monitors still run
+
+        Returns:
+            bool: False on timeout
+
+        Raises:
+            StatusMonitorStopped: a uut status monitor broke or quit
+        """
+        t1 = None if timeout is None else time.time() + timeout
+        with self.cv:
+            while True:
+                wait = STATMON_CHECK if t1 is None else min(STATMON_CHECK, t1 - time.time())
+                if self.cv.wait_for(test, max(wait, 0)):
+                    return True
+                if t1 is not None and time.time() >= t1:
+                    return False
+                for u in self.uuts:
+                    u.check_statmon(descr)
+
+    def wait_all(self, done, descr):
+        """wait until every uut is in done, or zombie_timeout after the first one
+
+        Returns:
+            list: zombies, uuts that never made it
+
+        Raises:
+            StatusMonitorStopped: a uut status monitor broke or quit
+        """
+        names = [u.uut for u in self.uuts]
+        waiting = "waiting for {}".format(descr)
+        self.wait_until(lambda: len(done) > 0, waiting)
+        if not self.wait_until(lambda: len(done) == len(names), waiting,
+                               self.zombie_timeout if self.zombie_timeout else None):
+            with self.cv:
+                self.zombies = [u for u in self.uuts if u.uut not in done]
+        if self.zombies:
+            self.on_zombies(self.zombies, descr)
+        return self.zombies
+
+    def on_zombies(self, zombies, descr):
+        """runs when zombie_timeout expires, expect subclass override."""
+        print("we have zombies")
+        for u in zombies:
+            print("{} zombie not {} after {}s".format(u.uut, descr, self.zombie_timeout))
 
     def wait_armed(self):
-        wdt = threading.Thread(target=self.wdt, kwargs={'wait_list': self.ta})
-        wdt.start()
-        for t in self.ta:
-            t.join()
-        wdt.join()
+        self.wait_all(self.armed, "armed")
 
     def wait_complete(self):
-        # @@TODO start a watcher task. If one or more has completed, kill the rest after a timeout.
-        wdt = threading.Thread(target=self.wdt, kwargs={'wait_list': self.tp}) 
-        wdt.start()
-        for t in self.tp:
-            t.join()
-        wdt.join()   
-
-    def wdt(self, wait_list):
-        loops_with_zombies = 0
-        
-        while True:
-            alive = 0
-            dead = 0
-            for t in wait_list:
-                if t.is_alive():
-                    alive += 1
-                else:
-                    dead += 1
-            if alive == 0:
-                return
-            elif dead == 0:
-                continue
-            else:
-                loops_with_zombies += 1
-                if loops_with_zombies/10 > self.zombie_timeout:
-                    print("we have zombies")
-                    for ix, u in enumerate(self.uuts):
-                        if wait_list[ix].is_alive():
-                            print("{} zombie requested to leave".format(u.uut))
-                            u.statmon.break_requested = True
-            time.sleep(0.1)
-                             
-            
-            
+        """wait for every uut to stop, then release the status monitors"""
+        try:
+            self.wait_all(self.stopped, "stopped")
+        finally:
+            self.release()
+
+    @staticmethod
     def arm_shot_action(u):
         def _arm_shot_action():
-            time.sleep(1)
 #            u.s0.TRANSIENT_SET_ARM = 1
             u.s0.set_arm = 1
         return _arm_shot_action
 
-
     def arm_shot(self):
-        thx = [ threading.Thread(target=ShotController.arm_shot_action(u)) for u in reversed(self.uuts) ]
-        for t in thx:
-            t.start()
-        for t in thx:
-            t.join()
+        """arm all uuts, slaves first: commands go out back-to-back from one thread, then wait for ARM"""
+        replies = []
+        try:
+            for u in reversed(self.uuts):
+                replies.append(u.s0.sr_split("set_arm=1"))
+        finally:
+            # every receive() releases its uut, one failure must not leave the rest locked
+            errors = []
+            for receive in replies:
+                try:
+                    receive()
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
         self.wait_armed()
 
     def abort_shot(self):
@@ -205,10 +250,16 @@ class ShotController:
         return (chx, len(self.uuts), len(chx[0]), len(chx[0][0]))
 
 
-    def __init__(self, _uuts, shot=None, zombie_timeout=30):
+    def __init__(self, _uuts, shot=None, zombie_timeout=ZOMBIE_TIMEOUT):
+        if isinstance(_uuts, tuple): _uuts = list(_uuts)
         if not isinstance(_uuts, list): _uuts = [_uuts]
         self.uuts = _uuts
         self.zombie_timeout = zombie_timeout
+        self.cv = threading.Condition()
+        self.subscriptions = []
+        self.armed = set()
+        self.stopped = set()
+        self.zombies = []
         if shot != None:
             for u in self.uuts:
                 u.s1.shot = shot
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+"""
+shotdata.py lazy, memory mapped access to stored shot data
+
+- indexes a directory once, no data is read until it is sliced
+- layouts:
+    * dirfile, file per channel listed in a ``format`` file
+    * file per channel, eg acq2106_123_CH01 or acq2106_123_01.dat, no format file
+    * raw muxed data, cycle dirs NNNNNN/nnnn, plain nnnn files, one big file or a list of files
+- ``ds[ch, start:stop:stride]`` touches only the pages it needs, ch from 1
+- per-channel calibration from format LINCOM entries or from the uut
+- minmax() plots from the pyramid.py levels when they exist
+
+ - eg::
+
+       ds = ShotData("/data/acq2106_123")                       # dirfile
+       ds = ShotData("/data/ACQ400DATA/1/acq2106_123", nchan=96) # muxed cycles
+       ch1 = ds[1, ::1000]
+       volts = ds.volts(2, slice(1000, 2000))
+"""
+
+import os
+import re
+
+import numpy as np
+
+from .demux import Demux
+from .pyramid import Pyramid, minmax
+
+# dirfile RAW type letters and names
+DIRFILE_TYPES = {
+    'c': np.uint8, 'u': np.uint16, 's': np.int16, 'U': np.uint32, 'S': np.int32, 'i': np.int32,
+    'f': np.float32, 'd': np.float64,
+    'UINT8': np.uint8, 'INT8': np.int8, 'UINT16': np.uint16, 'INT16': np.int16,
+    'UINT32': np.uint32, 'INT32': np.int32, 'UINT64': np.uint64, 'INT64': np.int64,
+    'FLOAT32': np.float32, 'FLOAT64': np.float64,
+}
+
+CHANFILE_RE = re.compile(r'(?:_CH([0-9]{2,3})|_([0-9]{2,3})\.dat)$')
+MUXFILE_RE = re.compile(r'^[.0-9]{4,5}(\.dat)?$')
+CYCLE_RE = re.compile(r'^[0-9]{6}$')
+
+
+class ShotData:
+    """one uut's stored shot, channels indexed from 1
+
+    Args:
+        path (str|list): directory, single muxed file or list of muxed files
+        nchan (int, optional): channels per sample, required for muxed data. Defaults to None.
+        dtype (np.dtype, optional): word type for muxed data or channel files with no format. Defaults to np.int16.
+        cycles (list, optional): muxed cycle dirs to use, eg ["000001"]. Defaults to all.
+    """
+    def __init__(self, path, nchan=None, dtype=np.int16, cycles=None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chfiles = {}               # ch: (path, dtype)
+        self.maps = {}
+        self.demux = None
+        self.eslo = None
+        self.eoff = None
+        self.layout = None
+
+        if isinstance(path, (list, tuple)):
+            self._index_muxed(list(path), nchan)
+        elif os.path.isfile(path):
+            self._index_muxed([path], nchan)
+        elif os.path.isfile(os.path.join(path, "format")):
+            self._index_format()
+        else:
+            self._index_dir(nchan, cycles)
+
+    def __repr__(self):
+        path = self.path if isinstance(self.path, str) else "{}..".format(self.path[0])
+        return "ShotData({}) {} nchan={} nsam={}".format(path, self.layout, self.nchan, self.nsam)
+
+    def _index_format(self):
+        self.layout = "dirfile"
+        lincom = {}
+        fields = []
+        with open(os.path.join(self.path, "format")) as fp:
+            for line in fp:
+                tok = line.split()
+                if len(tok) < 3 or tok[0].startswith('#'):
+                    continue
+                if tok[1] == 'RAW':
+                    fields.append((tok[0], DIRFILE_TYPES.get(tok[2], self.dtype)))
+                elif tok[1] == 'LINCOM':
+                    # name LINCOM [n] src m b
+                    src, m, b = tok[-3:]
+                    lincom[src] = (float(m), float(b))
+        cal = {}
+        for ix, (name, dtype) in enumerate(fields):
+            fn = os.path.join(self.path, name)
+            if not os.path.isfile(fn):
+                continue
+            mt = CHANFILE_RE.search(name)
+            ch = int(mt.group(1) or mt.group(2)) if mt else ix + 1
+            self.chfiles[ch] = (fn, np.dtype(dtype))
+            if name in lincom:
+                cal[ch] = lincom[name]
+        if cal:
+            self.set_calibration({ ch: m for ch, (m, b) in cal.items() }, { ch: b for ch, (m, b) in cal.items() })
+
+    def _index_dir(self, nchan, cycles):
+        ls = sorted(os.listdir(self.path))
+        for name in ls:
+            mt = CHANFILE_RE.search(name)
+            if mt and not MUXFILE_RE.match(name) and os.path.isfile(os.path.join(self.path, name)):
+                self.chfiles[int(mt.group(1) or mt.group(2))] = (os.path.join(self.path, name), self.dtype)
+        if self.chfiles:
+            self.layout = "chfiles"
+            return
+
+        cycle_dirs = [ c for c in ls if CYCLE_RE.match(c) and os.path.isdir(os.path.join(self.path, c)) ]
+        if cycles is not None:
+            cycle_dirs = [ c for c in cycle_dirs if c in cycles ]
+        roots = [ os.path.join(self.path, c) for c in cycle_dirs ] or [ self.path ]
+        files = []
+        for root in roots:
+            files.extend(os.path.join(root, f) for f in sorted(os.listdir(root)) if MUXFILE_RE.match(f))
+        if not files:
+            raise FileNotFoundError("ShotData: no data found in {}".format(self.path))
+        self._index_muxed(files, nchan)
+
+    def _index_muxed(self, files, nchan):
+        if nchan is None:
+            raise ValueError("ShotData: muxed data needs nchan")
+        self.layout = "muxed"
+        self.demux = Demux(files, nchan, self.dtype)
+
+    @property
+    def channels(self):
+        """list of channel numbers, from 1"""
+        if self.demux:
+            return list(range(1, self.demux.nchan + 1))
+        return sorted(self.chfiles)
+
+    @property
+    def nchan(self):
+        return len(self.channels)
+
+    @property
+    def nsam(self):
+        if self.demux:
+            return self.demux.nsam
+        return max((len(self.channel(ch)) for ch in self.chfiles), default=0)
+
+    def __len__(self):
+        return self.nsam
+
+    def channel(self, ch):
+        """whole channel ch as a read only memmap, file per channel layouts only"""
+        mm = self.maps.get(ch)
+        if mm is None:
+            fn, dtype = self.chfiles[ch]
+            if os.path.getsize(fn) < dtype.itemsize:
+                mm = np.zeros(0, dtype)
+            else:
+                mm = np.memmap(fn, dtype, 'r')
+            self.maps[ch] = mm
+        return mm
+
+    def __getitem__(self, key):
+        """ds[ch], ds[ch, start:stop:stride], ds[ch, sample]"""
+        ch, sl = key if isinstance(key, tuple) else (key, slice(None))
+        if self.demux is None:
+            return self.channel(ch)[sl]
+        if ch < 1 or ch > self.demux.nchan:
+            raise IndexError("ShotData: channel {} out of range".format(ch))
+        if isinstance(sl, (int, np.integer)):
+            sl = slice(sl, sl + 1) if sl != -1 else slice(sl, None)
+            return self._muxed(ch - 1, sl)[0]
+        return self._muxed(ch - 1, sl)
+
+    def _muxed(self, ic, sl):
+        start, stop, stride = sl.indices(self.demux.nsam)
+        if stride < 0:
+            rng = range(start, stop, stride)
+            return self._muxed(ic, slice(rng[-1], start + 1, -stride))[::-1] if len(rng) else np.zeros(0, self.dtype)
+        out = np.empty(len(range(start, stop, stride)), self.dtype)
+        ix = 0
+        for i0, block in self.demux.chunks(start, stop):
+            first = -(i0 - start) % stride
+            col = block[first::stride, ic]
+            out[ix:ix+len(col)] = col
+            ix += len(col)
+        return out
+
+    def pyramid(self, ch):
+        """min/max Pyramid for ch, may be empty. Muxed files look for FILE_CHnn.mmNNN"""
+        if self.demux is None:
+            fn, dtype = self.chfiles[ch]
+        else:
+            fn, dtype = "{}_CH{:02d}".format(self.demux.files[0], ch), self.dtype
+        return Pyramid(fn, dtype)
+
+    def minmax(self, ch, start=0, stop=None, width=2000):
+        """about width min/max bins of channel ch over [start, stop), for plotting
+
+        Uses the pyramid when there is one, else reduces the raw data.
+
+        Returns:
+            (x, min, max, nbin): see pyramid.minmax()
+        """
+        stop = self.nsam if stop is None else min(stop, self.nsam)
+        pyr = self.pyramid(ch)
+        if pyr:
+            raw = self.channel(ch) if self.demux is None else None
+            try:
+                return pyr.minmax(start, stop, width, raw)
+            except ValueError:
+                pass
+        return minmax(self[ch, start:stop], width, start)
+
+    def set_calibration(self, eslo, eoff):
+        """per channel volts = raw * eslo + eoff
+
+        Args:
+            eslo (list|dict): indexed by channel from 1, a list has a dummy entry 0 as Acq400.cal_eslo
+            eoff (list|dict): as eslo
+        """
+        nc = max(self.channels, default=0) + 1
+        self.eslo = np.ones(nc, np.float64)
+        self.eoff = np.zeros(nc, np.float64)
+        for dst, src in ((self.eslo, eslo), (self.eoff, eoff)):
+            items = src.items() if isinstance(src, dict) else enumerate(src)
+            for ch, val in items:
+                if 0 < int(ch) < nc:
+                    dst[int(ch)] = float(val)
+
+    def calibrate_from(self, uut):
+        """take calibration from an Acq400 uut"""
+        if len(uut.cal_eslo) == 1:
+            uut.fetch_all_calibration()
+        self.set_calibration(uut.cal_eslo, uut.cal_eoff)
+
+    def volts(self, ch, sl=slice(None)):
+        """calibrated ds[ch, sl]
+
+        Raises:
+            ValueError: no calibration set
+        """
+        if self.eslo is None:
+            raise ValueError("ShotData: no calibration, use set_calibration() or calibrate_from()")
+        return self[ch, sl] * self.eslo[ch] + self.eoff[ch]
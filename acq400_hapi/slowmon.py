@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+slowmon.py block mode reader for the uut SLOWMON port
+
+- SlowmonReader receives as many whole rows as are waiting per recv, straight
+  into a preallocated [maxrows] array of (ch, sp) rows, a partial row is carried
+- each block is chx[nrows, nchan], spx[nrows, nspad], views, no copy
+- hex_rows(), dec_rows(), egu_rows() format a whole block, one vector op per
+  column, no per element python formatting
+- raw binary output is the received rows, one write per block
+
+ - eg::
+
+       rdr = uut.slowmon_reader()
+       cal = uut.calibration()
+       for chx, spx in rdr:
+           volts = cal.volts(chx, axis=-1)     # [nrows, nchan]
+           fp.write("\\n".join(egu_rows(volts)) + "\\n")
+"""
+
+import socket
+from functools import reduce
+
+import numpy as np
+
+SLOWMON_PORT = 53666        # AcqPorts.SLOWMON, acq400.py imports this module
+
+
+def row_dtype(nchan, data_size=2, nspad=4):
+    """one slowmon row: nchan channels then nspad uint32 spad words"""
+    return np.dtype([ ('ch', 'i4' if data_size == 4 else 'i2', (nchan,)), ('sp', 'u4', (nspad,)) ])
+
+
+class SlowmonReader:
+    """reads the slowmon stream a block of rows at a time
+
+    A block is a view of the reader buffer, valid until the next read().
+
+    Args:
+        uut (str): uut hostname or ip-address
+        nchan (int): channels per row
+        data_size (int, optional): 2|4 bytes per channel. Defaults to 2.
+        nspad (int, optional): uint32 spad words per row. Defaults to 4.
+        port (int, optional): uut port. Defaults to SLOWMON_PORT.
+        maxrows (int, optional): largest block. Defaults to 1024.
+    """
+    def __init__(self, uut, nchan, data_size=2, nspad=4, port=SLOWMON_PORT, maxrows=1024):
+        self.uut = uut
+        self.port = port
+        self.dtype = row_dtype(nchan, data_size, nspad)
+        self.ssb = self.dtype.itemsize
+        self.nchan = nchan
+        self.nspad = nspad
+        self.rows = np.zeros(maxrows, self.dtype)
+        self.bytes = self.rows.view(np.uint8)
+        self.sock = None
+        self.ib = 0                 # bytes held
+        self.used = 0               # bytes handed out by the last read
+        self.nrows = 0              # rows read
+        self.nblocks = 0
+
+    def __repr__(self):
+        return "SlowmonReader({}:{} nchan={} ssb={}) {}".format(self.uut, self.port, self.nchan, self.ssb, self.stats())
+
+    def stats(self):
+        return { "rows": self.nrows, "blocks": self.nblocks }
+
+    def start(self):
+        self.sock = socket.create_connection((self.uut, self.port))
+        return self
+
+    def read(self):
+        """next block of whole rows, waits for at least one
+
+        Returns:
+            (chx, spx) : [nrows, nchan] and [nrows, nspad] views, or None at end of stream
+        """
+        if self.used:
+            tail = self.ib - self.used
+            self.bytes[:tail] = self.bytes[self.used:self.ib]
+            self.ib = tail
+            self.used = 0
+        while self.ib < self.ssb:
+            if self.sock is None:
+                return None
+            try:
+                nrx = self.sock.recv_into(self.bytes[self.ib:])
+            except OSError:
+                nrx = 0
+            if nrx == 0:
+                return None
+            self.ib += nrx
+        nrows = self.ib // self.ssb
+        self.used = nrows * self.ssb
+        self.nrows += nrows
+        self.nblocks += 1
+        block = self.rows[:nrows]
+        return block['ch'], block['sp']
+
+    def raw(self):
+        """bytes of the last block, as received"""
+        return self.bytes[:self.used]
+
+    def __iter__(self):
+        if self.sock is None:
+            self.start()
+        while True:
+            block = self.read()
+            if block is None:
+                break
+            yield block
+
+    def close(self):
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def format_rows(xarr, fmt, sep=", ", head="", tail=""):
+    """one string per row of a 2-D array, fmt is a % format applied per column
+
+    Returns:
+        ndarray: str per row
+    """
+    cols = np.char.mod(fmt, np.atleast_2d(xarr)).T
+    if len(cols) == 0:
+        return np.full(len(xarr), head + tail)
+    txt = reduce(lambda a, b: np.char.add(np.char.add(a, sep), b), cols)
+    return np.char.add(np.char.add(head, txt), tail)
+
+
+def hex_rows(xarr):
+    """[ 0052, ffed, .. ] per row, 16 bit columns as 4 digits, 32 bit as 8"""
+    uview = xarr.view(np.uint16 if xarr.dtype.itemsize == 2 else np.uint32)
+    return format_rows(uview, "%04x" if xarr.dtype.itemsize == 2 else "%08x", head="[ ", tail=" ]")
+
+
+def dec_rows(xarr):
+    """[ 000089, -00016, .. ] per row"""
+    return format_rows(xarr, "%06d" if xarr.dtype == np.int16 else "%10d", head="[ ", tail=" ]")
+
+
+def egu_rows(volts):
+    """-7.52828e-04,-1.47888e-03,.. per row"""
+    return format_rows(volts, "%.5e", sep=",")
+
+
+def row_numbers(row0, nrows):
+    return np.char.mod("%d", np.arange(row0, row0 + nrows))
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+
+"""
+streaming.py zero-copy stream reader for the uut STREAM port
+
+- StreamRing : N preallocated slots, explicit acquire/release of filled blocks
+- StreamReader : receiver thread, fills the ring straight from the socket
+- StreamWriter : writer thread, drains the ring to disk in large aligned writes
+
+A block stays valid until it is released, the receiver never writes
+into a slot a consumer holds. When the ring is full the receiver either
+waits (back-pressure, the uut sees TCP flow control) or discards into a
+scratch slot and counts the overrun. Nothing is overwritten silently.
+
+ - eg::
+
+       with StreamReader(uut.uut, nslots=32, blocklen=ssb*1024) as rdr:
+           for block in rdr:
+               analyse(block.data)     # ndarray view of the slot
+"""
+
+import fcntl
+import math
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+STREAM_PORT = 4210          # AcqPorts.STREAM, acq400.py imports this module
+ALIGN = 4096                # slot and O_DIRECT write alignment
+
+
+def aligned_blocklen(blocklen, ssb):
+    """round blocklen up to a multiple of both ssb and ALIGN, for O_DIRECT"""
+    unit = ssb * ALIGN // math.gcd(ssb, ALIGN)
+    return -(-blocklen // unit) * unit
+
+
+class Block:
+    """one filled slot
+
+    Attributes:
+        seq (int): block sequence number from stream start
+        slot (int): slot index
+        nbytes (int): valid bytes, less than blocklen only at end of stream
+        data (ndarray): view of the valid bytes as dtype, no copy
+    """
+    __slots__ = ("seq", "slot", "nbytes", "data")
+
+    def __init__(self, seq, slot, nbytes, data):
+        self.seq = seq
+        self.slot = slot
+        self.nbytes = nbytes
+        self.data = data
+
+    def __repr__(self):
+        return "Block(seq={}, slot={}, nbytes={})".format(self.seq, self.slot, self.nbytes)
+
+
+class StreamRing:
+    """N preallocated slots, single producer, single consumer
+
+    Args:
+        nslots (int): number of slots
+        blocklen (int): bytes per slot
+        dtype (np.dtype, optional): element type of Block.data. Defaults to int16.
+        drop (bool, optional): when full, discard new data (count overruns) \
+            instead of blocking the producer. Defaults to False.
+    """
+    def __init__(self, nslots, blocklen, dtype=np.int16, drop=False):
+        self.nslots = nslots
+        self.blocklen = blocklen
+        self.dtype = np.dtype(dtype)
+        self.drop = drop
+        raw = np.empty(nslots * blocklen + ALIGN, np.uint8)
+        off = -raw.ctypes.data % ALIGN
+        self.buffer = raw[off:off + nslots * blocklen]
+        self.scratch = np.empty(blocklen, np.uint8)
+        self.slots = [ memoryview(self.buffer[ii*blocklen:(ii+1)*blocklen]) for ii in range(nslots) ]
+        self.nbytes = [0] * nslots
+        self.seqs = [0] * nslots
+        self.cv = threading.Condition()
+        self.head = 0               # next slot to fill
+        self.tail = 0               # next slot to acquire
+        self.count = 0              # filled, not yet acquired
+        self.held = 0               # acquired, not yet released
+        self.eof = False
+        self.seq = 0
+
+        self.blocks = 0
+        self.bytes = 0
+        self.backpressure_waits = 0
+        self.backpressure_time = 0.0
+        self.overrun_blocks = 0
+        self.overrun_bytes = 0
+
+    def __repr__(self):
+        return "StreamRing(nslots={}, blocklen={}) {}".format(self.nslots, self.blocklen, self.stats())
+
+    def stats(self):
+        return { "blocks": self.blocks, "bytes": self.bytes,
+                 "backpressure_waits": self.backpressure_waits,
+                 "backpressure_time": self.backpressure_time,
+                 "overrun_blocks": self.overrun_blocks, "overrun_bytes": self.overrun_bytes }
+
+    # producer side
+    def get_free(self):
+        """slot to fill next, blocking if the ring is full
+
+        Returns:
+            (int, memoryview): slot index, -1 for the scratch slot when dropping
+        """
+        with self.cv:
+            if self.count + self.held >= self.nslots:
+                if self.drop:
+                    return -1, memoryview(self.scratch)
+                self.backpressure_waits += 1
+                t0 = time.time()
+                self.cv.wait_for(lambda: self.count + self.held < self.nslots or self.eof)
+                self.backpressure_time += time.time() - t0
+            return self.head, self.slots[self.head]
+
+    def commit(self, slot, nbytes):
+        """publish a filled slot"""
+        with self.cv:
+            seq = self.seq
+            self.seq += 1
+            if slot < 0:
+                self.overrun_blocks += 1
+                self.overrun_bytes += nbytes
+                return
+            self.nbytes[slot] = nbytes
+            self.seqs[slot] = seq
+            self.head = (self.head + 1) % self.nslots
+            self.count += 1
+            self.blocks += 1
+            self.bytes += nbytes
+            self.cv.notify_all()
+
+    def close(self):
+        """end of stream, wakes all waiters"""
+        with self.cv:
+            self.eof = True
+            self.cv.notify_all()
+
+    # consumer side
+    def acquire(self, timeout=None):
+        """next filled block, in order
+
+        Returns:
+            Block, or None at end of stream or timeout
+        """
+        with self.cv:
+            if not self.cv.wait_for(lambda: self.count > 0 or self.eof, timeout) or self.count == 0:
+                return None
+            slot = self.tail
+            self.tail = (self.tail + 1) % self.nslots
+            self.count -= 1
+            self.held += 1
+        nbytes = self.nbytes[slot]
+        nelems = nbytes // self.dtype.itemsize
+        data = np.frombuffer(self.slots[slot], self.dtype, nelems)
+        return Block(self.seqs[slot], slot, nbytes, data)
+
+    def release(self, block):
+        """return a block's slot to the producer, block.data must not be used after"""
+        with self.cv:
+            self.held -= 1
+            self.cv.notify_all()
+
+
+class StreamReader:
+    """receiver thread, fills a StreamRing from a uut data port
+
+    Blocks are acquired in order and must be released, in order.
+    Iterating releases the previous block automatically.
+
+    Args:
+        uut (str): uut hostname or ip-address
+        port (int, optional): uut port. Defaults to STREAM_PORT.
+        nslots (int, optional): ring slots. Defaults to 16.
+        blocklen (int, optional): bytes per slot, a multiple of ssb keeps samples whole. Defaults to 1MB.
+        data_size (int, optional): 2|4 element size of Block.data. Defaults to 2.
+        drop (bool, optional): count overruns rather than back-pressure the uut. Defaults to False.
+    """
+    def __init__(self, uut, port=STREAM_PORT, nslots=16, blocklen=0x100000, data_size=2, drop=False):
+        self.uut = uut
+        self.port = port
+        self.ring = StreamRing(nslots, blocklen, np.dtype('i4' if data_size == 4 else 'i2'), drop)
+        self.sock = None
+        self.thread = None
+        self.quit_requested = False
+        self.error = None
+        self.current = None
+
+    def __repr__(self):
+        return "StreamReader({}:{}) {}".format(self.uut, self.port, self.ring.stats())
+
+    def start(self):
+        self.sock = socket.create_connection((self.uut, self.port))
+        self.thread = threading.Thread(target=self.receiver, daemon=True)
+        self.thread.start()
+        return self
+
+    def receiver(self):
+        ring = self.ring
+        try:
+            while not self.quit_requested:
+                slot, view = ring.get_free()
+                if ring.eof:
+                    break
+                pos = 0
+                while pos < ring.blocklen:
+                    nrx = self.sock.recv_into(view[pos:])
+                    if nrx == 0:
+                        break
+                    pos += nrx
+                if pos:
+                    ring.commit(slot, pos)
+                if pos < ring.blocklen:
+                    break                   # end of stream
+        except OSError as e:
+            if not self.quit_requested:
+                self.error = e
+        finally:
+            ring.close()
+
+    def acquire(self, timeout=None):
+        return self.ring.acquire(timeout)
+
+    def release(self, block):
+        self.ring.release(block)
+
+    def __iter__(self):
+        while True:
+            block = self.ring.acquire()
+            if self.current is not None:
+                self.ring.release(self.current)
+            self.current = block
+            if block is None:
+                break
+            yield block
+        if self.error:
+            raise self.error
+
+    def stop(self):
+        self.quit_requested = True
+        self.ring.close()
+        sock, self.sock = self.sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class StreamWriter:
+    """writer thread, drains a StreamReader to file(s)
+
+    One write per block, so disk stalls back up into the ring and not the
+    socket. Blocks pass through stages, callables stage(block), before
+    they are written. A stage with a close() method is closed at the end.
+
+    Args:
+        reader (StreamReader): source, or any reader with acquire(), release(), stop() eg broker.BrokerReader
+        path (str): output file, None to drain without writing
+        maxbytes (int, optional): stop after maxbytes. Defaults to 0, no limit.
+        rotate (int, optional): start a new file every rotate bytes, \
+            path.0000, path.0001 .. Defaults to 0, one file.
+        direct (bool, optional): O_DIRECT writes, blocklen should be from aligned_blocklen(). Defaults to False.
+        preallocate (bool, optional): fallocate each file to rotate or maxbytes. Defaults to False.
+        stages (list, optional): per block callables. Defaults to ().
+    """
+    def __init__(self, reader, path, maxbytes=0, rotate=0, direct=False, preallocate=False, stages=()):
+        self.reader = reader
+        self.path = path
+        self.maxbytes = maxbytes
+        self.rotate = rotate
+        self.direct = direct and hasattr(os, "O_DIRECT")
+        self.preallocate = preallocate
+        self.stages = list(stages)
+        self.thread = None
+        self.fd = None
+        self.files = []
+        self.file_bytes = 0
+        self.bytes = 0
+        self.blocks = 0
+        self.timestart = 0
+        self.idle_time = 0.0
+        self.write_time = 0.0
+        self.max_write_time = 0.0
+        self.maxbytes_reached = False
+        self.error = None
+
+    def __repr__(self):
+        return "StreamWriter({}) {}".format(self.path, self.stats())
+
+    def stats(self):
+        ring = getattr(self.reader, "ring", None)
+        return { "bytes": self.bytes, "files": len(self.files),
+                 "rx_stall": ring.backpressure_time if isinstance(ring, StreamRing) else 0.0,
+                 "write_time": self.write_time, "max_write_time": self.max_write_time,
+                 "idle_time": self.idle_time }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+        return self
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def open(self):
+        fn = self.path if not self.rotate else "{}.{:04d}".format(self.path, len(self.files))
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        if self.direct:
+            try:
+                self.fd = os.open(fn, flags | os.O_DIRECT, 0o644)
+            except OSError as e:
+                print("StreamWriter: {} O_DIRECT not supported {}, buffered writes".format(fn, e))
+                self.direct = False
+        if not self.direct:
+            self.fd = os.open(fn, flags, 0o644)
+        size = self.rotate or self.maxbytes
+        if self.preallocate and size:
+            try:
+                os.posix_fallocate(self.fd, 0, size)
+            except OSError as e:
+                print("StreamWriter: {} fallocate failed {}".format(fn, e))
+        self.files.append(fn)
+        self.file_bytes = 0
+
+    def close(self):
+        if self.fd is None:
+            return
+        if self.preallocate:
+            os.ftruncate(self.fd, self.file_bytes)
+        os.close(self.fd)
+        self.fd = None
+
+    def write(self, view):
+        if self.direct and len(view) % ALIGN:
+            # short tail: O_DIRECT needs whole ALIGN units
+            fcntl.fcntl(self.fd, fcntl.F_SETFL, fcntl.fcntl(self.fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+        while len(view):
+            view = view[os.write(self.fd, view):]
+
+    def put(self, view):
+        while len(view):
+            if self.fd is None:
+                self.open()
+            nbytes = len(view)
+            if self.rotate:
+                nbytes = min(nbytes, self.rotate - self.file_bytes)
+            t0 = time.time()
+            self.write(view[:nbytes])
+            dt = time.time() - t0
+            self.write_time += dt
+            self.max_write_time = max(self.max_write_time, dt)
+            self.file_bytes += nbytes
+            if self.rotate and self.file_bytes >= self.rotate:
+                self.close()
+            view = view[nbytes:]
+
+    def block_view(self, block):
+        """bytes of block, ring slots keep any odd tail beyond block.data"""
+        if block.slot < 0:
+            return memoryview(block.data).cast('B')[:block.nbytes]
+        return self.reader.ring.slots[block.slot][:block.nbytes]
+
+    def writer(self):
+        try:
+            while True:
+                t0 = time.time()
+                block = self.reader.acquire()
+                if block is None:
+                    break
+                if self.timestart == 0:
+                    self.timestart = time.time()
+                else:
+                    self.idle_time += time.time() - t0
+                for stage in self.stages:
+                    stage(block)
+                view = self.block_view(block)
+                if self.maxbytes and self.bytes + len(view) >= self.maxbytes:
+                    view = view[:self.maxbytes - self.bytes]
+                    self.maxbytes_reached = True
+                if self.path:
+                    self.put(view)
+                self.bytes += len(view)
+                self.blocks += 1
+                self.reader.release(block)
+                if self.maxbytes_reached:
+                    break
+        except OSError as e:
+            self.error = e
+            print("StreamWriter: {}".format(e))
+        finally:
+            self.close()
+            for stage in self.stages:
+                if hasattr(stage, "close"):
+                    stage.close()
+            self.reader.stop()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+"""
+waveforms.py vectorized AWG waveform synthesis with a pattern cache
+
+- unit waves, sin(), sinc(), sine(), ramp(), square(), are whole array numpy
+  expressions, no per sample python
+- to_int() scales [nchan, nsam] waves straight into a preallocated interleaved
+  [nsam, nchan] int16/int32 AWG buffer, a chunk of samples at a time, so
+  there is no full size float temporary
+- functions marked @cached keep their result in an LRU cache keyed by the
+  waveform parameters and bounded in bytes, a HIL loop that plays the same
+  patterns again gets them back with no work. Cached arrays are read-only
+
+Environment:
+    WAVEFORM_CACHE_MB : cache size, default 512, 0 disables
+
+ - eg::
+
+       aw = full_scale(nchan=32, nsam=100000)             # int16 [nsam, nchan]
+       aw = rainbow(32, 100000, ch=3)                     # cached, repeat calls are free
+       uut.load_awg(aw)
+
+       out = np.empty((nsam, nchan), np.int32)
+       to_int(waves, np.int32, gain=2**31-1, out=out)     # waves [nchan, nsam], -1..1
+"""
+
+import os
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+
+CHUNK = 0x10000                 # samples per to_int() pass
+NCYCLES = 5
+
+
+class LruCache:
+    """least recently used cache, bounded by the total bytes held
+
+    Args:
+        maxbytes (int): bytes held, the oldest entries are dropped first
+    """
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "LruCache({}) {}".format(self.maxbytes, self.stats())
+
+    def stats(self):
+        return { "entries": len(self.entries), "bytes": self.nbytes, "hits": self.hits, "misses": self.misses }
+
+    def get(self, key, build):
+        """cached value for key, else build() it and keep it"""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = build()
+        value.flags.writeable = False
+        if value.nbytes <= self.maxbytes:
+            self.entries[key] = value
+            self.nbytes += value.nbytes
+            while self.nbytes > self.maxbytes:
+                self.nbytes -= self.entries.popitem(last=False)[1].nbytes
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+CACHE = LruCache(int(os.getenv("WAVEFORM_CACHE_MB", "512")) * 0x100000)
+
+
+def cached(fn):
+    """keep fn results in CACHE, keyed by the name and (hashable) arguments"""
+    @wraps(fn)
+    def wrap(*args, **kwargs):
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        return CACHE.get(key, lambda: fn(*args, **kwargs))
+    return wrap
+
+
+@cached
+def sin(nsam, ncycles=NCYCLES):
+    """ncycles of sin in nsam samples, amplitude 1"""
+    return np.sin(np.arange(nsam) * ncycles * 2 * np.pi / nsam)
+
+
+@cached
+def sinc(nsam, ncycles=NCYCLES, xoff=0):
+    """sin(x)/x over ncycles either side of the centre, peak shifted xoff samples"""
+    xx = np.arange(-nsam//2 - xoff, nsam//2 - xoff) * ncycles * 2 * np.pi / nsam
+    with np.errstate(invalid='ignore', divide='ignore'):
+        yy = np.sin(xx) / xx
+    yy[xx == 0] = 1
+    return yy
+
+
+@cached
+def sine(wavelength, phase=0.0, cycles=1):
+    """cycles of sine in wavelength samples, starting at -phase radians"""
+    return np.sin(np.linspace(-phase, -phase + (cycles * 2) * np.pi, wavelength))
+
+
+@cached
+def ramp(wavelength, phase=0.0, cycles=1):
+    """cycles of 0..1 ramp in wavelength samples"""
+    return np.mod(np.linspace(0, cycles, wavelength) + phase, 1)
+
+
+@cached
+def square(wavelength, phase=0.0, cycles=1):
+    return np.sign(sine(wavelength, phase, cycles))
+
+
+def to_int(waves, dtype=np.int16, gain=1.0, offset=0.0, out=None):
+    """interleaved AWG buffer, out[t, ch] = waves[ch, t] * gain + offset
+
+    Values are clipped to the dtype range, then truncated as astype().
+
+    Args:
+        waves (ndarray): [nchan, nsam] or [nsam] float, a broadcast view is fine
+        dtype (np.dtype, optional): np.int16 or np.int32. Defaults to np.int16.
+        gain (float|array, optional): scale, scalar or per channel. Defaults to 1.0.
+        offset (float|array, optional): added after gain, scalar or per channel. Defaults to 0.0.
+        out (ndarray, optional): [nsam, nchan] destination, eg a slice of a bigger buffer. Defaults to new array.
+
+    Returns:
+        ndarray: out
+    """
+    waves = np.atleast_2d(waves)
+    nchan, nsam = waves.shape
+    if out is None:
+        out = np.empty((nsam, nchan), dtype)
+    info = np.iinfo(out.dtype)
+    for i0 in range(0, nsam, CHUNK):
+        tmp = np.multiply(waves[:, i0:i0+CHUNK].T, gain)
+        tmp += offset
+        np.clip(tmp, info.min, info.max, out=tmp)
+        np.copyto(out[i0:i0+CHUNK], tmp, casting='unsafe')
+    return out
+
+
+@cached
+def full_scale(nchan, nsam, ncycles=NCYCLES, dtype=np.int16):
+    """the same full scale sin on every channel"""
+    return to_int(np.broadcast_to(sin(nsam, ncycles), (nchan, nsam)), dtype, np.iinfo(dtype).max)
+
+
+def rainbow_offset(nchan):
+    """per channel offset of the rainbow, volts"""
+    return -9.0 + 8.0 * np.arange(nchan) / nchan
+
+
+@cached
+def rainbow(nchan, nsam, ch, sinc_off_ch=None, ncycles=NCYCLES, gain=1.0, current=(), ao0=0, dtype=np.int16):
+    """sin stepped in offset per channel, channel ch replaced by a sinc
+
+    Full scale is 10V. current are raw offsets per channel from ao0, eg from AwgDefaults.
+
+    Returns:
+        ndarray: [nsam, nchan] dtype
+    """
+    sinc_off_ch = ch if sinc_off_ch is None else sinc_off_ch
+    vgain = np.iinfo(dtype).max / 10 / gain
+    raw = np.zeros(nchan)
+    raw[ao0:ao0+len(current)] = current
+    out = to_int(np.broadcast_to(sin(nsam, ncycles), (nchan, nsam)), dtype, vgain,
+                 rainbow_offset(nchan) * vgain + raw)
+    to_int(sinc(nsam, ncycles, sinc_off_ch*100) * 5 + 2, dtype, vgain, raw[ch], out=out[:, ch:ch+1])
+    return out
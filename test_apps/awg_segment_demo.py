@@ -31,12 +31,9 @@ def wait_for_segment(uut, segment):
         time.sleep(0.5)
 
 def wait_for_run(uut):
-    started = False
-    while pv(uut.s0.CONTINUOUS_STATE) != 'RUN':
-        if not started:
-            uut.s0.CONTINUOUS = 1
-            started = True
-        time.sleep(1)
+    if pv(uut.s0.CONTINUOUS_STATE) != 'RUN':
+        uut.s0.CONTINUOUS = 1
+        uut.wait_for_continuous_state('RUN', timeout=0)
 
 def get_groups(max, total):
     groups = []
@@ -34,10 +34,10 @@ CHUNK_SIZE = 4096
 
 
 def configure_acq(args, acq):
-    while acq400_hapi.pv(acq.s0.CONTINUOUS_STATE) != "IDLE":
+    if acq400_hapi.pv(acq.s0.CONTINUOUS_STATE) != "IDLE":
         acq.s0.CONTINUOUS = 0
         print(f"WARNING: requesting {acq.uut} to stop")
-        time.sleep(1)
+        acq.wait_for_continuous_state("IDLE", timeout=0)
 
     module_sites = acq.s0.get_knob("sites").split(",")
     for s in module_sites:
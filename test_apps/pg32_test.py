@@ -19,8 +19,7 @@ def run_main():
         print('-'*80)
         print(f'SHOT={ii} / {MAXSHOTS}')
         top_result = subprocess.Popen(['./user_apps/acq1001/run_livetop.py', TOP], stdout=subprocess.PIPE, text=True)
-        while acq400_hapi.pv(top.s0.CONTINUOUS_STATE) != "ARM":
-            time.sleep(1)
+        top.wait_for_continuous_state("ARM", timeout=0)
 
         pgsvc = uut.svc[f's{PGSITE}']
         pgsvc.GPG_ENABLE = '0'
@@ -243,12 +243,11 @@ def monitor(uut):
     print("uut:{}  {} {}".format(uut.uut, monitor_dds(uut, 'A'), monitor_dds(uut, 'B')))
           
 def wait_arm(uut):
-    counter = 0
-    while acq400_hapi.pv(uut.s0.CONTINUOUS_STATE) != "ARM":
-        counter += 1
-        if counter > 4:
-            print("uut {} slow to ARM".format(uut.uut))
-        time.sleep(0.5)
+    try:
+        uut.wait_for_continuous_state("ARM", timeout=2)
+    except TimeoutError:
+        print("uut {} slow to ARM".format(uut.uut))
+        uut.wait_for_continuous_state("ARM", timeout=0)
                 
 def init_dual_chirp(args, uut):
     gps_sync(uut, ddsX=args.ddsX, gps_sync_chirp_en=False)
@@ -15,12 +15,9 @@ python t_latch_histogram.py
 
 
 import argparse
-import numpy as np
 import matplotlib.pyplot as plt
 from os.path import expanduser
-import os
-import threading
-import concurrent.futures
+from acq400_hapi.continuity import tlatch_histogram
 
 
 def plot_histogram(histo, args):
@@ -33,58 +30,15 @@ def plot_histogram(histo, args):
     return None
 
 
-def collect_dtimes(t_latch):
-    histo = {1: 0, 2: 0, 3: 0}
-    ideal = np.arange(t_latch[0], t_latch.shape[-1]+t_latch[0])
-    if np.array_equal(t_latch, ideal):
-        histo[1] += len(t_latch)
-    else:
-        pos = 0
-        while True:
-            t_latch_test = np.subtract(ideal, t_latch)
-            first_nonzero = (t_latch_test != 0).argmax(axis=0)
-            if first_nonzero == 0:
-                break
-            pos = first_nonzero + 1
-            diff = t_latch[first_nonzero] - ideal[first_nonzero]
-            if diff in histo:
-                histo[diff] += 1
-            else:
-                histo[diff] = 1
-
-            t_latch = t_latch[pos:]
-            ideal = np.arange(t_latch[0], t_latch.shape[-1]+t_latch[0])
-
-            if t_latch.shape[-1] == 0:
-                break
-
-    return histo
-
-
-def collect_tlatch(args):
+def tlatch_path(args):
     if args.src == "PROJECTS/AFHBA404/afhba.0.log":
         home = expanduser("~")
-        data = np.fromfile(home+"/"+args.src, dtype=np.int32)
-    else:
-        data = np.fromfile(args.src, dtype=np.int32)
-
-    t_latch = data[int(args.nchan/2)::int(args.nchan/2+args.spad_len)]
-    print("Finished collecting data")
-    return t_latch
+        return home+"/"+args.src
+    return args.src
 
 
 def run_analysis(args):
-    tlatch = collect_tlatch(args)
-    t_latch_split = np.array_split(tlatch, 8)
-    histo = {}
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        results = executor.map(collect_dtimes, t_latch_split)
-        for result in results:
-            for key in result:
-                if key in histo:
-                    histo[key] += result[key]
-                else:
-                    histo[key] = result[key]
+    histo = tlatch_histogram(tlatch_path(args), args.nchan//2 + args.spad_len, args.nchan//2)
 
     for key in histo:
         print("T_LATCH differences: ", key,
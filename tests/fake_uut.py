@@ -0,0 +1,66 @@
+"""local stand-ins for uut services, for tests"""
+
+import socket
+import threading
+
+
+def serve_once(payload):
+    """listen on a free local port, send payload to the first client, close
+
+    Returns:
+        int: port
+    """
+    srv = socket.create_server(("127.0.0.1", 0))
+
+    def run():
+        conn, _ = srv.accept()
+        with conn:
+            conn.sendall(payload)
+        srv.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return srv.getsockname()[1]
+
+
+class SiteServer:
+    """site service: knob=value sets reply "ack", knob queries reply the value
+
+    Every command received is appended to log as (site, command), pass
+    one log to several servers to see the order across sites.
+    """
+    def __init__(self, site, knobs, log=None):
+        self.site = site
+        self.knobs = dict(knobs)
+        self.log = [] if log is None else log
+        self.srv = socket.create_server(("127.0.0.1", 0))
+        self.port = self.srv.getsockname()[1]
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def reply(self, cmd):
+        if cmd == "prompt on":
+            return ""
+        if cmd == "help":
+            return " ".join(self.knobs)
+        self.log.append((self.site, cmd))
+        if "=" in cmd:
+            knob, value = cmd.split("=", 1)
+            self.knobs[knob] = value
+            return "ack"
+        return self.knobs.get(cmd, "")
+
+    def serve(self, conn):
+        with conn, conn.makefile("r") as fp:
+            for line in fp:
+                rx = "{}\nacq400.{} 0 >".format(self.reply(line.rstrip("\n")), self.site)
+                conn.sendall(rx.encode())
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.srv.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self.srv.close()
@@ -0,0 +1,74 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from acq400_hapi import awg_upload
+
+
+class ShortSock:
+    """sendmsg() takes at most limit bytes per call, like a full socket buffer"""
+    def __init__(self, limit):
+        self.limit = limit
+        self.rx = bytearray()
+        self.calls = 0
+
+    def sendmsg(self, views):
+        self.calls += 1
+        nsent = 0
+        for view in views:
+            take = bytes(view[:self.limit - nsent])
+            self.rx += take
+            nsent += len(take)
+            if nsent == self.limit:
+                break
+        return nsent
+
+    def sendall(self, view):
+        self.rx += bytes(view)
+
+
+@pytest.mark.parametrize("limit", [ 1, 7, 100, 101, 250, 100000 ])
+def test_sendmsg_all_short_sends(limit):
+    views = [ memoryview(bytes([ ii ]) * 100) for ii in range(5) ] + [ memoryview(b"tail") ]
+    sock = ShortSock(limit)
+    awg_upload.sendmsg_all(sock, views)
+    assert sock.rx == b"".join(views)
+    assert all(len(v) in (100, 4) for v in views)      # caller's list is left alone
+
+
+@pytest.mark.parametrize("repeats", [ 0, 1, 2, 9 ])
+def test_send_repeats(monkeypatch, repeats):
+    monkeypatch.setattr(awg_upload, "SCATTER_BYTES", 4 * 1000)
+    pattern = np.arange(500, dtype=np.int16)
+    sock = ShortSock(333)
+    stats = awg_upload.send(sock, pattern, repeats)
+    assert sock.rx == pattern.tobytes() * repeats
+    assert stats["bytes"] == 1000 * repeats
+
+
+def test_as_bytes_no_copy():
+    arr = np.arange(12, dtype=np.int32).reshape(3, 4)
+    view = awg_upload.as_bytes(arr)
+    arr[0, 0] = 99
+    assert len(view) == 48 and view[0] == 99
+    assert bytes(awg_upload.as_bytes(arr[:, 1])) == arr[:, 1].tobytes()
+    assert awg_upload.as_bytes(bytearray(b"abc")).tobytes() == b"abc"
+
+
+def test_send_file(tmp_path):
+    path = tmp_path / "W32"
+    path.write_bytes(b"hdr" + bytes(range(256)) * 40)
+    tx, rx = socket.socketpair()
+    got = []
+    reader = threading.Thread(target=lambda: got.extend(iter(lambda: rx.recv(65536), b"")))
+    reader.start()
+    with open(path, "rb") as fp:
+        fp.read(3)
+        stats = awg_upload.send(tx, fp, repeats=3)
+        assert fp.tell() == 3
+    tx.close()
+    reader.join(5)
+    assert b"".join(got) == (bytes(range(256)) * 40) * 3
+    assert stats["bytes"] == 256 * 40 * 3
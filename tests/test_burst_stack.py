@@ -0,0 +1,51 @@
+import numpy as np
+
+from acq400_hapi import burst_stack
+from acq400_hapi.es_index import ES_MAGIC
+
+NCHAN = 4
+BLEN = 50
+STARTS = (0, 60, 120, 180)
+
+
+def uut_data(shift=0):
+    """32 bit channels, ES on every channel then a ramp that codes the channel"""
+    data = np.zeros((NCHAN, 220), np.int32)
+    data[:] = np.arange(220) + 1000 * np.arange(NCHAN)[:, None]
+    for s in STARTS:
+        data[:, s + shift] = np.uint32(ES_MAGIC).view(np.int32)
+    return data
+
+
+def test_find_es_double_tap():
+    ch = uut_data()[0].view(np.int16)
+    assert list(burst_stack.find_es(ch)) == [ s * 2 for s in STARTS ]
+    assert list(burst_stack.find_es(ch, chunk=7)) == [ s * 2 for s in STARTS ]
+
+
+def test_burst_shape():
+    esi = [ np.array(STARTS), np.array(STARTS[:3]) ]
+    assert burst_stack.burst_shape(esi) == (3, 60)
+
+
+def test_stack(tmp_path):
+    data = [ uut_data(), uut_data(1) ]
+    esi = [ burst_stack.find_es(d[0]) for d in data ]
+    assert list(esi[1]) == [ s + 1 for s in STARTS ]
+    out = burst_stack.stack(data, esi, BLEN, offset=1, chunk=BLEN * 2)
+    assert out.shape == (2, NCHAN, len(STARTS), BLEN)
+    for u, d in enumerate(data):
+        for b, s in enumerate(STARTS[:3]):
+            assert np.array_equal(out[u, :, b], d[:, s+u+1:s+u+1+BLEN])
+    assert not out[:, :, 3].any()       # runs past the end of the data
+
+
+def test_stack_short_esi_to_file(tmp_path):
+    data = [ uut_data(), uut_data() ]
+    esi0 = burst_stack.find_es(data[0][0])[:2]
+    out = burst_stack.stack(data, [ esi0 ] * 2, BLEN, offset=1, nburst=4, path=str(tmp_path / "stack.npy"))
+    assert isinstance(out, np.memmap)
+    saved = np.load(tmp_path / "stack.npy")
+    assert np.array_equal(saved, out)
+    assert np.array_equal(saved[1, :, 1], data[1][:, 61:61+BLEN])
+    assert not saved[:, :, 2:].any()
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from acq400_hapi import calibration
+from acq400_hapi.calibration import Calibration
+
+
+def site(eslo, eoff):
+    return SimpleNamespace(AI_CAL_ESLO="1 1 1 " + " ".join(map(str, eslo)),
+                           AI_CAL_EOFF="1 1 1 " + " ".join(map(str, eoff)))
+
+
+class FakeUut:
+    def __init__(self, name):
+        self.uut = name
+        self.reads = 0
+
+    def get_aggregator_svc_list(self):
+        self.reads += 1
+        return [ site([ 1e-3, 2e-3 ], [ 0.5, -0.5 ]), site([ 3e-3 ], [ 1.0 ]) ]
+
+
+def test_from_uut_and_cache(monkeypatch):
+    monkeypatch.setattr(calibration, "_cache", {})
+    uut = FakeUut("acq2106_999")
+    cal = Calibration.get(uut, shot=1)
+    assert cal.nchan == 3
+    assert np.allclose(cal.eslo, [ 0, 1e-3, 2e-3, 3e-3 ])
+    assert Calibration.get(uut, shot=1) is cal and uut.reads == 1
+    assert Calibration.get(uut, shot=2) is not cal and uut.reads == 2
+    Calibration.get(uut, shot=2, refresh=True)
+    assert uut.reads == 3
+
+
+def test_volts():
+    cal = Calibration([ 0, 1e-3, 2e-3, 3e-3 ], [ 0, 0.5, -0.5, 1.0 ])
+    raw = np.arange(12, dtype=np.int16).reshape(3, 4)
+    ref = raw * cal.eslo[1:, None] + cal.eoff[1:, None]
+    assert np.allclose(cal.volts(raw), ref)
+    assert np.allclose(cal.volts(raw.T, axis=-1), ref.T)
+    assert np.allclose(cal.volts(raw[1], chans=2), ref[1])
+    assert np.allclose(cal.volts(raw[[0, 2]], chans=[1, 3]), ref[[0, 2]])
+    out = np.empty((3, 4), np.float32)
+    assert cal.volts(raw, out=out) is out
+    assert np.allclose(out, ref, rtol=1e-6)
+    fraw = raw.astype(np.float64)
+    cal.volts(fraw, out=fraw)
+    assert np.allclose(fraw, ref)
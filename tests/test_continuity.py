@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from acq400_hapi import continuity
+
+NWORDS = 4
+COL = 2
+
+
+def reference(counter):
+    deltas, counts = np.unique(np.diff(counter.astype(np.uint32)).view(np.int32), return_counts=True)
+    return dict(zip(deltas.tolist(), counts.tolist()))
+
+
+@pytest.fixture
+def counter():
+    steps = np.ones(1000, np.uint32)
+    steps[[ 10, 99, 100, 101, 500, 999 ]] = [ 2, 5, 0, 3, 0xffffffff, 7 ]    # gaps, repeat, step back
+    return np.cumsum(steps, dtype=np.uint32) + np.uint32(0xffffff00)          # wraps
+
+
+@pytest.mark.parametrize("chunk", [ 1, 2, 7, 100, 999, 1000, 5000 ])
+def test_delta_histogram_chunks(counter, chunk):
+    histo = continuity.delta_histogram(counter, chunk)
+    assert histo == reference(counter)
+    assert sum(histo.values()) == len(counter) - 1
+    assert list(histo) == sorted(histo)
+    assert histo[-1] == 1 and histo[1] == len(counter) - 7
+
+
+def test_delta_histogram_short():
+    assert continuity.delta_histogram(np.zeros(0, np.uint32)) == {}
+    assert continuity.delta_histogram(np.zeros(1, np.uint32)) == {}
+
+
+def test_tlatch_histogram(counter, tmp_path):
+    rows = np.zeros((len(counter), NWORDS), np.uint32)
+    rows[:, COL] = counter
+    path = tmp_path / "afhba.0.log"
+    with open(path, "wb") as fp:
+        fp.write(rows.tobytes())
+        fp.write(b"\x01" * 12)              # partial last sample
+    assert continuity.tlatch_histogram(str(path), NWORDS, COL, chunk=33) == reference(counter)
+
+
+def test_check_carries_split_samples(counter):
+    rows = np.zeros((len(counter), NWORDS), np.uint32)
+    rows[:, COL] = counter
+    raw = rows.tobytes()
+    chk = continuity.ContinuityCheck(NWORDS * 4, COL, verbose=0)
+    for i0 in range(0, len(raw), 37):
+        chk(raw[i0:i0+37])
+    assert chk.nsam == len(counter)
+    assert [ gap["missed"] for gap in chk.gaps ] == [ 1, 4, -1, 2, -2, 6 ]
+    assert [ gap["sample"] for gap in chk.gaps ] == [ 10, 99, 100, 101, 500, 999 ]
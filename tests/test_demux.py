@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from acq400_hapi.demux import Demux
+
+NCHAN = 6
+NSAM = 1000
+
+
+@pytest.fixture
+def dmx(tmp_path):
+    """muxed ramp, in files that end part way through a sample, chunks of 7.5 samples"""
+    data = np.arange(NSAM * NCHAN, dtype=np.int16).reshape(NSAM, NCHAN)
+    flat = data.reshape(-1)
+    files = []
+    for ii, (e0, e1) in enumerate(((0, 1001), (1001, 1002), (1002, 4000), (4000, NSAM * NCHAN))):
+        fn = tmp_path / "{:04d}".format(ii)
+        flat[e0:e1].tofile(fn)
+        files.append(str(fn))
+    (tmp_path / "empty").touch()
+    files.insert(2, str(tmp_path / "empty"))
+    dm = Demux(files, NCHAN, np.int16, chunk_bytes=NCHAN * 2 * 15 // 2)
+    dm.data = data
+    return dm
+
+
+def test_chunks_cover_every_sample(dmx):
+    i1 = 0
+    for i0, block in dmx.chunks():
+        assert i0 == i1
+        assert np.array_equal(block, dmx.data[i0:i0 + len(block)])
+        i1 = i0 + len(block)
+    assert i1 == NSAM
+
+
+def test_to_array(dmx):
+    assert dmx.nsam == NSAM
+    assert np.array_equal(dmx.to_array(), dmx.data.T)
+    assert np.array_equal(dmx.to_array([4, 1], start=166, stop=500), dmx.data[166:500, [4, 1]].T)
+
+
+def test_split_joins(dmx):
+    ranges = dmx.split(7, 3, 995)
+    assert ranges[0][0] == 3 and ranges[-1][1] == 995
+    assert all(a[1] == b[0] for a, b in zip(ranges[:-1], ranges[1:]))
+
+
+def test_to_array_jobs_default_out(dmx):
+    out = dmx.to_array([0, 2, 5], jobs=3)
+    assert isinstance(out, np.memmap)
+    assert np.array_equal(out, dmx.data[:, [0, 2, 5]].T)
+
+
+def test_to_array_jobs_memmap_out(dmx, tmp_path):
+    out = np.memmap(tmp_path / "out", np.int16, 'w+', shape=(NCHAN, NSAM))
+    assert dmx.to_array(jobs=3, out=out) is out
+    assert np.array_equal(out, dmx.data.T)
+
+
+def test_to_array_jobs_array_out(dmx):
+    out = np.zeros((2, NSAM - 10), np.int16)
+    assert dmx.to_array([3, 4], out=out, start=10, jobs=3) is out
+    assert np.array_equal(out, dmx.data[10:, 3:5].T)
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_to_files(dmx, tmp_path, jobs):
+    paths = dmx.to_files(str(tmp_path / "CH{:02d}.dat"), [1, 5], jobs=jobs)
+    assert paths == [ str(tmp_path / "CH02.dat"), str(tmp_path / "CH06.dat") ]
+    for ch, fn in zip((1, 5), paths):
+        assert np.array_equal(np.fromfile(fn, np.int16), dmx.data[:, ch])
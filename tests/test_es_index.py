@@ -0,0 +1,55 @@
+import numpy as np
+
+from acq400_hapi import es_index
+
+NWORDS = 16
+SSB = NWORDS * 4
+ES_AT = (0, 37, 100, 163)
+
+
+def es_data(nsam=200):
+    """ramp data with an ES at ES_AT, counts are 1000+ix and 5000+2*ix"""
+    data = np.arange(nsam * NWORDS, dtype=np.uint32).reshape(nsam, NWORDS) & 0xffff
+    for ix in ES_AT:
+        data[ix, 0:4] = (0xaa55f154, 0xaa55f151, 0xaa55f152, 0xaa55f153)
+        data[ix, 4:8] = (1000 + ix, 5000 + 2*ix, 1000 + ix, 5000 + 2*ix)
+        data[ix, 8:] = 0xaa55f15f
+    return data
+
+
+def check(esi):
+    assert list(esi['index']) == list(ES_AT)
+    assert list(esi['sample_count']) == [ 1000 + ix for ix in ES_AT ]
+    assert list(esi['clock_count']) == [ 5000 + 2*ix for ix in ES_AT ]
+    assert np.all(esi['es'][:, 0] == es_index.ES_MAGIC)
+
+
+def test_records_counts():
+    data = es_data()
+    check(es_index.records(data, es_index.match(data), 0))
+
+
+def test_scan_files_across_chunks_and_files(tmp_path):
+    data = es_data()
+    files = []
+    for ii, (i0, i1) in enumerate(((0, 50), (50, 101), (101, 200))):
+        fn = tmp_path / "{:04d}".format(ii)
+        data[i0:i1].tofile(fn)
+        files.append(str(fn))
+    # chunk not a whole number of samples, so chunks and files both split samples
+    check(es_index.scan_files(files, SSB, chunk_bytes=SSB * 7 + 12))
+
+
+def test_feed_any_length():
+    raw = es_data().tobytes()
+    scanner = es_index.EsScanner(SSB)
+    for i0 in range(0, len(raw), 1000):
+        scanner.feed(raw[i0:i0 + 1000])
+    check(scanner.result())
+
+
+def test_any_mask():
+    data = es_data()
+    data[ES_AT[1], 0] = 0xaa55f158
+    esi = es_index.scan_stream([ data.tobytes() ], SSB, magic=0xaa55f150, mask=es_index.ES_ANY_MASK)
+    assert list(esi['index']) == list(ES_AT)
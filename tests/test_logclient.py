@@ -0,0 +1,29 @@
+import re
+
+from acq400_hapi.netclient import Logclient
+
+from fake_uut import serve_once
+
+
+def test_poll_bytes_split_lines():
+    lines = [ "{} 0 0 0 0".format(ii).encode() for ii in range(200) ]
+    lc = Logclient("127.0.0.1", serve_once(b"\r\n".join(lines) + b"\r\n"))
+    assert [ bytes(lc.poll_bytes(maxlen=7)) for _ in lines ] == lines
+    lc.close()
+
+
+def test_mixed_reads_keep_order():
+    payload = b"1 0 0 0 0\r\n2 0 0 0 0\r\nSHOT=1,0,0,0;3 0 0 0 0\r\n4 0 0 0 0\r\n"
+    lc = Logclient("127.0.0.1", serve_once(payload))
+    assert lc.poll_bytes() == b"1 0 0 0 0"
+    assert lc.receive_message(re.compile("(;)")) == "2 0 0 0 0\r\nSHOT=1,0,0,0"
+    assert lc.poll() == "3 0 0 0 0"
+    lc.termex = re.compile("(\n)")
+    assert lc.poll() == "4 0 0 0 0\r"
+    lc.close()
+
+
+def test_eol_lf():
+    lc = Logclient("127.0.0.1", serve_once(b"a\nbb\n\nccc\n"), eol=b"\n")
+    assert [ bytes(lc.poll_bytes()) for _ in range(4) ] == [ b"a", b"bb", b"", b"ccc" ]
+    lc.close()
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from acq400_hapi import pyramid
+
+BIN0 = 4
+FACTOR = 4
+LEVELS = 3
+
+
+def expected(y, nbin, has_full):
+    n = len(y) // nbin
+    rec = pyramid.reduce_raw(y, nbin)
+    rest = y[n*nbin:]
+    if len(rest) and has_full:
+        rec = np.append(rec, np.array([(rest.min(), rest.max(), rest.mean())], rec.dtype))
+    return rec
+
+
+def check_levels(path, y, bins):
+    for k, nbin in enumerate(bins):
+        fn = path + pyramid.SUFFIX.format(nbin)
+        rec = np.fromfile(fn, pyramid.rec_dtype(y.dtype))
+        exp = expected(y, nbin, k == 0 or len(y) >= nbin)
+        assert np.array_equal(rec['min'], exp['min'])
+        assert np.array_equal(rec['max'], exp['max'])
+        assert np.allclose(rec['mean'], exp['mean'], rtol=1e-5)
+
+
+@pytest.mark.parametrize("nsam", [ 4 * 4 * 4 * 3, 4 * 4 * 4 * 3 + 7, 50 ])
+def test_writer_levels(tmp_path, nsam):
+    y = np.random.default_rng(nsam).integers(-30000, 30000, nsam).astype(np.int16)
+    path = str(tmp_path / "CH01")
+    with pyramid.PyramidWriter(path, np.int16, bin0=BIN0, factor=FACTOR, levels=LEVELS) as pw:
+        for i0 in range(0, nsam, 13):               # chunks that split bins
+            pw.append(y[i0:i0+13])
+    bins = [ BIN0 * FACTOR**k for k in range(LEVELS) ]
+    check_levels(path, y, [ nbin for nbin in bins if nbin <= nsam or nbin == BIN0 ])
+    for nbin in bins:
+        if nbin > nsam and nbin != BIN0:
+            assert not (tmp_path / "CH01.mm{}".format(nbin)).exists()
+
+
+def test_stage_and_reader(tmp_path):
+    nsam, nchan = 70000, 3
+    yy = np.random.default_rng(1).integers(-1000, 1000, (nsam, nchan)).astype(np.int16)
+    yy[12345, 2] = 32000                            # one sample glitch
+    path = str(tmp_path / "stream")
+    stage = pyramid.PyramidStage(path, nchan, np.int16, channels=[0, 2])
+    raw = yy.tobytes()
+    for i0 in range(0, len(raw), 9998):             # blocks that split samples
+        stage(SimpleNamespace(data=raw[i0:i0+9998]))
+    stage.close()
+
+    check_levels(path + "_CH01", yy[:, 0], [ pyramid.BIN0 * pyramid.FACTOR**k for k in range(2) ])
+    assert not pyramid.Pyramid.exists(path + "_CH02")
+
+    pyr = pyramid.Pyramid(path + "_CH03", np.int16)
+    assert [ nbin for nbin, _ in pyr.levels ] == [ 256, 4096, 65536 ]
+    x, mn, mx, nbin = pyr.minmax(0, None, 16)
+    assert nbin == 4096 and len(x) == len(mn) == 18
+    assert mx.max() == 32000 and mx[12345 // 4096] == 32000
+    assert mn.min() == yy[:, 2].min()
+    with pytest.raises(ValueError):
+        pyr.minmax(0, 1000, 1000)
+    x, mn, mx, nbin = pyr.minmax(12000, 13000, 1000, raw=yy[:, 2])
+    assert nbin == 1 and np.array_equal(mx, yy[12000:13000, 2])
+
+
+def test_minmax_tail():
+    y = np.arange(1003)
+    x, mn, mx, nbin = pyramid.minmax(y, 10)
+    assert nbin == 101 and len(x) == 10
+    assert mn[-1] == 909 and mx[-1] == 1002
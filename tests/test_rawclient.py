@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from acq400_hapi.acq400 import Acq400, RawClient
+
+from fake_uut import serve_once
+
+
+def test_read_into_out():
+    payload = np.arange(1000, dtype=np.int16)
+    out = np.full((2, 1000), -1, np.int16)
+    rc = RawClient("127.0.0.1", serve_once(payload.tobytes()))
+    data = rc.read(1000, out=out[1])
+    rc.close()
+    assert np.shares_memory(data, out)
+    assert np.array_equal(out[1], payload)
+    assert np.all(out[0] == -1)
+
+
+def test_read_bytes():
+    payload = bytes(range(256)) * 3
+    rc = RawClient("127.0.0.1", serve_once(payload))
+    data = rc.read(len(payload), data_size=1)
+    rc.close()
+    assert data.dtype == np.uint8
+    assert data.tobytes() == payload
+
+
+def test_read_short():
+    payload = np.arange(300, dtype=np.int32)
+    rc = RawClient("127.0.0.1", serve_once(payload.tobytes()))
+    data = rc.read(1000, data_size=4)
+    rc.close()
+    assert np.array_equal(data, payload)
+
+
+def test_read_rejects_bad_out():
+    rc = RawClient("127.0.0.1", serve_once(b""))
+    with pytest.raises(ValueError):
+        rc.read(100, out=np.zeros((100, 2), np.int16)[:, 0])
+    with pytest.raises(ValueError):
+        rc.read(100, out=np.zeros(99, np.int16))
+    rc.close()
+
+
+def test_upload_channels_muxed():
+    nsam, channels = 1000, [1, 2, 3, 4, 5]
+    chans = { ch: np.arange(nsam, dtype=np.int16) * 10 + ch for ch in channels }
+
+    def read_chan(ch, nsam, data_size, out=None):
+        out[:] = chans[ch]
+        return out
+
+    uut = Acq400.__new__(Acq400)
+    uut.uut = "fake"
+    uut.trace = 0
+    uut.read_chan = read_chan
+    muxed = np.zeros((nsam, len(channels)), np.int16)
+    uut.upload_channels(channels, nsam, 2, muxed, max_connections=2, muxed=True)
+    assert np.array_equal(muxed, np.stack([ chans[ch] for ch in channels ], axis=1))
+
+    demuxed = np.zeros((len(channels), nsam), np.int16)
+    uut.upload_channels(channels, nsam, 2, demuxed, max_connections=2)
+    assert np.array_equal(demuxed, muxed.T)
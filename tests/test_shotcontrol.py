@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from acq400_hapi import shotcontrol
+from acq400_hapi.acq400 import Acq400, StatusMonitorStopped
+
+
+class FakeStatmon:
+    def __init__(self):
+        self.subscribers = []
+        self.armed = threading.Event()
+        self.stopped = threading.Event()
+        self.break_requested = False
+        self.quit_requested = False
+
+    def subscribe(self, callback, events):
+        handle = (callback, frozenset(events))
+        self.subscribers.append(handle)
+        return handle
+
+    def unsubscribe(self, handle):
+        self.subscribers.remove(handle)
+
+    def state(self, state0, state1):
+        for callback, _ in self.subscribers:
+            callback("state", (state0, state1))
+
+
+class FakeUut:
+    check_statmon = Acq400.check_statmon
+
+    def __init__(self, name):
+        self.uut = name
+        self.statmon = FakeStatmon()
+
+
+def later(dt, fn, *args):
+    threading.Timer(dt, fn, args).start()
+
+
+def test_wait_complete_releases():
+    uuts = [ FakeUut("uut1"), FakeUut("uut2") ]
+    sc = shotcontrol.ShotController(uuts)
+    for shot in range(3):
+        sc.prep_shot()
+        assert all(len(u.statmon.subscribers) == 1 for u in uuts)
+        for u in uuts:
+            later(0.05, u.statmon.state, 2, 0)
+        sc.wait_complete()
+        assert sc.zombies == []
+        assert all(u.statmon.subscribers == [] for u in uuts)
+
+
+def test_context_manager_releases():
+    uut = FakeUut("uut1")
+    with shotcontrol.ShotController([uut]) as sc:
+        sc.prep_shot()
+        assert len(uut.statmon.subscribers) == 1
+    assert uut.statmon.subscribers == []
+
+
+def test_zombies():
+    uuts = [ FakeUut("uut1"), FakeUut("uut2") ]
+    sc = shotcontrol.ShotController(uuts, zombie_timeout=0.2)
+    sc.prep_shot()
+    later(0.05, uuts[0].statmon.state, 0, 1)
+    sc.wait_armed()
+    assert sc.zombies == [ uuts[1] ]
+
+
+@pytest.mark.parametrize("stop", [ "break_requested", "quit_requested" ])
+def test_statmon_stopped(monkeypatch, stop):
+    monkeypatch.setattr(shotcontrol, "STATMON_CHECK", 0.05)
+    uuts = [ FakeUut("uut1"), FakeUut("uut2") ]
+    sc = shotcontrol.ShotController(uuts, zombie_timeout=0)
+    sc.prep_shot()
+    later(0.05, uuts[0].statmon.state, 0, 1)
+    later(0.1, setattr, uuts[1].statmon, stop, True)
+    t0 = time.time()
+    with pytest.raises(StatusMonitorStopped):
+        sc.wait_armed()
+    assert time.time() - t0 < 2
@@ -0,0 +1,55 @@
+import threading
+
+from acq400_hapi.netclient import Siteclient
+
+from fake_uut import SiteServer
+
+
+def clients(log, *sites):
+    servers = [ SiteServer(site, { "TRG": "0", "EVENT0": "0", "transient": "" }, log) for site in sites ]
+    return servers, [ Siteclient("127.0.0.1", srv.port) for srv in servers ]
+
+
+def test_batch_replies():
+    servers, (s1,) = clients([], 1)
+    with s1.batch() as replies:
+        s1.TRG = "1,0,1"
+        s1.EVENT0 = "1,1,1"
+        assert replies == []
+        assert s1.TRG == "1,0,1"        # query flushes the queued sets
+        s1.EVENT0 = "0,0,0"
+    assert replies == [ "ack", "ack", "ack" ]
+    assert s1.sr_many([ "TRG", "EVENT0" ]) == [ "1,0,1", "0,0,0" ]
+
+
+def test_batch_is_per_thread():
+    servers, (s1,) = clients([], 1)
+    inside, done = threading.Event(), threading.Event()
+    other = []
+
+    def batcher():
+        with s1.batch():
+            s1.TRG = "1,0,1"
+            inside.set()
+            done.wait(5)
+
+    th = threading.Thread(target=batcher)
+    th.start()
+    inside.wait(5)
+    other.append(s1.sr("EVENT0=1,1,1"))     # not queued on the other thread's batch
+    other.append(s1.EVENT0)
+    done.set()
+    th.join()
+    assert other == [ "ack", "1,1,1" ]
+    assert s1.TRG == "1,0,1"
+
+
+def test_nested_batch_keeps_program_order():
+    log = []
+    servers, (s0, s1) = clients(log, 0, 1)
+    with s0.batch(), s1.batch():
+        s0.transient = "PRE=0 POST=1000"
+        s1.TRG = "1,0,1"
+        s1.EVENT0 = "1,1,1"
+        s0.TRG = "1"
+    assert log == [ (0, "transient=PRE=0 POST=1000"), (1, "TRG=1,0,1"), (1, "EVENT0=1,1,1"), (0, "TRG=1") ]
@@ -0,0 +1,57 @@
+import socket
+
+import numpy as np
+
+from acq400_hapi import slowmon
+
+NCHAN = 3
+
+
+def rows(r0, n, data_size=2):
+    rr = np.zeros(n, slowmon.row_dtype(NCHAN, data_size))
+    rr['ch'] = np.arange(r0 * NCHAN, (r0 + n) * NCHAN).reshape(n, NCHAN) - 5
+    rr['sp'][:, 0] = np.arange(r0, r0 + n)
+    return rr
+
+
+def reader(data_size=2, maxrows=1024):
+    rdr = slowmon.SlowmonReader("local", NCHAN, data_size, maxrows=maxrows)
+    rdr.sock, peer = socket.socketpair()
+    return rdr, peer
+
+
+def test_partial_row_carry():
+    rdr, peer = reader()
+    raw = rows(0, 6).tobytes()
+    half = rdr.ssb // 2
+    peer.sendall(raw[:rdr.ssb + half])              # 1.5 rows
+    chx, spx = rdr.read()
+    assert np.array_equal(spx[:, 0], [ 0 ])
+    assert bytes(rdr.raw()) == raw[:rdr.ssb]
+    peer.sendall(raw[rdr.ssb + half:4 * rdr.ssb])   # rest of row 1, rows 2, 3
+    chx, spx = rdr.read()
+    assert np.array_equal(chx, rows(1, 3)['ch'])
+    assert np.array_equal(spx[:, 0], [ 1, 2, 3 ])
+    peer.sendall(raw[4 * rdr.ssb:-1])               # row 5 is one byte short
+    peer.close()
+    chx, spx = rdr.read()
+    assert np.array_equal(spx[:, 0], [ 4 ])
+    assert rdr.read() is None
+    assert rdr.stats() == { "rows": 5, "blocks": 3 }
+    rdr.close()
+
+
+def test_block_limited_by_maxrows():
+    rdr, peer = reader(data_size=4, maxrows=4)
+    peer.sendall(rows(0, 10, 4).tobytes())
+    peer.close()
+    got = [ spx[:, 0].copy() for chx, spx in rdr ]
+    assert np.array_equal(np.concatenate(got), np.arange(10))
+    assert all(len(g) <= 4 for g in got)
+
+
+def test_row_text():
+    xx = np.array([[ 0x52, -19 ], [ 1, 2 ]], np.int16)
+    assert list(slowmon.hex_rows(xx)) == [ "[ 0052, ffed ]", "[ 0001, 0002 ]" ]
+    assert list(slowmon.dec_rows(xx)) == [ "[ 000082, -00019 ]", "[ 000001, 000002 ]" ]
+    assert list(slowmon.egu_rows(np.array([[ 1.5, -0.25 ]]))) == [ "1.50000e+00,-2.50000e-01" ]
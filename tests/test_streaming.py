@@ -0,0 +1,26 @@
+import os
+
+import numpy as np
+
+from acq400_hapi.broker import StreamBroker, BrokerReader
+from acq400_hapi.streaming import StreamWriter
+
+from fake_uut import serve_once
+
+
+def test_stream_writer_on_broker_reader(tmp_path):
+    payload = np.arange(0x20000, dtype=np.int16).tobytes()
+    port = serve_once(payload)
+    name = "acq400_test_{}".format(os.getpid())
+    with StreamBroker("127.0.0.1", port, size=0x100000, blocklen=0x10000, ssb=4, name=name) as broker:
+        rdr = BrokerReader("127.0.0.1", port, latest=False, name=name).start()
+        out = tmp_path / "stream.dat"
+        writer = StreamWriter(rdr, str(out)).start()
+        writer.join(10)
+        assert not writer.is_alive()
+        assert writer.error is None
+        stats = writer.stats()
+        assert stats["rx_stall"] == 0.0
+        assert stats["bytes"] == len(payload)
+        assert "StreamWriter" in repr(writer)
+    assert out.read_bytes() == payload
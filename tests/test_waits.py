@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from acq400_hapi.acq400 import Acq400, StatusMonitorStopped
+
+
+class FakeStatmon:
+    """no transitions, wait_for() always times out"""
+    state_count = 0
+    break_requested = False
+    quit_requested = False
+
+    def wait_for(self, predicate, timeout=None):
+        time.sleep(timeout)
+        return False
+
+
+class FakeSite:
+    """CONTINUOUS_STATE goes to RUN at t_run, counts reads"""
+    def __init__(self, t_run):
+        self.t_run = time.time() + t_run
+        self.reads = 0
+
+    @property
+    def CONTINUOUS_STATE(self):
+        self.reads += 1
+        return "CONTINUOUS:STATE {}".format("RUN" if time.time() >= self.t_run else "ARM")
+
+
+def fake_uut(t_run):
+    uut = Acq400.__new__(Acq400)
+    uut.uut = "fake"
+    uut.statmon = FakeStatmon()
+    uut.s0 = FakeSite(t_run)
+    return uut
+
+
+def test_continuous_state_backs_off():
+    uut = fake_uut(1.0)
+    t0 = time.time()
+    uut.wait_for_continuous_state("RUN", timeout=0)
+    assert time.time() - t0 < 2.5
+    assert uut.s0.reads <= 8           # 50ms poll would be 20+
+
+
+def test_continuous_state_timeout():
+    uut = fake_uut(10)
+    with pytest.raises(TimeoutError):
+        uut.wait_for_continuous_state("RUN", timeout=0.2)
+
+
+def test_knob_statmon_stopped():
+    uut = fake_uut(10)
+    uut.statmon.break_requested = True
+    with pytest.raises(StatusMonitorStopped):
+        uut.wait_for_knob(lambda: False, timeout=0)
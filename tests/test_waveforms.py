@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from acq400_hapi import waveforms
+
+
+def test_to_int_chunks(monkeypatch):
+    monkeypatch.setattr(waveforms, "CHUNK", 7)
+    waves = np.linspace(-1.2, 1.2, 3 * 50).reshape(3, 50)
+    gain = np.array([ 32767, 1000, 40000 ])
+    offset = np.array([ 0, -0.5, 100 ])
+    ref = np.clip(waves.T * gain + offset, -32768, 32767).astype(np.int16)
+    assert np.array_equal(waveforms.to_int(waves, np.int16, gain, offset), ref)
+    out = np.zeros((50, 5), np.int32)
+    waveforms.to_int(waves[1], np.int32, 1000, out=out[:, 2:3])
+    assert np.array_equal(out[:, 2], (waves[1] * 1000).astype(np.int32))
+    assert not out[:, [0, 1, 3, 4]].any()
+
+
+def test_unit_waves():
+    assert waveforms.sinc(1000, xoff=0)[500] == 1
+    assert np.argmax(waveforms.sinc(1000, xoff=100)) == 600
+    assert np.allclose(waveforms.sin(400, 1)[[0, 100, 300]], [ 0, 1, -1 ])
+    assert set(np.unique(waveforms.square(100))) <= { -1.0, 0.0, 1.0 }
+    assert waveforms.ramp(101).max() < 1
+
+
+def test_cache(monkeypatch):
+    monkeypatch.setattr(waveforms, "CACHE", waveforms.LruCache(3 * 800))
+    a = waveforms.sin(100)
+    assert waveforms.sin(100) is a
+    assert waveforms.CACHE.stats()["hits"] == 1
+    with pytest.raises(ValueError):
+        a[0] = 1
+    waveforms.sin(100, 1)
+    waveforms.sin(100, 2)
+    waveforms.sin(100)                          # most recent again
+    waveforms.sin(100, 3)                       # drops sin(100, 1)
+    assert waveforms.CACHE.stats()["entries"] == 3
+    assert waveforms.sin(100) is a
+    misses = waveforms.CACHE.misses
+    waveforms.sin(100, 1)
+    assert waveforms.CACHE.misses == misses + 1
+
+
+def test_rainbow():
+    aw = waveforms.rainbow(4, 1000, ch=1)
+    assert aw.shape == (1000, 4) and aw.dtype == np.int16
+    assert waveforms.rainbow(4, 1000, ch=1) is aw
+    vgain = 32767 / 10
+    assert np.array_equal(aw[:, 0], waveforms.to_int(waveforms.sin(1000) * vgain + -9.0 * vgain)[:, 0])
@@ -252,8 +252,7 @@ def run_shot(uut, args):
 
 def trigger_on_arm(uut, siggen):
     """trigger siggen when uut reaches arm"""
-    while acq400_hapi.pv(uut.s0.CONTINUOUS_STATE) != 'ARM':
-        time.sleep(1)
+    uut.wait_for_continuous_state('ARM', timeout=0)
     acq400_hapi.Agilent33210A(siggen).trigger()
 
 def wait_shot(uut, args):  
@@ -65,29 +65,13 @@ def wait_for_state(args, state, timeout=0):
     if time0 == 0:
         time0 = time.time()
     for uut in UUTS:
-        olds = ""
-        finished = False
-        dots = 0
-        pollcat = 0
-
-        while not finished:
-            st = uut.s0.CONTINUOUS_STATE.split(' ')[1]
-            finished = st == state
-            news = "polling {}:{} {} waiting for {}".format(uut.uut, st, 'DONE' if finished else '', state)
-            if news != olds:
-                sys.stdout.write("\n{:06.2f}: {}".format(time.time() - time0, news))
-                olds = news
-            else:
-                sys.stdout.write('.')
-                dots += 1
-                if dots >= 20:
-                    dots = 0
-                    olds = ""
-            if not finished:
-                if timeout and (time.time() - time0) > timeout:
-                    sys.exit("\ntimeout waiting for {}".format(news))
-                time.sleep(1)
-            pollcat += 1
+        sys.stdout.write("\n{:06.2f}: {} waiting for {}".format(time.time() - time0, uut.uut, state))
+        try:
+            remaining = timeout - (time.time() - time0) if timeout else 0
+            uut.wait_for_continuous_state(state, timeout=max(remaining, 0.001) if timeout else 0)
+        except TimeoutError:
+            sys.exit("\ntimeout waiting for {}:{}".format(uut.uut, state))
+        sys.stdout.write("\n{:06.2f}: {}:{} DONE".format(time.time() - time0, uut.uut, state))
     print("")
 
 def release_the_trigger(args):
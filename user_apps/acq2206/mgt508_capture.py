@@ -16,7 +16,6 @@ control continuous capture, default is to toggle
 
 import acq400_hapi
 import argparse
-import time
 import subprocess
 import threading
 from acq400_hapi import timing as timing
@@ -29,10 +28,10 @@ GB1 = 0x40000000
 PULL_BUFFERS_PER_GB = 0x400
 
 def configure_acq(args, acq):
-    while acq400_hapi.pv(acq.s0.CONTINUOUS_STATE) != 'IDLE':
-            acq.s0.CONTINUOUS = 0
-            print(f'WARNING: requesting {acq.uut} to stop')
-            time.sleep(1)
+    if acq400_hapi.pv(acq.s0.CONTINUOUS_STATE) != 'IDLE':
+        acq.s0.CONTINUOUS = 0
+        print(f'WARNING: requesting {acq.uut} to stop')
+        acq.wait_for_continuous_state('IDLE', timeout=0)
 
     acq.s1.simulate = args.simulate
 
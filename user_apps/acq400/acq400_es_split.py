@@ -1,21 +1,35 @@
 #!/usr/bin/env python
 
+"""
+acq400_es_split.py split a raw data file into bursts on event signatures
+
+- the file is memory mapped and scanned in chunks, acq400_hapi.es_index
+- each burst is written with one write straight from the map, no per sample reads
+- out_dir/index lists burst, offset, nbytes, sample_count for every burst,
+  --index_only=1 writes only the index, use it as byte-range views of the source
+
+ - eg::
+
+       ./user_apps/acq400/acq400_es_split.py --file=./0000 --out_dir=./split_files acq2106_123
+       ./user_apps/acq400/acq400_es_split.py --file=./0000 --ssb=128 --index_only=1 acq2106_123
+"""
+
 import acq400_hapi
+from acq400_hapi import es_index
 import numpy as np
+import mmap
 import os
 import argparse
 
+ES_MATCH = 0xaa55f150
+ES_WORDS = 4
 
-def check_if_es(data):
-    es_match = np.uint32(0xaa55f150)
-    np_data = np.frombuffer(data, dtype=np.uint32)
-    for es in np_data[0:4]:
-        if es_match == np.bitwise_and(es, es_match):
 
-            continue
-        else:
-            return False
-    return True
+def find_es(file, ssb):
+    """ES records for every sample of file that starts with ES_WORDS ES words"""
+    esi = es_index.scan_files(file, ssb, magic=ES_MATCH, mask=ES_MATCH)
+    words = esi['es'][:, 0:ES_WORDS]
+    return esi[np.all(np.bitwise_and(words, np.uint32(ES_MATCH)) == ES_MATCH, axis=1)]
 
 
 def get_parser():
@@ -26,6 +40,8 @@ def get_parser():
                         help='Sample size bytes. Default=-1 (autodetect). Any other number is override.')
     parser.add_argument('--out_dir', default="./split_files", type=str,
                         help='Directory where split files will be written. Default: ./split_files')
+    parser.add_argument('--index_only', default=0, type=int,
+                        help='Write the burst index only, no split files. Default: 0')
     parser.add_argument('uuts', nargs='+', help="uut[s]")
     return parser
 
@@ -39,32 +55,50 @@ def make_data_dir(directory, verbose):
         pass
 
 
-def split_on_es(file, ssb, out_dir):
-    data = [0]
-    new_file_flag = True
-    data_file = None
-    file_num = 0
-    make_data_dir(out_dir, 0)
-    loop = 0
+def get_bursts(file, ssb):
+    """burst edges in bytes. A new burst starts at each ES, the first at 0
+
+    Returns:
+        (offsets, nbytes, esi): burst start, burst length, ES record per burst or None
+    """
+    fsize = os.path.getsize(file)
+    if fsize == 0:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), []
+    esi = find_es(file, ssb)
+    offsets = esi['index'] * ssb
+    if len(offsets) == 0 or offsets[0] != 0:
+        offsets = np.insert(offsets, 0, 0)
+        records = [ None ] + list(esi)
+    else:
+        records = list(esi)
+    nbytes = np.diff(np.append(offsets, fsize))
+    return offsets, nbytes, records
 
-    with open(file, 'rb') as fp:
-        while len(data) != 0:
-            data = fp.read(ssb)
-            if len(data) == 0:
-                continue
-            new_file_flag = check_if_es(data)
 
-            if new_file_flag and loop != 0:
-                file_num += 1
-                data_file.close()
-                data_file = None
-                new_file_flag = False
+def write_index(out_dir, offsets, nbytes, records):
+    with open("{}/index".format(out_dir), "w") as fp:
+        fp.write("burst,offset,nbytes,sample_count\n")
+        for burst, (off, nb, rec) in enumerate(zip(offsets, nbytes, records)):
+            fp.write("{:04d},{},{},{}\n".format(burst, off, nb, rec['sample_count'] if rec is not None else ""))
 
-            if data_file == None:
-                data_file = open("{}/{:04d}".format(out_dir, file_num), "wb")
 
-            data_file.write(data)
-            loop += 1
+def split_on_es(file, ssb, out_dir, index_only=False):
+    make_data_dir(out_dir, 0)
+    offsets, nbytes, records = get_bursts(file, ssb)
+    write_index(out_dir, offsets, nbytes, records)
+    if index_only or len(offsets) == 0:
+        return len(offsets)
+
+    with open(file, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for file_num, (off, nb) in enumerate(zip(offsets, nbytes)):
+                    with open("{}/{:04d}".format(out_dir, file_num), "wb") as data_file:
+                        data_file.write(view[off:off+nb])
+            finally:
+                view.release()
+    return len(offsets)
 
 
 def get_ssb(uut, ssb):
@@ -76,7 +110,8 @@ def get_ssb(uut, ssb):
 
 def main(args):
     ssb = get_ssb(args.uuts[0], args.ssb)
-    split_on_es(args.file, ssb, args.out_dir)
+    nbursts = split_on_es(args.file, ssb, args.out_dir, args.index_only)
+    print("{} bursts, index {}/index".format(nbursts, args.out_dir))
     return None
 
 
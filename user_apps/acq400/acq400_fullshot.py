@@ -200,8 +200,7 @@ def upload(args, shots, doClose=False):
     for u in uuts:
         u.s0.TRANSIENT_SET_ABORT = '1'
     for u in uuts:
-        while u.s0.TRANS_ACT_STATE.split(' ')[1] != 'IDLE':
-            time.sleep(0.1)
+        u.wait_for_idle(timeout=0)
           
     shot_controller = TimedShotController(uuts, args)
 
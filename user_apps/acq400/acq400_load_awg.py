@@ -48,6 +48,7 @@ import socket
 
 import acq400_hapi
 from acq400_hapi import awg_data
+from acq400_hapi import awg_upload
 from acq400_hapi import netclient as netclient
 import argparse
 import glob
@@ -68,17 +69,6 @@ def timing(f):
     return wrap
 
 
-def file_extender(fd, ext_count):
-    buf = fd.read()
-    buf0 = buf
-
-    while ext_count > 1:
-        buf += buf0
-        ext_count -= 1
-        
-    return buf
-        
-
 @timing
 def load_awg(args, uut, file):
     acq400_hapi.Acq400UI.exec_args(uut, args)
@@ -88,8 +78,9 @@ def load_awg(args, uut, file):
     while loaded != 1:
         try:
             with open(file, "rb") as fd:
-                uut.load_awg(file_extender(fd, args.awg_extend), autorearm=args.mode==2, port=args.port)
+                stats = uut.load_awg(fd, autorearm=args.mode==2, port=args.port, repeats=args.awg_extend)
                 loaded = 1
+            print("load_awg {}".format(awg_upload.rate_str(stats)))
         except Exception as e:
             if loaded == 0:
                 print("First time: caught {}, abort and retry".format(e))
@@ -67,6 +67,7 @@ examples
 '''
 
 import acq400_hapi
+from acq400_hapi import slowmon
 import numpy as np
 import os
 import time
@@ -75,32 +76,22 @@ import sys
 import shutil
 
 
-def str_hex(xarr):
-    uview = xarr.view(dtype=(np.uint16 if xarr.dtype == np.int16 else np.uint32))
-    dfmt = ("{:04x}"  if xarr.dtype == np.int16 else "{:08x}")
-    dfmte = dfmt + " ]"
-    dfmt = dfmt + ", "
-    #print("dtype: {} dfmt {}".format(xarr.dtype, dmft))
-    txt = "[ "
-    for xx in uview[:-1]:
-        txt += dfmt.format(xx)
-        
-    return txt + dfmte.format(uview[-1])
-
-def str_dec(xarr):    
-    dfmt = ("{:06d}"  if xarr.dtype == np.int16 else "{:10d}")
-    dfmte = dfmt + " ]"
-    dfmt = dfmt + ", "
-    #print("dtype: {} dfmt {}".format(xarr.dtype, dmft))
-    txt = "[ "
-    for xx in xarr[:-1]:
-        txt += dfmt.format(xx)
-    
-    return txt + dfmte.format(xarr[-1])
-
-def to_egu(uut, xarr):
-    egu = [ "{:.5e}".format(uut.chan2volts(ix+1, xx)) for ix, xx in enumerate(xarr)]
-    return ",".join(egu)
+def txt_rows(args, uut, row0, chx, spx, csv_file):
+    """text for a whole block of rows, or None"""
+    nrows = len(chx)
+    rows = slowmon.row_numbers(row0, nrows)
+    if args.egu == 1:
+        chx = chx[:, :args.pchan]
+        volts = uut.calibration().volts(chx, chans=np.arange(1, chx.shape[1]+1), axis=-1)
+        return np.char.add(np.char.add(rows, ", "), slowmon.egu_rows(volts))
+    elif args.show_raw or csv_file:
+        fmt = slowmon.dec_rows if args.show_raw == 'd' else slowmon.hex_rows
+        txt = np.char.add(np.char.add(rows, " "), fmt(chx[:, :args.pchan]))
+        return np.char.add(np.char.add(txt, " "), fmt(spx))
+    elif args.show >= 1:
+        return None
+    else:
+        return rows
 
 def run_stream(args, uut):
     if args.save_file:
@@ -111,6 +102,7 @@ def run_stream(args, uut):
         csv_file = 0
         
     t_run = 0
+    row = 0
     
     _nspad = 4 if uut.s0.slowmon_hw == '1' else None
         
@@ -119,37 +111,30 @@ def run_stream(args, uut):
             print("WARNING: slowmon with no hardware assist, slowmon_fs not the absolute rate and actual rate should be tested for each combination")           
         uut.s0.SLOWMON_FS = args.slowmon_fs
 
-    for row, (chx, spx) in enumerate(uut.stream_slowmon(nspad=_nspad)):
+    reader = uut.slowmon_reader(nspad=_nspad)
+    for chx, spx in reader:
         if row == 0:
             t0 = time.time()
         else:
             t_run = time.time() - t0
-        #print("{} len {},{} type {},{} shape {},{}\n{} {}".format(row, len(chx), len(spx), chx.dtype, spx.dtype, chx.shape, spx.shape, chx, spx))
-        if args.egu == 1:
-            txt_row = ("{}, {}".format(row, to_egu(uut, chx[:args.pchan])))
-        elif args.show_raw or csv_file:
-            if args.show_raw == 'd':
-                txt_row = ("{} {} {}".format(row, str_dec(chx[:args.pchan]), str_dec(spx)))
-            else:
-                txt_row = ("{} {} {}".format(row, str_hex(chx[:args.pchan]), str_hex(spx)))
-        else:
-            if args.show >= 1:
-                txt_row = "t_run {}/{}s sample: {}".format(int(t_run), args.runtime, row)
-            else:
-                txt_row = "{}".format(row)
-            
+        txt = txt_rows(args, uut, row, chx, spx, csv_file)
+        row += len(chx)
+
         if args.show >= 1:
-            print(txt_row)
+            if txt is None:
+                print("t_run {}/{}s sample: {}".format(int(t_run), args.runtime, row-1))
+            else:
+                print("\n".join(txt))
             
         if args.save_file:
             if csv_file:
-                data_file.write(txt_row+"\n")
+                data_file.write("\n".join(txt) + "\n")
             else:
-                chx.tofile(data_file)
-                spx.tofile(data_file)
+                reader.raw().tofile(data_file)
             
         if t_run >= args.runtime:
             print("Time up captured {} samples in {} seconds. Approx SLOWMON_FS {} Hz". format(row, args.runtime, row//args.runtime))
+            uut.slowmon_close()
             return
 
     
@@ -93,6 +93,7 @@ def make_data_dir(directory, verbose):
 
 def calc_file_size(args, uut):
     rxbuf_len = 4096
+    ssb = args.ssb
 
     if not args.ssb > 0:
         try:
@@ -115,6 +116,7 @@ def calc_file_size(args, uut):
     if filesize != args.filesize:
         print(f'fixing file size to be an integer # samples: {filesize} ({filesize/ssb:.1f})')
         args.filesize = filesize
+    args.ssb = ssb
     return rxbuf_len
 
 def run_stream(args):
@@ -143,6 +145,9 @@ def run_stream(args):
     data_file = None
     current_fname = None
     time_left0 = 0
+    checker = None
+    if args.check >= 0:
+        checker = acq400_hapi.ContinuityCheck(args.ssb, args.check, log=args.check_log)
 
     while time.time() < (start_time + args.runtime) and data_len_so_far < args.totaldata:
 
@@ -157,6 +162,8 @@ def run_stream(args):
 
         data_length += len(data)
         data_len_so_far += len(data)
+        if checker:
+            checker(data)
         if file_num >= args.files_per_cycle:
             file_num = 0
             cycle += 1
@@ -197,6 +204,10 @@ def run_stream(args):
                 total_gb = data_len_so_far/0x40000000
                 print(f'{current_fname} len {file_mb} MB total {total_gb:.1f} GB')
 
+    if checker:
+        checker.close()
+        print(f'check {checker.stats()}')
+
     if args.verbose:
         print()
 
@@ -217,6 +228,8 @@ def get_parser():
     parser.add_argument('--es_stream', default=0, type=int, help="Stream with ES. New file is used for each ES.")
     parser.add_argument('--port', default='STREAM', type=str, help="Which port to stream from. STREAM=4210, SPY=53667, other: use number provided.")
     parser.add_argument('--verbose', default=0, type=int, help='Prints status messages as the stream is running')
+    parser.add_argument('--check', default=-1, type=int, help="check sample counter at this 32 bit column")
+    parser.add_argument('--check_log', default=None, help="with --check, log gaps as JSON lines to this file")
     parser.add_argument('uuts', nargs='+', help="uuts")
     return parser
 
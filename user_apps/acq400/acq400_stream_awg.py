@@ -6,32 +6,41 @@
 import acq400_hapi
 from acq400_hapi import timing
 from acq400_hapi import awg_data
-from acq400_hapi import netclient as netclient
 import argparse
+import numpy as np
+
+def file_blocks(file, blocklen):
+    """file as a ring of memory mapped blocks, no copy"""
+    mm = np.memmap(file, np.uint8, 'r')
+    blocklen = blocklen or len(mm)
+    return [ mm[i0:i0+blocklen] for i0 in range(0, len(mm), blocklen) ]
 
 @timing
 def load_awg_top(args):
     uut = acq400_hapi.Acq400(args.uuts[0])
-    trigger = args.soft_trigger
-    
-    with open(args.file, "rb") as fd:
-        buf = fd.read()
-     
-    with netclient.Netclient(uut.uut, acq400_hapi.AcqPorts.AWG_STREAM) as nc:
-        while True:
-            nc.sock.send(buf)
-            if trigger:
-                uut.s0.soft_trigger = 1
-                trigger = 0
-            
-            
-            
-    print("Hello World")
+
+    awg = uut.stream_awg(file_blocks(args.file, args.blocklen), nbufs=args.nbufs)
+    awg.started.wait()
+    if args.soft_trigger:
+        uut.s0.soft_trigger = 1
+    try:
+        while awg.is_alive():
+            awg.join(1)
+            if args.verbose:
+                print(awg.stats())
+    finally:
+        awg.stop()
+        print(awg)
+    if awg.error:
+        raise awg.error
 
 def get_parser():
     parser = argparse.ArgumentParser(description='simple load awg')
     parser.add_argument('--file', default=None, help="file to load")
     parser.add_argument('--soft_trigger', default=0, type=int, help='Emit soft trigger')        
+    parser.add_argument('--blocklen', default=0x100000, type=int, help='bytes per block, 0: whole file')
+    parser.add_argument('--nbufs', default=2, type=int, help='blocks queued ahead of the sender')
+    parser.add_argument('--verbose', default=0, type=int, help='print stats every second')
     parser.add_argument('uuts', nargs=1, help="uut ")
     return parser
 
@@ -6,47 +6,46 @@
 import acq400_hapi
 from acq400_hapi import timing
 from acq400_hapi import awg_data
-from acq400_hapi import netclient as netclient
 import argparse
 import sys
 import threading
 import os
 import time
+import numpy as np
 
 
 
 def read(file):
-    with open(file, "rb") as fd:
-        return fd.read()
+    return np.memmap(file, np.uint8, 'r')
     
 NBUFS = 0
 IBUF = 0
-
-# monitor
-BCOUNT = 0
-BSIZE  = 0
+AWG = None
 
 
 @timing
 def load_awg_top(args):
-    global NBUFS, BCOUNT, BSIZE
+    global NBUFS, AWG
     uut = acq400_hapi.Acq400(args.uuts[0])
-    trigger = args.soft_trigger
 
-    
     bufs = [ read(f) for f in args.file.split(",") ] 
     NBUFS = len(bufs)
     
-    with netclient.Netclient(uut.uut, acq400_hapi.AcqPorts.AWG_STREAM) as nc:
-        while True:
-            nc.sock.send(bufs[IBUF])
-            if trigger:
-                uut.s0.soft_trigger = 1
-                trigger = 0
-            BCOUNT += 1
-            BSIZE = len(bufs[IBUF])
+    AWG = uut.stream_awg(bufs[IBUF])
+    threading.Thread(target=buffer_changer, args=(bufs,), daemon=True).start()
+    threading.Thread(target=monitor, daemon=True).start()
+    AWG.started.wait()
+    if args.soft_trigger:
+        uut.s0.soft_trigger = 1
+    try:
+        AWG.join()
+    finally:
+        AWG.stop()
+        print("\n{}".format(AWG))
+    if AWG.error:
+        raise AWG.error
     
-def buffer_changer():
+def buffer_changer(bufs):
     global IBUF
     while True:
         cc = sys.stdin.read(1)
@@ -54,15 +53,16 @@ def buffer_changer():
             ix = int(cc)            
             if ix >= 0 and ix < NBUFS:
                 IBUF = ix
+                AWG.swap(bufs[ix], flush=True)
                 
 def monitor():
-    global IBUF, NBUFS, BCOUNT, BSIZE
-    bc = BCOUNT
+    bc = 0
     
     while True:
         time.sleep(1)
-        print("\rix {} NBUFS {} rate: {} MB/s >".format(IBUF, NBUFS, (BCOUNT-bc)*BSIZE/0x100000), end="")
-        bc = BCOUNT
+        st = AWG.stats()
+        print("\rix {} NBUFS {} rate: {} MB/s underruns {} >".format(IBUF, NBUFS, (st["bytes"]-bc)/0x100000, st["underruns"]), end="")
+        bc = st["bytes"]
 
 def file_exists(arg):
     if not os.path.exists(arg): raise FileNotFoundError
@@ -77,8 +77,6 @@ def get_parser():
 
 
 def run_main(args):
-    threading.Thread(target=buffer_changer).start()
-    threading.Thread(target=monitor).start()
     load_awg_top(args)
 
 # execution starts here
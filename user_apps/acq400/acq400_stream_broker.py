@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+acq400_stream_broker.py share one uut stream between many local clients
+
+- run once per uut as the broker, it owns the uut STREAM port
+- run again with --attach to add a local client, any number of them,
+  they read from shared memory and cost no extra network bandwidth
+
+ - eg::
+
+       ./user_apps/acq400/acq400_stream_broker.py --size=1G acq2106_123 &
+       ./user_apps/acq400/acq400_stream_broker.py --attach=save --save=/data/acq2106_123.dat --rotate=1G acq2106_123 &
+       ./user_apps/acq400/acq400_stream_broker.py --attach=rate acq2106_123
+       ./user_apps/acq400/acq400_stream_broker.py --attach=check --check=32 --check_log=gaps.jsonl acq2106_123
+"""
+
+import acq400_hapi
+from acq400_hapi import broker
+import argparse
+import time
+
+
+def run_broker(args):
+    ssb = args.ssb if args.ssb > 0 else int(acq400_hapi.factory(args.uut[0]).s0.ssb)
+    with broker.StreamBroker(args.uut[0], args.port, size=args.size, blocklen=args.blocklen, ssb=ssb) as bkr:
+        print("broker {} ssb {} ring {} MB".format(bkr.name, ssb, bkr.size // 0x100000))
+        try:
+            while bkr.is_alive():
+                bkr.join(args.update)
+                st = bkr.stats()
+                print("broker {:.0f} MB {:.1f} MB/s".format(st['bytes'] / 0x100000, st['rate'] / 0x100000))
+        except KeyboardInterrupt:
+            pass
+        if bkr.error:
+            print("broker: {}".format(bkr.error))
+
+
+def run_save(args):
+    rdr = broker.BrokerReader(args.uut[0], args.port, latest=not args.oldest).start()
+    writer = acq400_hapi.StreamWriter(rdr, args.save, maxbytes=args.maxbytes, rotate=args.rotate).start()
+    try:
+        while writer.is_alive():
+            writer.join(args.update)
+            print("save {} {}".format(args.save, rdr.stats()))
+    except KeyboardInterrupt:
+        rdr.stop()
+
+
+def run_rate(args):
+    with broker.BrokerReader(args.uut[0], args.port, latest=not args.oldest) as rdr:
+        t0 = time.time()
+        b0 = 0
+        try:
+            for block in rdr:
+                if time.time() - t0 >= args.update:
+                    st = rdr.stats()
+                    print("rate {:.1f} MB/s {}".format((st['bytes'] - b0) / (time.time() - t0) / 0x100000, st))
+                    t0 = time.time()
+                    b0 = st['bytes']
+        except KeyboardInterrupt:
+            pass
+
+
+def run_check(args):
+    with broker.BrokerReader(args.uut[0], args.port, latest=not args.oldest) as rdr:
+        chk = acq400_hapi.ContinuityCheck(rdr.ssb, args.check, log=args.check_log)
+        t0 = time.time()
+        try:
+            for block in rdr:
+                chk(block)
+                if time.time() - t0 >= args.update:
+                    print("check {} {}".format(chk.stats(), rdr.stats()))
+                    t0 = time.time()
+        except KeyboardInterrupt:
+            pass
+        chk.close()
+
+
+ATTACH = { "save": run_save, "rate": run_rate, "check": run_check }
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='local stream broker, one uut stream many local clients')
+    parser.add_argument('--attach', default=None, choices=list(ATTACH), help="run a client, not the broker")
+    parser.add_argument('--port', default=acq400_hapi.AcqPorts.STREAM, type=int, help="uut port")
+    parser.add_argument('--size', default=0x10000000, action=acq400_hapi.intSIAction, decimal=False, help="shared ring size")
+    parser.add_argument('--blocklen', default=0x100000, action=acq400_hapi.intSIAction, decimal=False, help="largest receive")
+    parser.add_argument('--ssb', default=0, type=int, help="sample size bytes, default from uut")
+    parser.add_argument('--save', default=None, help="--attach=save output file")
+    parser.add_argument('--rotate', default=0, action=acq400_hapi.intSIAction, decimal=False, help="--attach=save new file every N bytes")
+    parser.add_argument('--maxbytes', default=0, action=acq400_hapi.intSIAction, decimal=False, help="--attach=save stop after N bytes")
+    parser.add_argument('--check', default=0, type=int, help="--attach=check sample counter 32 bit column")
+    parser.add_argument('--check_log', default=None, help="--attach=check log gaps as JSON lines to this file")
+    parser.add_argument('--oldest', default=0, type=int, help="client starts at the oldest data held, not the live edge")
+    parser.add_argument('--update', default=1.0, type=float, help="status update interval, s")
+    parser.add_argument('uut', nargs=1, help="uut")
+    return parser
+
+
+def run_main(args):
+    if args.attach:
+        ATTACH[args.attach](args)
+    else:
+        run_broker(args)
+
+
+if __name__ == '__main__':
+    run_main(get_parser().parse_args())
@@ -217,6 +217,11 @@ class StreamsOne:
         if self.args.burst_on_demand and self.args.verbose:
             print(f'burst_on_demand RTM_TRANSLEN={self.args.burst_on_demand} netssb={netssb} filesize={self.args.filesize} blen={blen}')
 
+        checker = None
+        if self.args.check >= 0:
+            log = os.path.join(self.args.root, f"{self.uut_name}_gaps.jsonl")
+            checker = acq400_hapi.ContinuityCheck(netssb, self.args.check, log=log, verbose=0)
+
         t_run = 0
         fn = "no-file"
         data_file = None
@@ -236,7 +241,12 @@ class StreamsOne:
             if len(buf) == 0:
                 print("Zero length buffer, quit")
                 return
-            
+
+            if checker:
+                checker(buf)
+                self.status.set('gaps', f"{checker.ngaps}")
+                self.status.set('missed', f"{checker.missed}")
+
             self.status.set('runtime', f"{t_run:.0f}s")
             self.status.set('total bytes', f"{data_bytes}")
             self.status.set('rate', f"{data_bytes / t_run / 0x100000  if t_run else 0:.2f}MB/s")
@@ -372,6 +382,7 @@ def get_parser(parser=None):
     parser.add_argument('--verbose', default=0, type=int, help='Prints status messages as the stream is running')
     parser.add_argument('--display', default=1, type=int, help='Render display')
     parser.add_argument('--combine', default=0, type=int, help='Combine all cycle files into one')
+    parser.add_argument('--check', default=-1, type=int, help='check sample counter at this 32 bit column, gaps logged to ROOT/UUT_gaps.jsonl')
     if is_client:
         parser.add_argument('uuts', nargs='+', help="uuts")
     return parser
@@ -54,24 +54,26 @@ def config_uuts(uuts, args):
             uut.s0.sync_role = cmd
             time.sleep(5)
 
-        if args.clk_route in routing:
-            print(f"CLK routing: {uutname} {args.clk_route}")
-            routing[args.clk_route]['clk_func'](uut)
-
-        if args.trg_route in routing:
-            print(f"TRG routing: {uutname} {args.trg_route}")
-            routing[args.trg_route]['trg_func'](uut)
-
-        if args.gpio_to_trg:
-            print(f"GPIO to TRG: {uutname} {args.gpio_to_trg}")
-            route_hdmi_to_d1(uut)
-
-        if args.rtm:
-            print(f"Enable RTM: {uutname} rtm_translen{args.rtm_translen}")
-            setup_rtm(uut, args)
-
-        if args.TRG_DX:
-            uut.s1.TRG_DX = args.TRG_DX
+        # pipeline the knob sets, one round trip per site
+        with uut.s0.batch(), uut.s1.batch():
+            if args.clk_route in routing:
+                print(f"CLK routing: {uutname} {args.clk_route}")
+                routing[args.clk_route]['clk_func'](uut)
+
+            if args.trg_route in routing:
+                print(f"TRG routing: {uutname} {args.trg_route}")
+                routing[args.trg_route]['trg_func'](uut)
+
+            if args.gpio_to_trg:
+                print(f"GPIO to TRG: {uutname} {args.gpio_to_trg}")
+                route_hdmi_to_d1(uut)
+
+            if args.rtm:
+                print(f"Enable RTM: {uutname} rtm_translen{args.rtm_translen}")
+                setup_rtm(uut, args)
+
+            if args.TRG_DX:
+                uut.s1.TRG_DX = args.TRG_DX
 
     threads = []
     for uut_item in uuts:
@@ -17,6 +17,8 @@ import matplotlib.pyplot as plt
 import argparse
 import os
 import re
+from acq400_hapi.shotdata import ShotData
+from acq400_hapi import pyramid as PYR
 
 has_pykst = False
 if os.name != "nt":
@@ -25,15 +27,6 @@ if os.name != "nt":
         has_pykst = True
     except ImportError:
         print("WARNING: failed to import pykst, no kst plots")
-def get_ch_files(dir):
-    ch_files = []
-    for root, dirs, files in os.walk(dir):
-        for file in files:
-            if '_CH' in file:
-                ch_files.append(file)
-
-    return ch_files
-
 def title(t1):
     return re.sub(r"_", r"\_", t1)
 
@@ -49,46 +42,37 @@ def list_decode(list_def):
             return eval('( {} , )'.format(list_def))
 
 
-def ch_selected(chfile, chd):
-    p = re.compile(r'.*_CH([0-9]{2})')
-    m = p.search(chfile)
-    if m == None:
-        return False
-    try:
-        sel = chd[int(m.group(1))]
-        return True
-    except KeyError:
-        return False
-
 def plot_kst(args, chx):         
     llen = len(chx[0])
     print("plotting {} {}M points".format(llen, llen/1e6))
     xsam = np.linspace(0, llen, num=llen)    
     client = pykst.Client(args.dirfile[0])
     XX = client.new_editable_vector(xsam, name="samples")
-    ix = 0
-    for f in get_ch_files(args.dirfile[0]):
-        if ch_selected(f, args.chd):
-            YY = client.new_editable_vector(chx[ix].astype(np.float64), name=title(f))
-            print("adding plot {}".format(f))
-            client.new_plot().add(client.new_curve(XX, YY))
-            ix = ix + 1 
+    for ix, f in enumerate(args.names):
+        YY = client.new_editable_vector(chx[ix].astype(np.float64), name=title(f))
+        print("adding plot {}".format(f))
+        client.new_plot().add(client.new_curve(XX, YY))
 
 def plot_matplot(args, chx):
     nch = len(chx)
-    f, plots = plt.subplots(nch, 1)
-    for num, sp in enumerate([f for f in get_ch_files(args.dirfile[0]) if ch_selected(f, args.chd) ]):
-        plots[num].plot(chx[num])
+    f, plots = plt.subplots(nch, 1, squeeze=False)
+    for num, sp in enumerate(args.names):
+        # min/max per pixel, from the pyramid files if present
+        ax = plots[num][0]
+        PYR.plot_minmax(ax, *args.ds.minmax(args.chans[num], width=PYR.ax_width(ax)))
     plt.show()
     
 
 def process_data(args):    
     args.chd = { k:1 for k in list_decode(args.ch) }
 #    print(args.chd)      
-#   print("ch_files: {}".format(get_ch_files(args.dirfile[0])))
-    
-    chx = [ np.fromfile("{}/{}".format(args.dirfile[0], f), dtype='int16') \
-            for f in get_ch_files(args.dirfile[0]) if ch_selected(f, args.chd) ]
+
+    # memory mapped, only the plotted channels are read
+    ds = ShotData(args.dirfile[0], dtype=np.int16)
+    args.ds = ds
+    args.chans = [ ch for ch in ds.channels if ch in args.chd ]
+    args.names = [ os.path.basename(ds.chfiles[ch][0]) for ch in args.chans ]
+    chx = [ ds[ch] for ch in args.chans ]
     
     if has_pykst == False or args.matplot == 1:
         plot_matplot(args, chx)
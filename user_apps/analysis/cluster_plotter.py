@@ -26,6 +26,8 @@ import threading
 import acq400_hapi
 from collections import namedtuple
 from acq400_hapi import PR, pprint
+from acq400_hapi.shotdata import ShotData
+from acq400_hapi import pyramid as PYR
 
 type_map = {
     32 : {
@@ -177,16 +179,13 @@ def demux(scaffold, chans, uuts, **kwargs):
     for uut in uuts:
         item = scaffold[uut]
         nchan = item['nchan']
-        data_type = item['data_type']
+        item['data'] = ShotData(item['dat_files'], nchan, item['data_type'])
 
-        for filepath in item['dat_files']:
-            item['data'] = np.append(item['data'], np.fromfile(filepath, dtype=data_type))
         for chan in chans:
             if chan > nchan:
                 continue
-            ichan = chan - 1
             item['num_chans'] += 1
-            item['channels'][chan] = item['data'][ichan::nchan]
+            item['channels'][chan] = item['data'][chan]
 
 def plot(scaffold, uuts, secs, egu, verbose, plots, **kwargs):
     print('plotting')
@@ -212,13 +211,14 @@ def plot(scaffold, uuts, secs, egu, verbose, plots, **kwargs):
                     data = data / 256
                 data = api.chan2volts(chan, data)
 
+            # min/max per pixel, every glitch shows
+            ix, mn, mx, nbin = PYR.minmax(data, PYR.ax_width(self.axes[self.idx]))
             if secs:
                 length = len(data)
                 if length not in self.x_arrs:
                     self.x_arrs[length] = self.build_x_array(length)
-                self.axes[self.idx].plot(self.x_arrs[length], data, label=label)
-            else:
-                self.axes[self.idx].plot(data, label=label)
+                ix = self.x_arrs[length][ix]
+            PYR.plot_minmax(self.axes[self.idx], ix, mn, mx, nbin, label=label)
 
             self.axes[self.idx].legend(loc='upper right')
             plt.gca().get_xaxis().get_major_formatter().set_useOffset(False)
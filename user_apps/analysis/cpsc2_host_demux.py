@@ -89,6 +89,7 @@ import re
 import argparse
 import subprocess
 import acq400_hapi
+from acq400_hapi.demux import Demux
 import time
 import matplotlib.pyplot as plt
 
@@ -103,22 +104,10 @@ if os.name != "nt":
 
 def channel_required(args, ch):
 #    print("channel_required {} {}".format(ch, 'in' if ch in args.pc_list else 'out', args.pc_list))
+    if args.save_direct:
+        return ch in args.pc_list
     return args.save != None or args.double_up or ch in args.pc_list
 
-def create_npdata(args, nblk, nchn):
-    channels = []
-
-    for counter in range(nchn):
-       if channel_required(args, counter):
-           channels.append(np.zeros((int(nblk)*args.NSAM), dtype=args.np_data_type))
-
-       else:
-           channels.append(np.zeros(16, dtype=args.np_data_type))
-    # print "length of data = ", len(total_data)
-    # print "npdata = ", npdata
-    return channels
-
-
 def make_cycle_list(args):
     if args.cycle == None:
         cyclist = os.listdir(args.uutroot)
@@ -164,79 +153,38 @@ def get_file_names(args):
 
     return fnlist
 
-def read_data(args, NCHAN):
-    # global NSAM
+def open_demux(args, NCHAN):
+    if os.path.isfile(args.src):
+        return Demux([args.src], NCHAN, args.np_data_type)
+
     data_files = get_file_names(args)
     for n, f in enumerate(data_files):
         print(f)
-    if NCHAN % 3 == 0:
-        print("collect in groups of 3 to keep alignment")
-        GROUP = 3
-    else:
-        GROUP = 1
-
-
-    if args.NSAM == 0:
-        args.NSAM = GROUP*os.path.getsize(data_files[0])/args.WSIZE/NCHAN
-        print("NSAM set {}".format(args.NSAM))
 
     NBLK = len(data_files)
     if args.nblks > 0 and NBLK > args.nblks:
         NBLK = args.nblks
-        data_files = [ data_files[i] for i in range(0,NBLK) ]
+        data_files = data_files[:NBLK]
 
-    print("NBLK {} NBLK/GROUP {} NCHAN {}".format(NBLK, NBLK/GROUP, NCHAN))
-
-    raw_channels = create_npdata(args, NBLK/GROUP, NCHAN)
-    blocks = 0
-    i0 = 0
-    iblock = 0
-    for blknum, blkfile in enumerate(data_files):
-        if blocks >= NBLK:
-            break
-        if blkfile != "analysis.py" and blkfile != "root":
-
-            print(blkfile, blknum)
-            # concatenate 3 blocks to ensure modulo 3 channel align
-            if iblock == 0:
-                data = np.fromfile(blkfile, dtype=args.np_data_type)
-            else:
-                data = np.append(data, np.fromfile(blkfile, dtype=args.np_data_type))
+    # files are one continuous stream to Demux, samples split across files stay aligned (eg NCHAN%3 == 0)
+    dmx = Demux(data_files, NCHAN, args.np_data_type)
+    print("NBLK {} NCHAN {} NSAM {}".format(NBLK, NCHAN, dmx.nsam))
+    return dmx
 
+def read_data(args, dmx):
+    args.NSAM = dmx.nsam
+    required = [ ch for ch in range(dmx.nchan) if channel_required(args, ch) ]
+    data = dmx.to_array(required, jobs=args.jobs)
 
-
-            iblock += 1
-            if iblock < GROUP:
-                continue
-
-            i1 = i0 + args.NSAM
-            for ch in range(NCHAN):
-                if channel_required(args, ch):
-                    raw_channels[ch][i0:i1] = (data[ch::NCHAN])
-                # print x
-            i0 = i1
-            blocks += 1
-            iblock = 0
+    raw_channels = [ np.zeros(16, dtype=args.np_data_type) ] * dmx.nchan
+    for ix, ch in enumerate(required):
+        raw_channels[ch] = data[ix]
 
     print("length of data = ", len(raw_channels))
     print("length of data[0] = ", len(raw_channels[0]))
-    print("length of data[1] = ", len(raw_channels[1]))
-    return raw_channels
-
-def read_data_file(args, NCHAN):
-    # NCHAN = args.nchan
-    data = np.fromfile(args.src, dtype=args.np_data_type)
-
-    nsam = len(data)/NCHAN
-    raw_channels = create_npdata(args, nsam, NCHAN)
-    for ch in range(NCHAN):
-        if channel_required(args, ch):
-            raw_channels[ch] = data[ch::NCHAN]
-
     return raw_channels
 
-def save_data(args, raw_channels):
-
+def make_saveroot(args):
     if os.name == "nt": # if system is windows.
         path = r'{}:\\demuxed\{}'.format(args.drive_letter, args.uut[0]) # raw string literal so we can use \ in path.
         if not os.path.exists(path):
@@ -246,6 +194,21 @@ def save_data(args, raw_channels):
     else:
         subprocess.call(["mkdir", "-p", args.saveroot])
 
+def save_data_direct(args, dmx):
+    """ demux straight from the source files to the dirfile, bounded memory """
+    make_saveroot(args)
+    uutname = args.uut[0]
+    dmx.to_files("{}/{}_{{:02d}}.dat".format(args.saveroot, uutname), jobs=args.jobs)
+
+    print("data saved to directory: {}".format(args.saveroot))
+    with open("{}/format".format(args.saveroot), 'w') as fmt:
+        fmt.write("# dirfile format file for {}\n".format(uutname))
+        for ch0 in range(dmx.nchan):
+            fmt.write("{}_{:02d}.dat RAW s 1\n".format(uutname, ch0+1))
+
+def save_data(args, raw_channels):
+    make_saveroot(args)
+
     uutname = args.uut[0]
     for enum, channel in enumerate(raw_channels):
         data_file = open("{}/{}_{:02d}.dat".format(args.saveroot, uutname, enum+1), "wb+")
@@ -422,12 +385,18 @@ def process_data(args):
         NCHAN = args.nchan * 2
         print("nchan = ", args.nchan)
 
-    raw_data = read_data(args, NCHAN) if not os.path.isfile(args.src) else read_data_file(args, NCHAN)
+    dmx = open_demux(args, NCHAN)
+    # plain save streams from source to channel files, only plot channels are loaded
+    args.save_direct = args.save != None and not args.double_up
+    if args.save_direct:
+        save_data_direct(args, dmx)
+
+    raw_data = read_data(args, dmx)
 
     if args.double_up:
        raw_data = double_up(args, raw_data)
 
-    if args.save != None:
+    if args.save != None and not args.save_direct:
         save_data(args, raw_data)
     if len(args.pc_list) > 0:
         plot_data(args, raw_data)
@@ -499,6 +468,8 @@ def get_parser():
     parser.add_argument('--plot_mpl', type=str, default="1:1000:1", help='Use MatPlotLib to plot subrate data args: start:stop[:step]')    
     parser.add_argument('--drive_letter', type=str, default="D", help="Which drive letter to use when on windows.")
     parser.add_argument('--show_columns', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=1, help='demux with N worker processes')
+    parser.add_argument('uut', nargs=1, help='uut')
     return parser
 
 if __name__ == '__main__':
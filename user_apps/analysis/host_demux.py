@@ -37,6 +37,12 @@ example usage::
     # plot data from LLC, 128 channels, show one "channel" from each site.
     # 97 was actually the LSB of TLATCH.
 
+    ./host_demux.py --save=DATA --nchan=96 --pchan=none --jobs=8 acq2106_067
+    # demux with 8 worker processes, each writes its sample range of every channel file
+
+    ./host_demux.py --save=DATA --nchan=96 --pchan=none --pyramid=1 acq2106_067
+    # also write min/max plot pyramid files DATA/acq2106_067_CC.dat.mm256 ..
+
 .. rst-class:: hidden
     usage::
 
@@ -90,6 +96,8 @@ import argparse
 import subprocess
 import acq400_hapi
 import acq400_hapi.channel_handlers as CH
+from acq400_hapi.demux import Demux
+from acq400_hapi import pyramid as PYR
 import time
 import matplotlib
 import matplotlib.pyplot as plt
@@ -115,20 +123,6 @@ def channel_required(args, ch):
 #    print("channel_required {} {}".format(ch, 'in' if ch in args.pc_list else 'out', args.pc_list))
     return args.save != None or args.double_up or ch in list(pc.ic for pc in args.pc_list)
 
-def create_npdata(args, nblk, nchn):
-    channels = []
-
-    for counter in range(nchn):
-        if channel_required(args, counter):
-            channels.append(np.zeros((int(nblk)*args.NSAM), dtype=args.np_data_type))
-
-        else:
-            channels.append(np.zeros(16, dtype=args.np_data_type))
-    # print "length of data = ", len(total_data)
-    # print "npdata = ", npdata
-    return channels
-
-
 def make_cycle_list(args):
     if args.cycle == None:
         cyclist = os.listdir(args.uutroot)
@@ -175,78 +169,51 @@ def get_file_names(args):
 
     return fnlist
 
-def read_data(args, NCHAN):
-    # global NSAM
+def open_demux(args, NCHAN):
+    if os.path.isfile(args.src):
+        return Demux([args.src], NCHAN, args.np_data_type)
+
     data_files = get_file_names(args)
     for n, f in enumerate(data_files):
         print(f)
-    if NCHAN % 3 == 0:
-        print("collect in groups of 3 to keep alignment")
-        GROUP = 3
-    else:
-        GROUP = 1
-
-
-    if args.NSAM == 0:
-        args.NSAM = GROUP*os.path.getsize(data_files[0])//args.WSIZE//NCHAN
-        print("NSAM set {}".format(args.NSAM))
 
     NBLK = len(data_files)
     if args.nblks > 0 and NBLK > args.nblks:
         NBLK = args.nblks
-        data_files = [ data_files[i] for i in range(0,NBLK) ]
-
-    print("NBLK {} NBLK/GROUP {} NCHAN {}".format(NBLK, NBLK/GROUP, NCHAN))
-
-    raw_channels = create_npdata(args, NBLK/GROUP, NCHAN)
-    blocks = 0
-    i0 = 0
-    iblock = 0
-    for blknum, blkfile in enumerate(data_files):
-        if blocks >= NBLK:
-            break
-        if blkfile != "analysis.py" and blkfile != "root":
-
-            if blknum == 0:
-                args.src = blkfile
-
-#            print("iblock={} blkfile={}, blknum={}".format(iblock, blkfile, blknum))
-            # concatenate 3 blocks to ensure modulo 3 channel align
-            if iblock == 0:
-                data = np.fromfile(blkfile, dtype=args.np_data_type)
-            else:
-                data = np.append(data, np.fromfile(blkfile, dtype=args.np_data_type))
-
-            print(f"hello data {len(data)}")
-
-            iblock += 1
-            if iblock < GROUP:
-                continue
-
-            i1 = i0 + args.NSAM
-            for ch in range(NCHAN):
-                if channel_required(args, ch):
-                    raw_channels[ch][i0:i1] = (data[ch::NCHAN])
-                # print x
-            i0 = i1
-            blocks += 1
-            iblock = 0
-    args.src = "{}..{}".format(args.src, os.path.basename(blkfile))
+        data_files = data_files[:NBLK]
+
+    # files are one continuous stream to Demux, samples split across files stay aligned (eg NCHAN%3 == 0)
+    dmx = Demux(data_files, NCHAN, args.np_data_type)
+    args.src = "{}..{}".format(data_files[0], os.path.basename(data_files[-1]))
+    print("NBLK {} NCHAN {} NSAM {}".format(NBLK, NCHAN, dmx.nsam))
+    return dmx
+
+def saved_channels(args, dmx):
+    """ source channel: lazy memmap of its file from save_dirfile_direct() """
+    saved = {}
+    if dmx.nsam == 0:
+        return saved
+    for ch0, src in enumerate(args.cmap_list):
+        ch1 = ch0+1
+        if not args.schan or ch1 in args.schan:
+            fn = "{}/{}_{:02d}.dat".format(args.saveroot, args.uut, ch1)
+            saved[src] = np.memmap(fn, dtype=args.np_data_type, mode='r')
+    return saved
+
+def read_data(args, dmx):
+    args.NSAM = dmx.nsam
+    saved = saved_channels(args, dmx) if args.save_direct else {}
+    required = [ ch for ch in range(dmx.nchan) if ch not in saved and channel_required(args, ch) ]
+    data = dmx.to_array(required, jobs=args.jobs) if required else []
+
+    raw_channels = [ np.zeros(16, dtype=args.np_data_type) ] * dmx.nchan
+    for ch, mm in saved.items():
+        raw_channels[ch] = mm
+    for ix, ch in enumerate(required):
+        raw_channels[ch] = data[ix]
 
     print("length of data = ", len(raw_channels))
     print("length of data[0] = ", len(raw_channels[0]))
-    print("length of data[1] = ", len(raw_channels[1]))
-    return raw_channels
-
-def read_data_file(args, NCHAN):
-    # NCHAN = args.nchan
-    data = np.fromfile(args.src, dtype=args.np_data_type)
-
-    nsam = len(data)/NCHAN
-    raw_channels = create_npdata(args, nsam, NCHAN)
-    for ch in range(NCHAN):
-        if channel_required(args, ch):
-            raw_channels[ch] = data[ch::NCHAN]
     return raw_channels
 
 def save_dirfile(args, raw_channels):
@@ -271,8 +238,7 @@ def save_numpy(args, raw_channels):
     print("save_numpy {}  {}".format(npfile, cooked))
     np.save(npfile, cooked)
 
-def save_data(args, raw_channels):
-
+def make_saveroot(args):
     if os.name == "nt": # if system is windows.
         path = r'{}:\\demuxed\{}'.format(args.drive_letter, args.uut) # raw string literal so we can use \ in path.
         if not os.path.exists(path):
@@ -282,6 +248,22 @@ def save_data(args, raw_channels):
     else:
         subprocess.call(["mkdir", "-p", args.saveroot])
 
+def save_dirfile_direct(args, dmx, cmap):
+    """ demux straight from the source files to the dirfile, bounded memory """
+    make_saveroot(args)
+    ch1s = [ ch0+1 for ch0 in range(dmx.nchan) if not args.schan or ch0+1 in args.schan ]
+    paths = [ "{}/{}_{:02d}.dat".format(args.saveroot, args.uut, ch1) for ch1 in ch1s ]
+    dmx.to_files(paths, [ cmap[ch1-1] for ch1 in ch1s ], jobs=args.jobs, pyramid=args.pyramid)
+
+    print("data saved to directory: {}".format(args.saveroot))
+    with open("{}/format".format(args.saveroot), 'w') as fmt:
+        fmt.write("# dirfile format file for {}\n".format(args.uut))
+        for ch0 in range(dmx.nchan):
+            fmt.write("{}_{:02d}.dat RAW s 1\n".format(args.uut, ch0+1))
+
+def save_data(args, raw_channels):
+    make_saveroot(args)
+
     if args.save == 'npy':
         save_numpy(args, raw_channels)
     else:
@@ -335,7 +317,12 @@ def plot_mpl(args, raw_channels):
         if len(meta) > 1:
             plots[pln].set_ylabel(meta[1])
         plots[pln].set_title(plots[pln].get_title() + f' {meta[0]}')
-        if not_smooth:
+        width = PYR.ax_width(plots[pln])
+        if args.minmax and len(yy) > 2 * width:
+            # min/max per pixel: every sample counted, no stride aliasing
+            ix, mn, mx, nbin = PYR.minmax(yy, width)
+            PYR.plot_minmax(plots[pln], xx[ix], mn, mx, nbin, linewidth=0.75)
+        elif not_smooth:
             plots[pln].step(xx, yy, linewidth=0.75)
         else:
             plots[pln].plot(xx, yy, linewidth=0.75)
@@ -366,6 +353,8 @@ def process_cmdline_cfg(args):
 
 
 
+KST_WIDTH = 4000         # minmax bins for kst, kst has no pixel width to offer
+
 def plot_data_kst(args, raw_channels):
     client = pykst.Client("NumpyVector")
     llen = len(raw_channels[0])
@@ -387,6 +376,10 @@ def plot_data_kst(args, raw_channels):
         xu = 'sample'
         xdata = np.arange(0, llen).astype(np.float64)
 
+    reduce = args.minmax and llen > 2 * KST_WIDTH
+    if reduce:
+        ix, _, _, nbin = PYR.minmax(xdata, KST_WIDTH)
+        xdata = xdata[ix]
     V1 = client.new_editable_vector(xdata, name=xname)
 
     for ch in [ int(c) for c in args.pc_list]:
@@ -402,12 +395,18 @@ def plot_data_kst(args, raw_channels):
                 print("ERROR: no calibration for CH{:02d}".format(ch1))
 
         # label 1.. (human)
-        V2 = client.new_editable_vector(channel.astype(np.float64), name="{}:CH{:02d}".format(re.sub(r"_", r"-", args.uut), ch1))
-        c1 = client.new_curve(V1, V2)
+        name = "{}:CH{:02d}".format(re.sub(r"_", r"-", args.uut), ch1)
         p1 = client.new_plot()
         p1.set_left_label(yu1)
         p1.set_bottom_label(xu)
-        p1.add(c1)
+        if reduce:
+            _, mn, mx, _ = PYR.minmax(channel, KST_WIDTH)
+            for tag, yy in (("min", mn), ("max", mx)):
+                V2 = client.new_editable_vector(yy.astype(np.float64), name="{}:{}".format(name, tag))
+                p1.add(client.new_curve(V1, V2))
+        else:
+            V2 = client.new_editable_vector(channel.astype(np.float64), name=name)
+            p1.add(client.new_curve(V1, V2))
 
 
 def plot_data(args, raw_channels):
@@ -451,18 +450,17 @@ def cook_data(args, raw_channels):
 
     return clidata
 
-def map_from_embedded_cmap(args, raw_data):
+def get_embedded_cmap(args, nchan):
     try:
         cmap = [ int(ch0) for ch0 in args.the_uut.s0.channel_mapping.split(',') ]
         print(cmap)
-
-        r2 = []
-        for i1 in cmap:
-            r2.append(raw_data[i1])
-        return r2
+        return cmap
     except:
         print("WARNING: channel_mapping request failed (old firmware?), use 1:1")
-        return raw_data
+        return list(range(nchan))
+
+def map_from_embedded_cmap(args, raw_data):
+    return [ raw_data[i1] for i1 in args.cmap_list ]
 
 def process_data(args):
     NCHAN = args.nchan
@@ -470,7 +468,14 @@ def process_data(args):
         NCHAN = args.nchan * 2
         print("nchan = ", args.nchan)
 
-    raw_data = read_data(args, NCHAN) if not os.path.isfile(args.src) else read_data_file(args, NCHAN)
+    dmx = open_demux(args, NCHAN)
+    args.cmap_list = get_embedded_cmap(args, NCHAN) if args.cmap else list(range(NCHAN))
+    # dirfile save streams from source to channel files, read_data() maps the files, nothing is loaded
+    args.save_direct = args.save != None and args.save != 'npy' and not args.double_up and not args.stack_480
+    if args.save_direct:
+        save_dirfile_direct(args, dmx, args.cmap_list)
+
+    raw_data = read_data(args, dmx)
 
     if args.cmap:
         raw_data = map_from_embedded_cmap(args, raw_data)
@@ -483,7 +488,7 @@ def process_data(args):
     if args.callback:
         args.callback(cook_data(args, raw_data))
 
-    if args.save != None:
+    if args.save != None and not args.save_direct:
         save_data(args, raw_data)
     if args.plot and len(args.pc_list) > 0:
         plot_data(args, raw_data)
@@ -636,6 +641,9 @@ def get_parser(parser=None):
     parser.add_argument('--traces_per_plot', default=1, type=int, help="traces_per_plot")
     parser.add_argument('--schan', default=None, type=list_of_ints, help="channels to save ie 1,49,50")
     parser.add_argument('--cmap', default=1, type=int, help="use embedded channel mapping")
+    parser.add_argument('--jobs', default=1, type=int, help="demux with N worker processes")
+    parser.add_argument('--minmax', default=1, type=int, help="plot min/max per pixel, 0: plot every point")
+    parser.add_argument('--pyramid', default=0, type=int, help="with --save, build min/max plot pyramid files")
     if is_client:
         parser.add_argument('uuts', nargs='+',help='uut - for auto configuration data_type, nchan, egu or just a label')
     return parser
@@ -77,6 +77,7 @@ import re
 import argparse
 import subprocess
 import acq400_hapi
+from acq400_hapi import burst_stack
 import time
 
 VERBOSE = os.getenv("VERBOSE", 0)
@@ -95,68 +96,29 @@ def get_src_names(root):
     return src_names
 
 def get_esi(chx):
-# calculate ES indices. Only look at ch2 on all boxes   
-# remember the ES is double width..
-    esn = len(chx)/8
-    esi = [ [] for ii in range(esn)]     # index
-    esc = [ [] for ii in range(esn)]     # count (ich+1)
- 
-    if VERBOSE:
-        print("sanity check, check we are looking at real data, rows with 2857759060 are es, rest is data32")
-        for ii in range(5):
-            print("{} {}".format(ii, [chx[ic][ii] for ic in range(len(chx))]))
- 
-    for ich, ch in enumerate(chx):
-        print("ich {} len(chx) {}".format(ich, len(chx)))
-        if ich%8 == 0:
-            print("scanning ES on ich {}".format(ich))
-            for ii in range(0, len(ch)):
-                if ch[ii] == 0xaa55f15f or ch[ii] == 0xaa55f152:
-                    print("es at {}".format(ii))
-                    if ich == 1:
-                        print("es detail at {} {} {}".format(ich, ii, [chx[ic][ii] for ic in range(0,32,8)]))
-                # esi in shorts
-                    esi[ich/8].append(ii)
-                    esc[ich/8].append(chx[ich-1][ii])
-   
-    print("esi lengths {}".format([len(esi[ii]) for ii in range(0, len(esi))]))
-    
+# calculate ES indices. Only look at ch1 on all boxes
+# data is 32 bit, esi in samples
+    esch = range(0, len(chx), 8)
+    esi = [ np.union1d(burst_stack.find_es(chx[ich], 0xaa55f15f), burst_stack.find_es(chx[ich], 0xaa55f152)) for ich in esch ]
+    esc = [ chx[ich-1].view(np.uint32)[es] for ich, es in zip(esch, esi) ]     # count (ich-1)
+
+    print("esi lengths {}".format([len(es) for es in esi]))
+
     if VERBOSE:
         for ii, es in enumerate(esi):
-            print("ii {} es {} esc {}".format(ii, es, esc))
-#            deltac = [ es[jj]-esi[0][jj] for jj in range(esn) ]
-#            deltas = [ es[jj] - es[jj-1] for jj in range(1, esn)]
-#            print("difference between channels ii {} max {}".format(ii, max(deltac)))
-#            print("difference between bursts ii {} min {} max {}".format(ii, min(deltas), max(deltas)))
-        
-    errors = 0  
-    print("scanning embedded counts..")
-    for icount in range(len(esc[0])):
-        cv = [esc[ic][icount] for ic in range(esn)]
-        if icount < 5:
-            print("ic {} {}".format(icount, cv))
-        if min(cv) != max(cv):
-            print("ERROR: count discrepancy at {} {}".format(icount, cv))
-            errors += 1
-        
-    print("scanned {}*{} counts, errors {}".format(esn, icount, errors))
-         
-              
-    lmin = len(esi[0])
-    truncate = False
-    
-    for ll in [ len(esi[ii]) for ii in range(1, len(esi))]:
-        if ll != lmin:
-            lmin = min(ll, lmin)
-            print("WARNING: burst count mismatch, min is {}".format(lmin))
-            truncate = True
+            print("ii {} es {} esc {}".format(ii, es, esc[ii]))
 
-    bmin = esi[0][1] - esi[0][0]
-    
-#    for bl in [ esi[0][ii]-esi[0][ii-1] for ii in range(2,len(esi))]:
-#        if bl != bmin:
-#            bmin = min(bl, bmin)
-#            print("WARNING bmin set {}".format(bmin))
+    lmin, bmin = burst_stack.burst_shape(esi)
+
+    print("scanning embedded counts..")
+    cv = np.array([ c[:lmin] for c in esc ])
+    errors = np.flatnonzero(cv.min(axis=0) != cv.max(axis=0))
+    for icount in range(min(5, lmin)):
+        print("ic {} {}".format(icount, cv[:, icount]))
+    for icount in errors:
+        print("ERROR: count discrepancy at {} {}".format(icount, cv[:, icount]))
+
+    print("scanned {}*{} counts, errors {}".format(len(esi), lmin, len(errors)))
     print("get_esi returns nbursts {} blen {} ".format(lmin, bmin))
     return lmin, bmin, esi
 
@@ -164,24 +126,17 @@ FRONTPORCH = 30
 
 def get_data(args):
     srcs = get_src_names(args.root)
-    nchan = len(srcs)
-    raw = [ np.fromfile("{}/{}".format(args.root, srcs[ii]), dtype=np.int32) for ii in range(0, nchan)]
-    nbursts, blen, esi = get_esi([ np.fromfile("{}/{}".format(args.root, srcs[ii]), dtype=np.uint32) for ii in range(0,nchan)])
-    chx = np.zeros((nchan, nbursts, blen+FRONTPORCH))
-    esi0 = esi[0]
-    
-    print("chx 01 3 dimension {}",len(chx[0,0]))
-    try:
-        for ic in range(nchan):
-            for ib in range(nbursts-2):
-                chx[ic, ib ] = raw[ic][esi0[ib]+2:esi0[ib]+2+blen+FRONTPORCH]
-
-    except IndexError as ie:
-        print("IndexError {} ic {} ib {} ii {}".format(ie, ic, ib, ii))
-              
-    print("chx 99 3 dimension {}",len(chx[0,0]))
-    print("chx 99") 
-    return chx
+    raw = [ np.memmap("{}/{}".format(args.root, src), dtype=np.int32, mode='r') for src in srcs ]
+    nbursts, blen, esi = get_esi(raw)
+    nuut = len(esi)
+    # every uut is cut on the uut0 ES, the last two bursts are left zero
+    esi0 = esi[0][:max(0, nbursts-2)]
+    # data[uut][ch][burst][t], then flatten uut, ch
+    chx = burst_stack.stack([ raw[ii*8:ii*8+8] for ii in range(nuut) ], [ esi0 ] * nuut, blen+FRONTPORCH,
+                            offset=2, nburst=nbursts, path=args.stack_file, dtype=np.float64)
+
+    print("chx dimension {}".format(chx.shape))
+    return chx.reshape(-1, nbursts, blen+FRONTPORCH)
 
 VALUE_ERRORS = 0
 
@@ -309,6 +264,7 @@ def get_parser():
     parser.add_argument('--root', type=str, default="./DATA", help='directory with data')
     parser.add_argument('--alignref', type=int, default=None, help='realign on this channel [index from 1]')
     parser.add_argument('--store_chan', type=str, default=None, help='directory to store result by channel') 
+    parser.add_argument('--stack_file', type=str, default=None, help='store the stack as a memory mapped .npy file, eg for long captures')
     return parser
 
 if __name__ == '__main__':
@@ -37,6 +37,7 @@ import argparse
 import numpy as np
 import time
 from matplotlib import pyplot as plt
+from acq400_hapi import waveforms
 
 class WaveGen():
 
@@ -219,13 +220,13 @@ class WaveGen():
         return int((self.__cycler_generic(self.offset, "offset") / self.voltage) * self.max_value)
     
     def __gen_sine(self, wavelength, phase):
-        return np.sin(np.linspace(-phase, -phase + (self.cycles * 2) * np.pi, wavelength))
+        return waveforms.sine(wavelength, phase, self.cycles)
     
     def __gen_ramp(self, wavelength, phase):
-        return np.mod(np.linspace(0, self.cycles, wavelength) + phase, 1)
+        return waveforms.ramp(wavelength, phase, self.cycles)
     
     def __gen_square(self, wavelength, phase):
-        return np.sign(self.__gen_sine(wavelength, phase))
+        return waveforms.square(wavelength, phase, self.cycles)
     
     def __gen_null(self, wavelength, phase):
         return np.zeros(self.wavelength, dtype=self.dtype)